@@ -0,0 +1,209 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from . import config, metrics
+
+
+class Overloaded(Exception):
+    """Request shed by admission control; retry after `retry_after` seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued request; a thread waits on `event`, a coroutine on `future`."""
+
+    def __init__(self, shed, loop=None):
+        self.shed = shed
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def grant(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Caps concurrent inference at `limit` with at most `max_waiting`
+    requests queued behind it.
+
+    A request is shed instead of queued when the queue is full, or when
+    the time since it arrived plus the expected wait (queue position times
+    the EWMA of recent service times) exceeds `deadline` seconds; one that
+    does queue is shed if it is still waiting at the deadline. Waiters are
+    served first come, first served: a released slot is handed directly
+    to the oldest one. Callers that must not be shed (job workers and the
+    live batcher, which are already bounded) pass shed=False; they queue
+    in order but do not count against `max_waiting`.
+
+    Async callers acquire a slot on the event loop (acquire_async) before
+    handing work to `executor`, so nothing waits unaccounted in the pool.
+    """
+
+    def __init__(self, limit, max_waiting, deadline, alpha=0.2):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.deadline = deadline
+        self.alpha = alpha
+        self.active = 0
+        self.waiting = 0  # sheddable waiters, bounded by max_waiting
+        self.service_time = None
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        """Thread pool for work that already holds a slot, so one thread per slot."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.limit, thread_name_prefix="skinai-analyze")
+        return self._executor
+
+    def expected_wait(self):
+        """Seconds a request arriving now would wait for a slot (call with the lock held)."""
+        if self.active < self.limit and not self._waiters:
+            return 0.0
+        return (len(self._waiters) // self.limit + 1) * (self.service_time or 0.0)
+
+    def _retry_after(self):
+        return max(1, math.ceil(self.expected_wait() or self.service_time or 1))
+
+    def _shed(self, reason):
+        metrics.ADMISSION_SHED.labels(reason).inc()
+        raise Overloaded(reason, self._retry_after())
+
+    def _enter(self, shed, arrived, loop=None):
+        """Take a free slot (returns None) or join the queue (returns the waiter); lock held."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            metrics.ADMISSION_ACTIVE.inc()
+            return None
+        if shed:
+            if self.waiting >= self.max_waiting:
+                self._shed("queue_full")
+            if time.perf_counter() - arrived + self.expected_wait() > self.deadline:
+                self._shed("deadline")
+            self.waiting += 1
+        waiter = _Waiter(shed, loop)
+        self._waiters.append(waiter)
+        metrics.ADMISSION_QUEUE_DEPTH.inc()
+        return waiter
+
+    def _dequeued(self, waiter):
+        if waiter.shed:
+            self.waiting -= 1
+        metrics.ADMISSION_QUEUE_DEPTH.dec()
+
+    def _give_up(self, waiter):
+        """Drop a waiter that timed out or was cancelled; False if it was granted a slot meanwhile."""
+        if waiter.granted:
+            return False
+        self._waiters.remove(waiter)
+        self._dequeued(waiter)
+        return True
+
+    def _remaining(self, shed, arrived):
+        return max(0.0, arrived + self.deadline - time.perf_counter()) if shed else None
+
+    def acquire(self, shed=True, arrived=None):
+        """
+        Block until a slot is held and return the seconds spent queued.
+        `arrived` (a perf_counter time) starts the deadline; default now.
+        """
+        t0 = time.perf_counter()
+        arrived = t0 if arrived is None else arrived
+        with self._lock:
+            waiter = self._enter(shed, arrived)
+        if waiter is not None and not waiter.event.wait(self._remaining(shed, arrived)):
+            with self._lock:
+                if self._give_up(waiter):
+                    self._shed("timeout")
+        queued = time.perf_counter() - t0
+        metrics.ADMISSION_WAIT.observe(queued)
+        return queued
+
+    async def acquire_async(self, shed=True, arrived=None):
+        """acquire() for the event loop: waits without blocking it."""
+        t0 = time.perf_counter()
+        arrived = t0 if arrived is None else arrived
+        with self._lock:
+            waiter = self._enter(shed, arrived, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self._remaining(shed, arrived))
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if self._give_up(waiter):
+                        self._shed("timeout")
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = not self._give_up(waiter)
+                if granted:
+                    self.release()
+                raise
+        queued = time.perf_counter() - t0
+        metrics.ADMISSION_WAIT.observe(queued)
+        return queued
+
+    def release(self, elapsed=None):
+        """Free a slot, handing it to the oldest waiter; `elapsed` feeds the service-time EWMA."""
+        with self._lock:
+            if elapsed is not None:
+                if self.service_time is None:
+                    self.service_time = elapsed
+                else:
+                    self.service_time = self.alpha * elapsed + (1 - self.alpha) * self.service_time
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                self._dequeued(waiter)
+                waiter.grant()
+            else:
+                self.active -= 1
+                metrics.ADMISSION_ACTIVE.dec()
+
+    @contextmanager
+    def admit(self, shed=True, arrived=None, queued=None):
+        """
+        Hold one inference slot for the duration of the block; yields the
+        seconds spent queued. A caller that already holds a slot (from
+        acquire_async) passes the seconds it queued as `queued`, and the
+        block only times and releases it.
+        """
+        if queued is None:
+            queued = self.acquire(shed, arrived)
+        start = time.perf_counter()
+        try:
+            yield queued
+        finally:
+            self.release(time.perf_counter() - start)
+
+
+_CONTROLLER = None
+
+
+def get_controller():
+    global _CONTROLLER
+    if _CONTROLLER is None:
+        _CONTROLLER = AdmissionController(
+            config.ANALYZE_CONCURRENCY, config.ANALYZE_QUEUE_SIZE, config.ANALYZE_DEADLINE_MS / 1000,
+        )
+    return _CONTROLLER
@@ -7,6 +7,88 @@ DB_URL = os.getenv("SKINAI_DB_URL", f"sqlite:///{BASE_DIR/'skin_ai.db'}")
 MODELS_DIR = BASE_DIR / "models"
 BEST_MODEL = MODELS_DIR / "best" / "skin_model.onnx"
 LABELS_PATH = MODELS_DIR / "best" / "class_names.txt"
+HEADS_PATH = MODELS_DIR / "best" / "heads.json"
+MANIFEST_PATH = MODELS_DIR / "best" / "manifest.json"
+CANDIDATE_DIR = MODELS_DIR / "candidate"
+
+# ONNX Runtime threading (0 lets onnxruntime pick)
+ORT_INTRA_OP_THREADS = int(os.getenv("SKINAI_ORT_INTRA_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.getenv("SKINAI_ORT_INTER_THREADS", "0"))
+# Weight sharing: with prepacking disabled, onnxruntime computes straight from the
+# memory-mapped external weights file, so processes serving the same model share
+# one copy. The CPU arena keeps activation buffers between runs; turning it off
+# returns them to the OS at some cost in allocation time.
+ORT_SHARE_WEIGHTS = os.getenv("SKINAI_ORT_SHARE_WEIGHTS", "1") == "1"
+ORT_CPU_ARENA = os.getenv("SKINAI_ORT_CPU_ARENA", "1") == "1"
+
+# Promotion gates for freshly exported models
+PARITY_ATOL = float(os.getenv("SKINAI_PARITY_ATOL", "1e-3"))
+LATENCY_BUDGET_MS = float(os.getenv("SKINAI_LATENCY_BUDGET_MS", "200"))
+
+# Similar-case search: penultimate-layer embeddings, projected to this size
+EMBEDDINGS_DIR = BASE_DIR / "embeddings"
+EMBEDDING_DIM = int(os.getenv("SKINAI_EMBEDDING_DIM", "128"))
+
+# Admin-only features (profiling header, profile downloads); empty disables the header trigger
+ADMIN_TOKEN = os.getenv("SKINAI_ADMIN_TOKEN", "")
+
+# Request profiling: fraction of requests to profile, profiler ("sample" or "cprofile"),
+# sampling interval and how many profiles to keep
+PROFILES_DIR = BASE_DIR / "profiles"
+PROFILE_RATE = float(os.getenv("SKINAI_PROFILE_RATE", "0"))
+PROFILE_MODE = os.getenv("SKINAI_PROFILE_MODE", "sample")
+PROFILE_INTERVAL_MS = float(os.getenv("SKINAI_PROFILE_INTERVAL_MS", "1"))
+PROFILE_KEEP = int(os.getenv("SKINAI_PROFILE_KEEP", "100"))
+
+# Logging: JSON lines in a size-rotated file; SKINAI_LOG_SAMPLE keeps a fraction of
+# INFO logs per logger prefix, e.g. "backend.access=0.1,backend.main=0.5"
+LOG_PATH = BASE_DIR / "skin_ai.log"
+LOG_MAX_BYTES = int(os.getenv("SKINAI_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("SKINAI_LOG_BACKUPS", "5"))
+LOG_SAMPLE = os.getenv("SKINAI_LOG_SAMPLE", "")
+
+# Asynchronous /analyze/jobs: worker threads, max queued jobs, result retention
+JOB_WORKERS = int(os.getenv("SKINAI_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("SKINAI_JOB_QUEUE_SIZE", "64"))
+JOB_MAX_FINISHED = int(os.getenv("SKINAI_JOB_MAX_FINISHED", "1000"))
+JOB_TTL_SECONDS = float(os.getenv("SKINAI_JOB_TTL", "600"))
+
+# Admission control around inference: concurrent slots, requests allowed to wait
+# for one, and the longest expected wait before /analyze sheds with a 503
+ANALYZE_CONCURRENCY = int(os.getenv("SKINAI_ANALYZE_CONCURRENCY", "2"))
+ANALYZE_QUEUE_SIZE = int(os.getenv("SKINAI_ANALYZE_QUEUE_SIZE", "16"))
+ANALYZE_DEADLINE_MS = float(os.getenv("SKINAI_ANALYZE_DEADLINE_MS", "5000"))
+
+# Pre-inference image-quality gate: "reject" (422 before inference), "flag"
+# (analyze anyway, report issues) or "off"; thresholds apply to a 256px grayscale copy
+QUALITY_GATE = os.getenv("SKINAI_QUALITY_GATE", "flag")
+QUALITY_MIN_SIDE = int(os.getenv("SKINAI_QUALITY_MIN_SIDE", "128"))
+QUALITY_BLUR_MIN = float(os.getenv("SKINAI_QUALITY_BLUR_MIN", "40"))
+QUALITY_BRIGHTNESS_MIN = float(os.getenv("SKINAI_QUALITY_BRIGHTNESS_MIN", "40"))
+QUALITY_BRIGHTNESS_MAX = float(os.getenv("SKINAI_QUALITY_BRIGHTNESS_MAX", "220"))
+QUALITY_CLIPPED_MAX = float(os.getenv("SKINAI_QUALITY_CLIPPED_MAX", "0.6"))
+QUALITY_FACE_CHECK = os.getenv("SKINAI_QUALITY_FACE_CHECK", "0") == "1"
+
+# Live camera (/ws/live): most frames, across all clients, per batched model run
+LIVE_MAX_BATCH = int(os.getenv("SKINAI_LIVE_MAX_BATCH", "8"))
+
+# Near-duplicate detection: max dHash Hamming distance (<= 3 is an exact band
+# lookup), and how recent a near-identical upload must be for /analyze to return
+# its stored result instead of running the model again (0 disables reuse)
+DEDUP_MAX_DISTANCE = int(os.getenv("SKINAI_DEDUP_MAX_DISTANCE", "3"))
+DEDUP_REUSE_SECONDS = float(os.getenv("SKINAI_DEDUP_REUSE_SECONDS", "0"))
+
+# Background retraining (off unless SKINAI_RETRAIN=1): a build_dataset + train
+# cycle starts once RETRAIN_MIN_FEEDBACK new feedback records have arrived, or
+# every RETRAIN_INTERVAL_HOURS if there is any (0 disables the schedule). Steps run
+# niced, with BLAS/OpenMP pools capped at RETRAIN_THREADS; state and logs in RETRAIN_DIR
+RETRAIN_ENABLED = os.getenv("SKINAI_RETRAIN", "0") == "1"
+RETRAIN_MIN_FEEDBACK = int(os.getenv("SKINAI_RETRAIN_MIN_FEEDBACK", "200"))
+RETRAIN_INTERVAL_HOURS = float(os.getenv("SKINAI_RETRAIN_INTERVAL_HOURS", "0"))
+RETRAIN_POLL_SECONDS = float(os.getenv("SKINAI_RETRAIN_POLL_SECONDS", "60"))
+RETRAIN_THREADS = int(os.getenv("SKINAI_RETRAIN_THREADS", "2"))
+RETRAIN_NICE = int(os.getenv("SKINAI_RETRAIN_NICE", "10"))
+RETRAIN_DIR = MODELS_DIR / "retrain"
 
 MODELS_DIR.mkdir(exist_ok=True, parents=True)
-(BEST_MODEL.parent).mkdir(exist_ok=True, parents=True)
\ No newline at end of file
+(BEST_MODEL.parent).mkdir(exist_ok=True, parents=True)
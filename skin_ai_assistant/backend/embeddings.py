@@ -0,0 +1,280 @@
+import numpy as np
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from .config import EMBEDDINGS_DIR, EMBEDDING_DIM
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock shared by every process appending to the index."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class EmbeddingIndex:
+    """
+    Append-only float16 embedding store backed by a memory-mapped file,
+    with top-k cosine search.
+
+    Vectors are randomly projected to a fixed size and L2-normalized on
+    insert, so cosine similarity is a plain dot product. Small indexes are
+    scanned exactly; past IVF_MIN_ROWS an inverted-file index (k-means
+    coarse quantizer) limits each query to the NPROBE closest clusters,
+    which keeps lookups in the low milliseconds at a million rows. The
+    IVF is trained on a background thread; queries scan exactly until it
+    is ready.
+
+    Several processes (uvicorn workers) may share one index: rows are
+    allocated under a file lock, and each process picks up the rows the
+    others appended from ids.txt before adding or searching.
+    """
+
+    INITIAL_CAPACITY = 4096
+    SCAN_CHUNK = 65536
+    IVF_MIN_ROWS = 50_000
+    NPROBE = 16
+
+    def __init__(self, root=EMBEDDINGS_DIR, dim=EMBEDDING_DIM):
+        self.root = Path(root)
+        self.dim = dim
+        self.root.mkdir(exist_ok=True, parents=True)
+        self.vectors_path = self.root / "vectors.f16"
+        self.ids_path = self.root / "ids.txt"
+        self.lock_path = self.root / "index.lock"
+        self._lock = threading.Lock()
+        self._projections = {}
+
+        self._ids = []
+        self._rows = {}
+        self._ids_bytes = 0
+        self._mm = None
+        self._ivf = None  # (centroids, lists), always replaced as a pair
+        self._ivf_size = 0
+        self._ivf_thread = None
+        with self._lock:
+            self._open(self.INITIAL_CAPACITY)
+            self._sync()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, record_id):
+        return record_id in self._rows
+
+    def _open(self, capacity):
+        if self._mm is not None:
+            self._mm.flush()
+            del self._mm
+        nbytes = capacity * self.dim * 2
+        open(self.vectors_path, "ab").close()  # create without truncating another worker's file
+        with open(self.vectors_path, "r+b") as f:
+            f.seek(0, 2)
+            if f.tell() < nbytes:
+                f.truncate(nbytes)
+        self.capacity = capacity
+        self._mm = np.memmap(self.vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+
+    def _projection(self, source_dim):
+        """Fixed Gaussian random projection (Johnson-Lindenstrauss)."""
+        if source_dim == self.dim:
+            return None
+        if source_dim not in self._projections:
+            rng = np.random.default_rng(source_dim)
+            self._projections[source_dim] = (
+                rng.standard_normal((source_dim, self.dim)).astype(np.float32) / np.sqrt(self.dim)
+            )
+        return self._projections[source_dim]
+
+    def normalize(self, vector):
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        proj = self._projection(v.shape[0])
+        if proj is not None:
+            v = v @ proj
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _append(self, record_id):
+        row = len(self._ids)
+        self._ids.append(record_id)
+        self._rows.setdefault(record_id, row)
+        if self._ivf is not None:
+            centroids, lists = self._ivf
+            lists[int(np.argmax(centroids @ np.asarray(self._mm[row], dtype=np.float32)))].append(row)
+        return row
+
+    def _sync(self):
+        """Pick up rows other processes appended since we last looked (self._lock held)."""
+        try:
+            size = self.ids_path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= self._ids_bytes:
+            return
+        with open(self.ids_path, "rb") as f:
+            f.seek(self._ids_bytes)
+            data = f.read(size - self._ids_bytes)
+        end = data.rfind(b"\n") + 1  # complete lines only
+        if end == 0:
+            return
+        new_ids = data[:end].decode().splitlines()
+        self._ids_bytes += end
+        if len(self._ids) + len(new_ids) > self.capacity:
+            self._open(max(self.capacity * 2, len(self._ids) + len(new_ids)))
+        for rid in new_ids:
+            self._append(rid)
+
+    def add(self, record_id, vector):
+        v = self.normalize(vector)
+        with self._lock, _file_lock(self.lock_path):
+            self._sync()
+            if record_id in self._rows:
+                return self._rows[record_id]
+            if len(self._ids) >= self.capacity:
+                self._open(self.capacity * 2)
+            # The vector is in place before its id line makes the row visible
+            self._mm[len(self._ids)] = v
+            line = (record_id + "\n").encode()
+            with open(self.ids_path, "ab") as f:
+                f.write(line)
+            self._ids_bytes += len(line)
+            row = self._append(record_id)
+        if len(self._ids) >= self.IVF_MIN_ROWS and len(self._ids) >= 2 * self._ivf_size:
+            self._schedule_ivf()
+        return row
+
+    def get(self, record_id):
+        with self._lock:
+            self._sync()
+        row = self._rows.get(record_id)
+        if row is None:
+            return None
+        return np.asarray(self._mm[row], dtype=np.float32)
+
+    def search(self, query, k=10, exclude=None):
+        """
+        Return up to k (record_id, cosine similarity) pairs, best first.
+        `query` may be a raw model embedding or an already stored vector.
+        """
+        q = self.normalize(query)
+        with self._lock:
+            self._sync()
+        n = len(self._ids)
+        if n == 0:
+            return []
+        want = k + (1 if exclude is not None else 0)
+
+        # One read, so a concurrent rebuild cannot pair new centroids with old lists
+        ivf = self._ivf
+        if n >= self.IVF_MIN_ROWS and (ivf is None or n >= 2 * self._ivf_size):
+            self._schedule_ivf()
+        if ivf is not None:
+            rows, scores = self._search_ivf(q, ivf)
+        else:
+            rows = None
+            scores = self._scan(q, n)
+
+        top = min(want, len(scores))
+        if top == 0:
+            return []
+        idx = np.argpartition(-scores, top - 1)[:top]
+        idx = idx[np.argsort(-scores[idx])]
+        results = []
+        for i in idx:
+            row = int(rows[i]) if rows is not None else int(i)
+            rid = self._ids[row]
+            if rid == exclude:
+                continue
+            results.append((rid, float(scores[i])))
+        return results[:k]
+
+    def _scan(self, q, n):
+        scores = np.empty(n, dtype=np.float32)
+        buf = np.empty((min(self.SCAN_CHUNK, n), self.dim), dtype=np.float32)
+        for start in range(0, n, self.SCAN_CHUNK):
+            chunk = self._mm[start:min(start + self.SCAN_CHUNK, n)]
+            b = buf[:len(chunk)]
+            np.copyto(b, chunk)
+            np.dot(b, q, out=scores[start:start + len(chunk)])
+        return scores
+
+    def _search_ivf(self, q, ivf):
+        centroids, lists = ivf
+        probes = np.argpartition(-(centroids @ q), self.NPROBE - 1)[:self.NPROBE]
+        rows = np.fromiter(
+            (r for c in probes for r in lists[c]), dtype=np.int64
+        )
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        rows.sort()  # sequential access into the memmap
+        scores = np.asarray(self._mm[rows], dtype=np.float32) @ q
+        return rows, scores
+
+    def _schedule_ivf(self):
+        """(Re)build the IVF on a background thread unless a build is already running."""
+        with self._lock:
+            if self._ivf_thread is not None and self._ivf_thread.is_alive():
+                return
+            self._ivf_thread = threading.Thread(target=self._build_ivf, name="skinai-ivf", daemon=True)
+            self._ivf_thread.start()
+
+    def _build_ivf(self, iters=8, sample_size=20_000):
+        """Train a spherical k-means coarse quantizer and assign every row."""
+        n = len(self._ids)
+        nlist = max(self.NPROBE, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(n, size=min(sample_size, n), replace=False))
+        sample = np.asarray(self._mm[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            # Empty clusters keep their previous centroid
+            filled = np.bincount(assign, minlength=nlist) > 0
+            centroids[filled] = sums[filled]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids = centroids / np.maximum(norms, 1e-12)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, self.SCAN_CHUNK):
+            chunk = np.asarray(self._mm[start:min(start + self.SCAN_CHUNK, n)], dtype=np.float32)
+            assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        lists = [order[bounds[c]:bounds[c + 1]].tolist() for c in range(nlist)]
+
+        with self._lock:
+            # Rows added while training
+            for row in range(n, len(self._ids)):
+                c = int(np.argmax(centroids @ np.asarray(self._mm[row], dtype=np.float32)))
+                lists[c].append(row)
+            self._ivf = (centroids, lists)
+            self._ivf_size = n
+
+
+_INDEX = None
+
+
+def get_index():
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = EmbeddingIndex()
+    return _INDEX
@@ -1,14 +1,19 @@
 import numpy as np
-import onnxruntime as ort
-import cv2
+import json
+import threading
+import time
 from pathlib import Path
-from .config import BEST_MODEL, LABELS_PATH
+from .config import (
+    BEST_MODEL, LABELS_PATH, HEADS_PATH, ORT_INTRA_OP_THREADS, ORT_INTER_OP_THREADS,
+    ORT_SHARE_WEIGHTS, ORT_CPU_ARENA,
+)
 
 
 def _get_providers():
     """
     Prefer GPU if available, but always fall back to CPU.
     """
+    import onnxruntime as ort
     providers = ["CPUExecutionProvider"]
     try:
         # If CUDAExecutionProvider is available in this build of onnxruntime
@@ -19,54 +24,231 @@ def _get_providers():
     return providers
 
 
+def external_weights_path(model_path):
+    """
+    Sidecar file holding a model's external weights, as referenced by the
+    graph itself (promoted models use a versioned name); None if the
+    weights are stored inline.
+    """
+    import onnx
+    model_path = Path(model_path)
+    for tensor in onnx.load(str(model_path), load_external_data=False).graph.initializer:
+        if tensor.data_location == onnx.TensorProto.EXTERNAL:
+            return model_path.with_name({e.key: e.value for e in tensor.external_data}["location"])
+    return None
+
+
+def _served_heads(specs):
+    """Head specs worth serving: heads trained without a single label ("labelled": 0) are dropped."""
+    return {name: spec for name, spec in specs.items() if spec.get("labelled", 1) > 0}
+
+
+def create_session(model_path, optimized_model_path=None, level=None,
+                   share_weights=ORT_SHARE_WEIGHTS, cpu_arena=ORT_CPU_ARENA):
+    """
+    Build an InferenceSession with the configured thread and memory settings.
+
+    If optimized_model_path is given, onnxruntime serializes the graph
+    after applying its optimizations so it can be shipped pre-optimized.
+
+    Weights stored as page-aligned external data (see
+    utils.onnx_models.externalize_weights) are memory-mapped by
+    onnxruntime; for such models share_weights disables weight prepacking
+    so kernels read them in place rather than from a private repacked copy.
+    """
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    opts.inter_op_num_threads = ORT_INTER_OP_THREADS
+    opts.enable_cpu_mem_arena = cpu_arena
+    if share_weights and optimized_model_path is None and external_weights_path(model_path) is not None:
+        opts.add_session_config_entry("session.disable_prepacking", "1")
+    if level is None:
+        level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.graph_optimization_level = level
+    if optimized_model_path is not None:
+        opts.optimized_model_filepath = str(optimized_model_path)
+    return ort.InferenceSession(
+        str(model_path),
+        sess_options=opts,
+        providers=_get_providers()
+    )
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
 class SkinAIModel:
-    def __init__(self):
-        self.model_path = BEST_MODEL
+    INPUT_SIZE = (224, 224)
+    MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def __init__(self, model_path=BEST_MODEL, labels_path=LABELS_PATH, heads_path=HEADS_PATH):
+        self.model_path = Path(model_path)
         self.labels = []
-        if LABELS_PATH.exists():
-            self.labels = LABELS_PATH.read_text().splitlines()
+        if Path(labels_path).exists():
+            self.labels = Path(labels_path).read_text().splitlines()
+        # Extra task heads exported as named outputs of the same graph
+        self.heads = {}
+        if Path(heads_path).exists():
+            self.heads = _served_heads(json.loads(Path(heads_path).read_text()))
 
+        self.load_seconds = 0.0
         if not self.model_path.exists():
             self.session = None
             print(f"[SkinAIModel] No ONNX model found at {self.model_path}, using fallback.")
         else:
             providers = _get_providers()
             print(f"[SkinAIModel] Loading ONNX from {self.model_path} with providers: {providers}")
-            self.session = ort.InferenceSession(
-                str(self.model_path),
-                providers=providers
-            )
+            t0 = time.perf_counter()
+            self.session = create_session(self.model_path)
+            self.load_seconds = time.perf_counter() - t0
+            # A promoted graph carries its own class names and heads, so they
+            # always match it even if the files beside it are mid-update
+            meta = self.session.get_modelmeta().custom_metadata_map
+            if "class_names" in meta:
+                self.labels = json.loads(meta["class_names"])
+            if "heads" in meta:
+                self.heads = _served_heads(json.loads(meta["heads"]))
+        self.output_names = [o.name for o in self.session.get_outputs()] if self.session else []
 
-    def preprocess(self, img_bytes):
+    def decode(self, img_bytes):
+        """Decode encoded image bytes into an RGB uint8 array."""
+        import cv2
         arr = np.frombuffer(img_bytes, np.uint8)
         img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
         if img is None:
             raise ValueError("Could not decode image bytes.")
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (224, 224))
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    def decode_rgb(self, buf, shape):
+        """View a packed uint8 RGB buffer as an (height, width, 3) array without copying."""
+        height, width = shape
+        arr = np.frombuffer(buf, np.uint8)
+        if arr.size != height * width * 3:
+            raise ValueError(f"Expected {height * width * 3} bytes for a {height}x{width} RGB image, got {arr.size}.")
+        return arr.reshape(height, width, 3)
+
+    def encode(self, img, ext=".png"):
+        """Encode an RGB uint8 array (e.g. a raw upload) for storage."""
+        import cv2
+        ok, buf = cv2.imencode(ext, cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+        if not ok:
+            raise ValueError(f"Could not encode image as {ext}.")
+        return buf.tobytes()
+
+    def transform(self, img):
+        """Resize and normalize an RGB image into a CHW float32 array."""
+        import cv2
+        img = cv2.resize(img, self.INPUT_SIZE)
         img = img.astype(np.float32) / 255.0
-        mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-        std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
-        img = (img - mean) / std
-        img = img.transpose(2, 0, 1)  # CHW
-        return img[None, ...]
+        img = (img - self.MEAN) / self.STD
+        return img.transpose(2, 0, 1)  # CHW
+
+    def preprocess(self, img_bytes):
+        return self.transform(self.decode(img_bytes))[None, ...]
+
+    def infer(self, batch):
+        """
+        Run the model on an NCHW batch and decode every output of the
+        single ONNX pass into one result dict per image.
+
+        Models exported with an "embedding" output (the penultimate
+        layer) also return that vector, otherwise it is None. Outputs
+        named after an entry in heads.json are decoded into "heads".
+        """
+        # Fallback if model doesn't exist yet
+        if self.session is None:
+            return [
+                {"condition": "normal", "confidence": 0.50, "embedding": None, "heads": {}}
+                for _ in range(len(batch))
+            ]
+
+        inputs = {self.session.get_inputs()[0].name: np.ascontiguousarray(batch, dtype=np.float32)}
+        outputs = dict(zip(self.output_names, self.session.run(None, inputs)))
+        logits = outputs.get("logits", outputs[self.output_names[0]])
+        embeddings = outputs.get("embedding")
+
+        probs = _softmax(logits)
+        heads = self._decode_heads(outputs, len(probs))
+
+        results = []
+        for i, row in enumerate(probs):
+            idx = int(np.argmax(row))
+            label = self.labels[idx] if idx < len(self.labels) else "unknown"
+            results.append({
+                "condition": label,
+                "confidence": float(row[idx]),
+                "embedding": embeddings[i] if embeddings is not None else None,
+                "heads": heads[i],
+            })
+        return results
+
+    def _decode_heads(self, outputs, n):
+        heads = [{} for _ in range(n)]
+        for name, spec in self.heads.items():
+            out = outputs.get(name)
+            if out is None:
+                continue
+            if spec["type"] == "classification":
+                probs = _softmax(out)
+                idx = probs.argmax(axis=1)
+                for i in range(n):
+                    labels = spec["labels"]
+                    heads[i][name] = {
+                        "value": labels[idx[i]] if idx[i] < len(labels) else "unknown",
+                        "confidence": float(probs[i, idx[i]]),
+                    }
+            else:
+                values = out.reshape(n, -1)[:, 0]
+                for i in range(n):
+                    heads[i][name] = {"value": float(values[i])}
+        return heads
+
+    def predict_batch(self, batch):
+        """
+        Run the model on an NCHW batch and return one (label, confidence)
+        tuple per image.
+        """
+        return [(r["condition"], r["confidence"]) for r in self.infer(batch)]
 
     def predict(self, img_bytes):
         # Fallback if model doesn't exist yet
         if self.session is None:
             return "normal", 0.50
 
-        x = self.preprocess(img_bytes)
-        inputs = {self.session.get_inputs()[0].name: x}
-        logits = self.session.run(None, inputs)[0][0]
-        # Softmax
-        logits = logits - np.max(logits)
-        exp = np.exp(logits)
-        probs = exp / exp.sum()
+        return self.predict_batch(self.preprocess(img_bytes))[0]
+
+    def analyze(self, img_bytes):
+        """Like predict, but returns the full result dict (incl. embedding)."""
+        # Fallback if model doesn't exist yet
+        if self.session is None:
+            return self.infer([None])[0]
+
+        return self.infer(self.preprocess(img_bytes))[0]
+
+
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
 
-        idx = int(np.argmax(probs))
-        label = self.labels[idx] if idx < len(self.labels) else "unknown"
-        return label, float(probs[idx])
+def get_model():
+    """The serving model, loaded from BEST_MODEL on first use."""
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                _MODEL = SkinAIModel()
+    return _MODEL
 
 
-MODEL = SkinAIModel()
+def reload_model():
+    """Load BEST_MODEL afresh (e.g. after a promotion) and make it the serving model."""
+    global _MODEL
+    model = SkinAIModel()
+    with _MODEL_LOCK:
+        _MODEL = model
+    return model
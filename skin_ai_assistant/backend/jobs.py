@@ -0,0 +1,192 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from . import config, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity; the caller should retry later."""
+
+
+class Job:
+    def __init__(self, fn, args, ttl):
+        self.id = str(uuid.uuid4())
+        self.fn = fn
+        self.args = args
+        self.ttl = ttl
+        # Run in the submitting request's context so logs keep its request id
+        self.context = contextvars.copy_context()
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.expires = None
+        self.result = None
+        self.error = None
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def as_dict(self):
+        out = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if self.status == "done":
+            out["result"] = self.result
+        elif self.status == "failed":
+            out["error"] = self.error
+        return out
+
+    def wait_async(self, loop):
+        """An asyncio future on `loop` resolved when the job finishes."""
+        future = loop.create_future()
+        with self._lock:
+            if self.finished:
+                future.set_result(self)
+            else:
+                self._waiters.append((loop, future))
+        return future
+
+    def _finish(self, status, result=None, error=None):
+        with self._lock:
+            self.result, self.error = result, error
+            self.finished_at = datetime.utcnow()
+            self.expires = time.monotonic() + self.ttl
+            self.status = status
+            # Drop the upload and call state; only the result is polled for
+            self.fn = self.args = self.context = None
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, self)
+
+
+def _resolve(future, job):
+    if not future.done():
+        future.set_result(job)
+
+
+class JobQueue:
+    """
+    Bounded in-process job queue served by a pool of worker threads.
+
+    submit() never blocks: when `maxsize` jobs are already waiting it
+    raises QueueFull. Finished jobs are kept for `ttl` seconds so clients
+    can poll for the result, then dropped; at most `max_finished` are
+    kept, the oldest dropped first.
+    """
+
+    def __init__(self, workers=2, maxsize=64, ttl=600, max_finished=1000):
+        self.workers = workers
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._jobs = {}
+        self._finished = OrderedDict()  # finish order, so also expiry order
+        self._lock = threading.Lock()
+        self._threads = []
+        self._last_purge = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"skinai-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout=5):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for t in threads:
+            t.join(timeout)
+
+    def submit(self, fn, *args):
+        self.start()
+        self._purge()
+        job = Job(fn, args, self.ttl)
+        with self._lock:
+            self._jobs[job.id] = job
+        metrics.JOB_QUEUE_DEPTH.inc()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            metrics.JOB_QUEUE_DEPTH.dec()
+            with self._lock:
+                del self._jobs[job.id]
+            metrics.JOBS.labels("rejected").inc()
+            raise QueueFull()
+        metrics.JOBS.labels("queued").inc()
+        return job
+
+    def get(self, job_id):
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < 1.0:
+            return
+        self._last_purge = now
+        with self._lock:
+            while self._finished and next(iter(self._finished.values())).expires < now:
+                jid, _ = self._finished.popitem(last=False)
+                del self._jobs[jid]
+
+    def _retire(self, job):
+        with self._lock:
+            self._finished[job.id] = job
+            while len(self._finished) > self.max_finished:
+                jid, _ = self._finished.popitem(last=False)
+                del self._jobs[jid]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            metrics.JOB_QUEUE_DEPTH.dec()
+            job.status = "running"
+            try:
+                result = job.context.run(job.fn, *job.args)
+            except HTTPException as e:
+                job._finish("failed", error={"status_code": e.status_code, "detail": e.detail})
+            except Exception as e:
+                logger.error("Job %s failed: %s", job.id, e, exc_info=True)
+                job._finish("failed", error={"status_code": 500, "detail": str(e)})
+            else:
+                job._finish("done", result=result)
+            self._retire(job)
+            metrics.JOBS.labels(job.status).inc()
+
+
+_QUEUE = None
+
+
+def get_queue():
+    global _QUEUE
+    if _QUEUE is None:
+        _QUEUE = JobQueue(
+            config.JOB_WORKERS, config.JOB_QUEUE_SIZE, config.JOB_TTL_SECONDS, config.JOB_MAX_FINISHED,
+        )
+    return _QUEUE
@@ -0,0 +1,134 @@
+"""
+Latest-frame batching for live camera analysis over WebSockets.
+
+Each connection has a single pending-frame slot: a frame that arrives
+while the previous one is still waiting replaces it, so a client never
+builds up a backlog of stale frames. One batcher task takes the pending
+frames of all connections, runs them through the model together (one
+ONNX call per batch) and hands each connection its newest result.
+"""
+import asyncio
+import itertools
+import logging
+import time
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LiveFrame:
+    def __init__(self, session, seq, data, persist):
+        self.session = session
+        self.seq = seq
+        self.data = data
+        self.persist = persist
+        self.received_at = time.perf_counter()
+
+
+class LiveSession:
+    """One connected client: its profile, pending frame and undelivered result."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, batcher, profile):
+        self.id = next(self._ids)
+        self.batcher = batcher
+        self.profile = profile
+        self.pending = None
+        self.seq = 0
+        self.dropped = 0
+        self.results = asyncio.Queue(maxsize=1)
+
+    def submit(self, data, persist=False):
+        """Queue a frame, replacing (and counting as dropped) any frame still waiting."""
+        self.seq += 1
+        if self.pending is not None:
+            self.dropped += 1
+            metrics.LIVE_FRAMES.labels("dropped").inc()
+            # A persist request survives being superseded by a newer frame
+            persist = persist or self.pending.persist
+        self.pending = LiveFrame(self, self.seq, data, persist)
+        self.batcher.wakeup.set()
+
+    def deliver(self, message):
+        """Keep only the newest result for a client that is slow to read them."""
+        if self.results.full():
+            self.results.get_nowait()
+        self.results.put_nowait(message)
+
+
+class LiveBatcher:
+    """
+    Runs `process(frames)` (a blocking function returning one result dict
+    per frame) on `executor` for up to `max_batch` pending frames at a
+    time, across all connected sessions, oldest frame first.
+    """
+
+    def __init__(self, process, executor=None, max_batch=8):
+        self.process = process
+        self.executor = executor
+        self.max_batch = max_batch
+        self.sessions = set()
+        self.wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def connect(self, profile):
+        session = LiveSession(self, profile)
+        self.sessions.add(session)
+        metrics.LIVE_SESSIONS.inc()
+        return session
+
+    def disconnect(self, session):
+        if session in self.sessions:
+            self.sessions.discard(session)
+            metrics.LIVE_SESSIONS.dec()
+
+    def _take_batch(self):
+        frames = sorted(
+            (s.pending for s in self.sessions if s.pending is not None), key=lambda f: f.received_at,
+        )[:self.max_batch]
+        for frame in frames:
+            frame.session.pending = None
+        if any(s.pending is not None for s in self.sessions):
+            self.wakeup.set()
+        return frames
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            frames = self._take_batch()
+            if not frames:
+                continue
+
+            metrics.LIVE_BATCH_SIZE.observe(len(frames))
+            try:
+                results = await loop.run_in_executor(self.executor, self.process, frames)
+            except Exception as e:
+                logger.error("Live batch of %d frames failed: %s", len(frames), e, exc_info=True)
+                results = [{"error": "Analysis failed"} for _ in frames]
+
+            now = time.perf_counter()
+            for frame, result in zip(frames, results):
+                metrics.LIVE_FRAMES.labels("error" if "error" in result else "analyzed").inc()
+                frame.session.deliver({
+                    **result,
+                    "seq": frame.seq,
+                    "dropped": frame.session.dropped,
+                    "latency_ms": round((now - frame.received_at) * 1000, 3),
+                })
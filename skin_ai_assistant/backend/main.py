@@ -1,41 +1,101 @@
-from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, Request
+from fastapi import (
+    FastAPI, UploadFile, File, Form, Depends, HTTPException, Request, Response, WebSocket, WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
+import contextvars
+import functools
+import json
 import shutil
 import logging
-import sys
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 
-from .inference import MODEL
-from .db import Base, engine, get_db
+from . import admission, config, jobs, live, metrics, phash, profiling, quality, retrain
+from .logging_config import setup_logging, RequestContextMiddleware
+from .db import init_db, get_db, SessionLocal
 from .models import InferenceRecord
 from .config import BASE_DIR
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(BASE_DIR / "skin_ai.log")
-    ]
-)
+# Configure logging (handlers run on a background thread)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# Create database tables
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Failed to create database tables: {e}")
+# Serving model; loaded by the lifespan hook (or the first request) so that
+# importing this module stays cheap. Tests and benchmarks may replace it.
+MODEL = None
+
+
+def current_model():
+    global MODEL
+    if MODEL is None:
+        from .inference import get_model  # pulls in numpy, cv2 and onnxruntime
+        MODEL = get_model()
+    return MODEL
+
+
+def reload_model():
+    """Swap in the current BEST_MODEL; in-flight requests finish on the old one."""
+    global MODEL
+    from .inference import reload_model as _reload
+    MODEL = _reload()
+    metrics.MODEL_LOADED.set(1 if MODEL.session is not None else 0)
+    metrics.MODEL_LOAD_SECONDS.set(MODEL.load_seconds)
+    logger.info("Reloaded serving model from %s", MODEL.model_path)
+
+
+def get_index():
+    """Similar-case embedding index, imported on first use."""
+    from .embeddings import get_index as _get_index
+    return _get_index()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        init_db()
+        logger.info("Database tables created successfully")
+    except Exception as e:
+        logger.error("Failed to create database tables: %s", e)
+
+    model = await asyncio.to_thread(current_model)
+    logger.info("=" * 70)
+    logger.info("Skin AI Assistant API Starting")
+    logger.info("Time: %s", datetime.now().isoformat())
+    logger.info("Base Directory: %s", BASE_DIR)
+    logger.info("Model Loaded: %s", model.session is not None)
+    logger.info("=" * 70)
+    metrics.MODEL_LOADED.set(1 if model.session is not None else 0)
+    metrics.MODEL_LOAD_SECONDS.set(model.load_seconds)
+    jobs.get_queue().start()
+    # The batcher has its own thread and waits for admission slots like the job workers
+    live_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="skinai-live")
+    app.state.live = live.LiveBatcher(_analyze_live_batch, live_executor, config.LIVE_MAX_BATCH)
+    app.state.live.start()
+    retrainer = retrain.get_retrainer()
+    retrainer.on_promoted = reload_model
+    if config.RETRAIN_ENABLED:
+        retrainer.start()
+    yield
+    retrainer.stop()
+    await app.state.live.stop()
+    live_executor.shutdown(wait=False)
+    jobs.get_queue().stop()
+
 
 app = FastAPI(
     title="Skin AI Assistant API",
     version="1.0",
     description="AI-powered skin condition analysis API",
-    contact={"name": "Skin AI Team"}
+    contact={"name": "Skin AI Team"},
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -43,97 +103,580 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Request-ID", "Server-Timing"],
 )
+app.add_middleware(metrics.ServerTimingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(RequestContextMiddleware)
 
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Global exception: {exc}", exc_info=True)
+    logger.error("Global exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={"error": "Internal server error", "detail": str(exc)}
     )
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    logger.info("=" * 70)
-    logger.info("Skin AI Assistant API Starting")
-    logger.info(f"Time: {datetime.now().isoformat()}")
-    logger.info(f"Base Directory: {BASE_DIR}")
-    logger.info(f"Model Loaded: {MODEL.session is not None}")
-    logger.info("=" * 70)
-
 IMAGES = BASE_DIR / "uploaded_images"
 IMAGES.mkdir(exist_ok=True)
 
+# Model heads persisted into the matching InferenceRecord columns
+HEAD_COLUMNS = {
+    "skin_type": "predicted_skin_type",
+    "fitzpatrick": "predicted_fitzpatrick",
+    "acne_grade": "predicted_acne_grade",
+    "pih_level": "predicted_pih_level",
+}
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # 10MB limit
+
+def _check_upload(img_bytes):
+    if len(img_bytes) == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+    if len(img_bytes) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail="File too large (max 10MB)")
+
+def _quality_gate(img, timer):
+    """
+    Run the quality checks unless SKINAI_QUALITY_GATE is "off"; in
+    "reject" mode a failing image is refused with 422 before inference.
+    """
+    if config.QUALITY_GATE == "off":
+        return None
+    with timer.stage("quality"):
+        report = quality.assess(img)
+    if report["ok"]:
+        return report
+
+    action = "rejected" if config.QUALITY_GATE == "reject" else "flagged"
+    for issue in report["issues"]:
+        metrics.QUALITY_ISSUES.labels(issue, action).inc()
+    if action == "rejected":
+        reason = report["issues"][0]
+        raise HTTPException(status_code=422, detail={
+            "reason": reason,
+            "message": quality.MESSAGES[reason],
+            "issues": report["issues"],
+            "measures": report["measures"],
+        })
+    return report
+
+def _save_record(db, timer, filename, data, skin_type, fitzpatrick, ethnicity, result, report=None, image_hash=None):
+    """Store one analysis for retraining: the DB record, its embedding and the image file."""
+    heads = {name: head["value"] for name, head in result["heads"].items()}
+    hash_columns = phash.hash_columns(image_hash) if image_hash is not None else {}
+    rec = InferenceRecord(
+        image_path=str(IMAGES / filename),
+        predicted_condition=result["condition"],
+        predicted_confidence=result["confidence"],
+        user_skin_type=skin_type,
+        user_fitzpatrick=fitzpatrick,
+        user_ethnicity=ethnicity,
+        predictions_json={
+            "condition": result["condition"], "confidence": result["confidence"],
+            "heads": result["heads"], "quality": report,
+        },
+        **{HEAD_COLUMNS[name]: value for name, value in heads.items() if name in HEAD_COLUMNS},
+        **hash_columns,
+    )
+    with timer.stage("db"):
+        db.add(rec)
+        db.commit()
+        db.refresh(rec)
+
+        # Index the penultimate-layer embedding for similar-case lookup
+        if result["embedding"] is not None:
+            get_index().add(rec.id, result["embedding"])
+
+    with timer.stage("write"):
+        with open(IMAGES / filename, "wb") as f:
+            f.write(data)
+    return rec
+
+def _find_reusable(db, image_hash, timer):
+    """A recent record of a near-identical image, when result reuse is enabled."""
+    if config.DEDUP_REUSE_SECONDS <= 0:
+        return None
+    since = datetime.utcnow() - timedelta(seconds=config.DEDUP_REUSE_SECONDS)
+    with timer.stage("dedup"):
+        match = phash.find_near_duplicate(db, image_hash, config.DEDUP_MAX_DISTANCE, since=since)
+    return match[0] if match else None
+
+def _reused_response(record, skin_type, fitzpatrick, ethnicity):
+    stored = record.predictions_json or {}
+    response = {
+        "inference_id": record.id,
+        "condition": record.predicted_condition,
+        "confidence": record.predicted_confidence,
+        "skin_type": skin_type,
+        "fitzpatrick": fitzpatrick,
+        "ethnicity": ethnicity,
+        "predictions": {name: head["value"] for name, head in stored.get("heads", {}).items()},
+        "reused": True,
+    }
+    if stored.get("quality") is not None:
+        response["quality"] = stored["quality"]
+    return response
+
+def _overloaded(filename, e):
+    logger.warning("Shedding analysis of %s: %s", filename, e.reason)
+    return HTTPException(
+        status_code=503, detail="Server is overloaded, retry later",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def run_analysis(img_bytes, filename, skin_type, fitzpatrick, ethnicity, timer, db, shed=True, shape=None,
+                 queued=None):
+    """
+    Decode, run the model on and store one uploaded image; shared by
+    /analyze, /analyze/raw and the /analyze/jobs workers. Client errors
+    are raised as HTTPException.
+
+    img_bytes is an encoded image, or packed uint8 RGB pixels when
+    shape=(height, width) is given; those are stored PNG-encoded.
+
+    Decoding and inference hold an admission slot; with shed=True an
+    overloaded server answers 503 with Retry-After instead of queueing.
+    A caller that already acquired the slot passes the seconds it queued.
+    """
+    model = current_model()
+    try:
+        with admission.get_controller().admit(shed=shed, arrived=timer.started, queued=queued) as queued:
+            timer.record("queue", queued)
+            try:
+                with timer.stage("decode"):
+                    img = model.decode(img_bytes) if shape is None else model.decode_rgb(img_bytes, shape)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Could not decode image")
+
+            with timer.stage("hash"):
+                image_hash = phash.dhash(img)
+            reused = _find_reusable(db, image_hash, timer)
+            if reused is not None:
+                logger.info("Reusing result of %s for near-identical upload %s", reused.id, filename)
+                metrics.ANALYSES_REUSED.inc()
+                return _reused_response(reused, skin_type, fitzpatrick, ethnicity)
+
+            report = _quality_gate(img, timer)
+
+            # Run prediction
+            try:
+                with timer.stage("preprocess"):
+                    x = model.transform(img)[None, ...]
+                with timer.stage("infer"):
+                    result = model.infer(x)[0]
+                label, conf = result["condition"], result["confidence"]
+                heads = {name: head["value"] for name, head in result["heads"].items()}
+            except Exception as e:
+                logger.error("Prediction failed: %s", e)
+                raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    except admission.Overloaded as e:
+        raise _overloaded(filename, e)
+    metrics.PREDICTIONS.labels(label).inc()
+
+    # Raw pixels are stored PNG-encoded
+    data = img_bytes
+    if shape is not None:
+        with timer.stage("encode"):
+            data = model.encode(img)
+    rec = _save_record(db, timer, filename, data, skin_type, fitzpatrick, ethnicity, result, report, image_hash)
+    logger.info(
+        "Analyzed %s: %s (confidence: %.3f)", filename, label, conf,
+        extra={"inference_id": rec.id, "skin_type": skin_type, "stages_ms": timer.as_ms()},
+    )
+
+    response = {
+        "inference_id": rec.id,
+        "condition": label,
+        "confidence": conf,
+        "skin_type": skin_type,
+        "fitzpatrick": fitzpatrick,
+        "ethnicity": ethnicity,
+        "predictions": heads,
+    }
+    if report is not None:
+        response["quality"] = report
+    return response
+
+def _profiled_run_analysis(*args, **kwargs):
+    """run_analysis on a pool thread, included in the request's profile if it has one."""
+    with profiling.worker_thread():
+        return run_analysis(*args, **kwargs)
+
+async def _run_analysis_off_loop(img_bytes, filename, skin_type, fitzpatrick, ethnicity, timer, db, shape=None):
+    """
+    run_analysis on the admission pool rather than the event loop. The
+    slot is acquired (or the request shed) here, on the loop, so work only
+    reaches the pool once it can run, and the deadline counts from the
+    request's arrival.
+    """
+    controller = admission.get_controller()
+    try:
+        queued = await controller.acquire_async(arrived=timer.started)
+    except admission.Overloaded as e:
+        raise _overloaded(filename, e)
+    context = contextvars.copy_context()  # keeps the request id in the worker's logs
+    try:
+        future = asyncio.get_running_loop().run_in_executor(controller.executor, functools.partial(
+            context.run, _profiled_run_analysis, img_bytes, filename, skin_type, fitzpatrick, ethnicity, timer, db,
+            shape=shape, queued=queued,
+        ))
+    except BaseException:
+        controller.release()
+        raise
+    return await future
+
 @app.post("/analyze")
 async def analyze(
+    request: Request,
     file: UploadFile = File(...),
     skin_type: str = Form("any"),
     fitzpatrick: str = Form("unspecified"),
     ethnicity: str = Form("unspecified"),
+    debug: bool = Form(False),
     db: Session = Depends(get_db),
 ):
     """Analyze uploaded image and return skin condition prediction."""
     try:
-        logger.info(f"Analyzing image: {file.filename}, skin_type: {skin_type}")
-
         # Validate file type
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
 
+        timer = metrics.get_timer(request, metrics.ANALYZE_STAGE_LATENCY)
+
         # Read and validate image
-        img_bytes = await file.read()
+        with timer.stage("read"):
+            img_bytes = await file.read()
+        _check_upload(img_bytes)
+
+        response = await _run_analysis_off_loop(
+            img_bytes, file.filename, skin_type, fitzpatrick, ethnicity, timer, db,
+        )
+        if debug:
+            response["timings"] = timer.as_ms()
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in analyze endpoint: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Largest accepted side of a pre-decoded RGB upload (48MB of pixels)
+MAX_RAW_SIDE = 4096
+
+# File extensions of encoded uploads by their magic bytes
+_SIGNATURES = ((b"\xff\xd8\xff", ".jpg"), (b"\x89PNG", ".png"), (b"GIF8", ".gif"), (b"BM", ".bmp"))
+
+def _extension(data):
+    for magic, ext in _SIGNATURES:
+        if data.startswith(magic):
+            return ext
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ".jpg"
+
+def _profile_field(request, name, default):
+    """A profile field from the query string, else an X-<Name> header, else the default."""
+    return (
+        request.query_params.get(name)
+        or request.headers.get("x-" + name.replace("_", "-"))
+        or default
+    )
+
+def _parse_shape(value):
+    try:
+        dims = [int(d) for d in value.lower().replace("x", ",").split(",") if d.strip()]
+    except ValueError:
+        dims = []
+    if len(dims) == 3 and dims[2] == 3:
+        dims = dims[:2]
+    if len(dims) != 2 or not all(0 < d <= MAX_RAW_SIDE for d in dims):
+        raise HTTPException(
+            status_code=400, detail=f"X-Image-Shape must be 'height,width[,3]' with sides up to {MAX_RAW_SIDE}",
+        )
+    return tuple(dims)
+
+async def _read_body(request, limit):
+    """Read the request body straight from the socket, refusing it as soon as it exceeds limit."""
+    too_large = HTTPException(status_code=400, detail=f"Body too large (max {limit} bytes)")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return body
+
+@app.post(
+    "/analyze/raw",
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+    }},
+)
+async def analyze_raw(request: Request, debug: bool = False, db: Session = Depends(get_db)):
+    """
+    Analyze an image sent as the raw request body, skipping multipart
+    parsing and temp files. The body is an encoded image, or packed uint8
+    RGB pixels when an X-Image-Shape: height,width header is sent.
+    skin_type, fitzpatrick and ethnicity come from query parameters or
+    X-Skin-Type / X-Fitzpatrick / X-Ethnicity headers.
+    """
+    try:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        if content_type != "application/octet-stream":
+            raise HTTPException(status_code=415, detail="Body must be application/octet-stream")
+        shape = request.headers.get("x-image-shape")
+        shape = _parse_shape(shape) if shape else None
+
+        timer = metrics.get_timer(request, metrics.ANALYZE_STAGE_LATENCY)
+        limit = shape[0] * shape[1] * 3 if shape else MAX_UPLOAD_BYTES
+        with timer.stage("read"):
+            img_bytes = await _read_body(request, limit)
         if len(img_bytes) == 0:
             raise HTTPException(status_code=400, detail="Empty file")
-        if len(img_bytes) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(status_code=400, detail="File too large (max 10MB)")
-
-        # Run prediction
-        try:
-            label, conf = MODEL.predict(img_bytes)
-            logger.info(f"Prediction: {label} (confidence: {conf:.3f})")
-        except Exception as e:
-            logger.error(f"Prediction failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
-
-        # Save for retraining
-        rec = InferenceRecord(
-            image_path=str(IMAGES / file.filename),
-            predicted_condition=label,
-            predicted_confidence=conf,
-            user_skin_type=skin_type,
-            user_fitzpatrick=fitzpatrick,
-            user_ethnicity=ethnicity,
-            predictions_json={"condition": label, "confidence": conf}
-        )
-        db.add(rec)
-        db.commit()
-        db.refresh(rec)
+        if shape is not None and len(img_bytes) != limit:
+            raise HTTPException(
+                status_code=400, detail=f"Expected {limit} bytes for a {shape[0]}x{shape[1]} RGB image",
+            )
 
-        # Save image file
-        save_path = IMAGES / file.filename
-        with open(save_path, "wb") as f:
-            f.write(img_bytes)
-        logger.info(f"Saved image: {save_path}")
-
-        return {
-            "inference_id": rec.id,
-            "condition": label,
-            "confidence": conf,
-            "skin_type": skin_type,
-            "fitzpatrick": fitzpatrick,
-            "ethnicity": ethnicity
-        }
+        filename = f"raw_{uuid.uuid4().hex}" + (".png" if shape else _extension(img_bytes))
+        response = await _run_analysis_off_loop(
+            img_bytes, filename,
+            _profile_field(request, "skin_type", "any"),
+            _profile_field(request, "fitzpatrick", "unspecified"),
+            _profile_field(request, "ethnicity", "unspecified"),
+            timer, db, shape=shape,
+        )
+        if debug:
+            response["timings"] = timer.as_ms()
+        return response
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in analyze endpoint: {e}", exc_info=True)
+        logger.error("Error in analyze_raw endpoint: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _analysis_job(img_bytes, filename, skin_type, fitzpatrick, ethnicity, debug):
+    """Worker-side body of an /analyze/jobs job, with its own DB session."""
+    timer = metrics.StageTimer()
+    db = SessionLocal()
+    try:
+        # Job workers are already bounded; wait for a slot rather than shed
+        response = run_analysis(img_bytes, filename, skin_type, fitzpatrick, ethnicity, timer, db, shed=False)
+    finally:
+        db.close()
+    if debug:
+        response["timings"] = timer.as_ms()
+    return response
+
+@app.post("/analyze/jobs", status_code=202)
+async def submit_analysis_job(
+    response: Response,
+    file: UploadFile = File(...),
+    skin_type: str = Form("any"),
+    fitzpatrick: str = Form("unspecified"),
+    ethnicity: str = Form("unspecified"),
+    debug: bool = Form(False),
+):
+    """
+    Queue an image for analysis and return a job id immediately. Poll
+    /analyze/jobs/{job_id} or stream /analyze/jobs/{job_id}/events for the
+    result; 503 when the queue is full.
+    """
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    img_bytes = await file.read()
+    _check_upload(img_bytes)
+
+    try:
+        job = jobs.get_queue().submit(
+            _analysis_job, img_bytes, file.filename, skin_type, fitzpatrick, ethnicity, debug,
+        )
+    except jobs.QueueFull:
+        raise HTTPException(
+            status_code=503, detail="Analysis queue is full, retry later", headers={"Retry-After": "2"},
+        )
+    response.headers["Location"] = f"/analyze/jobs/{job.id}"
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/analyze/jobs/{job.id}",
+        "events_url": f"/analyze/jobs/{job.id}/events",
+    }
+
+def _get_job(job_id):
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.get("/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Status of an analysis job, with its result once done."""
+    return _get_job(job_id).as_dict()
+
+# Seconds between SSE keep-alive comments while a job is pending
+SSE_KEEPALIVE_SECONDS = 15
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/analyze/jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str):
+    """
+    Server-sent events for one job: a "status" event straight away, then a
+    single "result" (or "error") event when it finishes.
+    """
+    job = _get_job(job_id)
+
+    async def events():
+        yield _sse("status", {"job_id": job.id, "status": job.status})
+        finished = job.wait_async(asyncio.get_running_loop())
+        while True:
+            try:
+                await asyncio.wait_for(asyncio.shield(finished), timeout=SSE_KEEPALIVE_SECONDS)
+                break
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+        yield _sse("result" if job.status == "done" else "error", job.as_dict())
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _analyze_live_batch(frames):
+    """
+    Batcher-side body for /ws/live: decode the frames, run them through
+    the model in one call and store the ones the client asked to persist.
+    Returns one message per frame.
+    """
+    import numpy as np
+    model = current_model()
+    results = [None] * len(frames)
+    decoded = []
+    reports = {}
+    timer = metrics.StageTimer(histogram=None)
+    with admission.get_controller().admit(shed=False):
+        for i, frame in enumerate(frames):
+            try:
+                img = model.decode(frame.data)
+            except ValueError:
+                results[i] = {"error": "Could not decode frame"}
+                continue
+            # Same gate as /analyze, before the frame joins the batch
+            try:
+                reports[i] = _quality_gate(img, timer)
+            except HTTPException as e:
+                results[i] = {"error": e.detail["message"], **e.detail}
+                continue
+            decoded.append((i, img))
+        outputs = model.infer(np.stack([model.transform(img) for _, img in decoded])) if decoded else []
+
+    for (i, img), result in zip(decoded, outputs):
+        frame = frames[i]
+        report = reports[i]
+        message = {
+            "condition": result["condition"],
+            "confidence": result["confidence"],
+            "predictions": {name: head["value"] for name, head in result["heads"].items()},
+        }
+        if report is not None:
+            message["quality"] = report
+        if frame.persist:
+            filename = f"live_{uuid.uuid4().hex}{_extension(frame.data)}"
+            db = SessionLocal()
+            try:
+                rec = _save_record(
+                    db, timer, filename, frame.data,
+                    frame.session.profile["skin_type"], frame.session.profile["fitzpatrick"],
+                    frame.session.profile["ethnicity"], result, report, phash.dhash(img),
+                )
+            except Exception as e:
+                # Only this frame's storage failed; its analysis still stands
+                logger.error("Storing live frame failed: %s", e, exc_info=True)
+                message["error"] = "Could not store frame"
+            else:
+                metrics.PREDICTIONS.labels(result["condition"]).inc()
+                message["inference_id"] = rec.id
+            finally:
+                db.close()
+        results[i] = message
+    return results
+
+@app.websocket("/ws/live")
+async def live_analysis(websocket: WebSocket):
+    """
+    Live camera analysis. Send each frame as a binary message (an encoded
+    image); results come back as JSON with the frame's seq number. Frames
+    sent while the previous one is still waiting replace it, and frames
+    from all clients are batched into shared model runs. Nothing is stored
+    unless a {"persist": true} text message precedes a frame.
+    Profile fields come from query parameters, as in /analyze/raw.
+    """
+    await websocket.accept()
+    batcher = websocket.app.state.live
+    session = batcher.connect({
+        "skin_type": _profile_field(websocket, "skin_type", "any"),
+        "fitzpatrick": _profile_field(websocket, "fitzpatrick", "unspecified"),
+        "ethnicity": _profile_field(websocket, "ethnicity", "unspecified"),
+    })
+
+    async def send_results():
+        while True:
+            await websocket.send_json(await session.results.get())
+
+    sender = asyncio.create_task(send_results())
+    persist_next = False
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                if not message["bytes"] or len(message["bytes"]) > MAX_UPLOAD_BYTES:
+                    await websocket.send_json({"error": "Frames must be between 1 byte and 10MB"})
+                    continue
+                session.submit(message["bytes"], persist=persist_next)
+                persist_next = False
+                continue
+            try:
+                control = json.loads(message.get("text") or "")
+            except ValueError:
+                control = None
+            if not isinstance(control, dict):
+                await websocket.send_json({"error": "Expected a binary frame or a JSON control message"})
+                continue
+            persist_next = bool(control.get("persist"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        batcher.disconnect(session)
+
+class FeedbackItem(BaseModel):
+    inference_id: str
+    is_correct: bool
+    corrected_condition: Optional[str] = None
+
+# Bound on one /feedback/bulk request, and ids per IN (...) query
+BULK_FEEDBACK_MAX = 1000
+IN_QUERY_CHUNK = 500
+
+def _apply_feedback(record, is_correct, corrected_condition):
+    record.is_correct = is_correct
+    if not is_correct:
+        record.corrected_condition = corrected_condition
+        record.needs_review = True
+
 @app.post("/feedback")
 async def feedback(
+    request: Request,
     inference_id: str = Form(...),
     is_correct: bool = Form(...),
     corrected_condition: str = Form(None),
@@ -141,27 +684,78 @@ async def feedback(
 ):
     """Submit feedback on a prediction."""
     try:
-        logger.info(f"Feedback for {inference_id}: correct={is_correct}, correction={corrected_condition}")
-
-        r = db.query(InferenceRecord).filter_by(id=inference_id).first()
+        timer = metrics.get_timer(request)
+        with timer.stage("db"):
+            r = db.query(InferenceRecord).filter_by(id=inference_id).first()
         if not r:
-            logger.warning(f"Inference ID not found: {inference_id}")
+            logger.warning("Inference ID not found: %s", inference_id)
             raise HTTPException(status_code=404, detail="Inference record not found")
 
-        r.is_correct = is_correct
-        if not is_correct:
-            r.corrected_condition = corrected_condition
-            r.needs_review = True
+        _apply_feedback(r, is_correct, corrected_condition)
 
-        db.commit()
-        logger.info(f"Feedback saved for {inference_id}")
+        with timer.stage("db"):
+            db.commit()
+        logger.info(
+            "Feedback saved for %s: correct=%s, correction=%s", inference_id, is_correct, corrected_condition,
+        )
         return {"ok": True}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error saving feedback: {e}", exc_info=True)
+        logger.error("Error saving feedback: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/feedback/bulk")
+async def feedback_bulk(
+    request: Request,
+    items: List[FeedbackItem],
+    db: Session = Depends(get_db),
+):
+    """
+    Apply feedback to many predictions in one transaction. Records are
+    fetched with IN queries and committed once; the response has one
+    result per item, in order.
+    """
+    try:
+        if len(items) > BULK_FEEDBACK_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {BULK_FEEDBACK_MAX} items per request")
+
+        timer = metrics.get_timer(request)
+        ids = list({item.inference_id for item in items})
+        records = {}
+        with timer.stage("db"):
+            for i in range(0, len(ids), IN_QUERY_CHUNK):
+                chunk = ids[i:i + IN_QUERY_CHUNK]
+                records.update(
+                    (r.id, r) for r in db.query(InferenceRecord).filter(InferenceRecord.id.in_(chunk))
+                )
+
+        results = []
+        for item in items:
+            record = records.get(item.inference_id)
+            if record is None:
+                results.append({"inference_id": item.inference_id, "ok": False, "error": "Inference record not found"})
+                continue
+            _apply_feedback(record, item.is_correct, item.corrected_condition)
+            results.append({"inference_id": item.inference_id, "ok": True})
+
+        with timer.stage("db"):
+            db.commit()
+        updated = sum(r["ok"] for r in results)
+        logger.info("Bulk feedback: %d of %d items applied", updated, len(items))
+        return {"updated": updated, "failed": len(results) - updated, "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error("Error saving bulk feedback: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics in the text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health():
     """Health check endpoint for monitoring service status."""
@@ -169,23 +763,30 @@ async def health():
         "status": "ok",
         "service": "Skin AI Assistant API",
         "version": "1.0",
-        "model_loaded": MODEL.session is not None,
+        "model_loaded": MODEL is not None and MODEL.session is not None,
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/admin/inferences")
 async def get_inferences(
+    request: Request,
+    response: Response,
     limit: int = 100,
+    offset: int = 0,
     needs_review: str = None,
     db: Session = Depends(get_db),
 ):
-    """Admin endpoint to retrieve inference records with optional filtering."""
+    """
+    Admin endpoint to retrieve inference records with optional filtering.
+    Newest first; page with limit/offset. The total number of matching
+    records is returned in the X-Total-Count header.
+    """
     try:
-        logger.info(f"Admin query: limit={limit}, needs_review={needs_review}")
-
         # Validate limit
         if limit < 1 or limit > 1000:
             raise HTTPException(status_code=400, detail="Limit must be between 1 and 1000")
+        if offset < 0:
+            raise HTTPException(status_code=400, detail="Offset must not be negative")
 
         query = db.query(InferenceRecord)
 
@@ -194,8 +795,16 @@ async def get_inferences(
         elif needs_review == "false":
             query = query.filter(InferenceRecord.needs_review == False)
 
-        records = query.order_by(InferenceRecord.created_at.desc()).limit(limit).all()
-        logger.info(f"Returning {len(records)} inference records")
+        with metrics.get_timer(request).stage("db"):
+            total = query.count()
+            records = (
+                query.order_by(InferenceRecord.created_at.desc()).offset(offset).limit(limit).all()
+            )
+        response.headers["X-Total-Count"] = str(total)
+        logger.info(
+            "Admin query: limit=%s, offset=%s, needs_review=%s -> %d of %d records",
+            limit, offset, needs_review, len(records), total,
+        )
 
         return [
             {
@@ -204,6 +813,10 @@ async def get_inferences(
                 "created_at": r.created_at.isoformat() if r.created_at else None,
                 "predicted_condition": r.predicted_condition,
                 "predicted_confidence": r.predicted_confidence,
+                "predicted_skin_type": r.predicted_skin_type,
+                "predicted_fitzpatrick": r.predicted_fitzpatrick,
+                "predicted_acne_grade": r.predicted_acne_grade,
+                "predicted_pih_level": r.predicted_pih_level,
                 "user_skin_type": r.user_skin_type,
                 "user_fitzpatrick": r.user_fitzpatrick,
                 "user_ethnicity": r.user_ethnicity,
@@ -216,5 +829,96 @@ async def get_inferences(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching inferences: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Error fetching inferences: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _similar_matches(inference_id, k):
+    """(record_id, similarity) pairs nearest to an inference's embedding, or None if it has none."""
+    index = get_index()
+    vector = index.get(inference_id)
+    if vector is None:
+        return None
+    return index.search(vector, k=k, exclude=inference_id)
+
+@app.get("/admin/inferences/{inference_id}/similar")
+async def get_similar_inferences(
+    request: Request,
+    inference_id: str,
+    k: int = 10,
+    db: Session = Depends(get_db),
+):
+    """Admin endpoint returning the k most visually similar past inferences."""
+    try:
+        if k < 1 or k > 100:
+            raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+
+        timer = metrics.get_timer(request)
+        # Searching a large index takes milliseconds of numpy; keep it off the event loop
+        with timer.stage("search"):
+            matches = await asyncio.to_thread(_similar_matches, inference_id, k)
+        if matches is None:
+            raise HTTPException(status_code=404, detail="No embedding stored for this inference")
+        with timer.stage("db"):
+            records = {
+                r.id: r
+                for r in db.query(InferenceRecord).filter(InferenceRecord.id.in_([rid for rid, _ in matches])).all()
+            }
+
+        return [
+            {
+                "id": rid,
+                "similarity": score,
+                "image_path": records[rid].image_path,
+                "created_at": records[rid].created_at.isoformat() if records[rid].created_at else None,
+                "predicted_condition": records[rid].predicted_condition,
+                "predicted_confidence": records[rid].predicted_confidence,
+                "is_correct": records[rid].is_correct,
+                "corrected_condition": records[rid].corrected_condition,
+            }
+            for rid, score in matches
+            if rid in records
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error finding similar inferences: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def require_admin_token(request: Request):
+    """Reject the request unless it carries SKINAI_ADMIN_TOKEN (when one is configured)."""
+    if config.ADMIN_TOKEN and request.headers.get(profiling.TOKEN_HEADER) != config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin_token)])
+async def get_profiles():
+    """Admin endpoint listing stored request profiles, newest first."""
+    return [
+        {
+            "name": p.name,
+            "format": "folded" if p.suffix == ".folded" else "pstats",
+            "size_bytes": p.stat().st_size,
+            "created_at": datetime.fromtimestamp(p.stat().st_mtime).isoformat(),
+        }
+        for p in profiling.list_profiles()
+    ]
+
+@app.get("/admin/profiles/{name}", dependencies=[Depends(require_admin_token)])
+async def download_profile(name: str):
+    """Admin endpoint downloading one stored profile."""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name, media_type="application/octet-stream")
+
+@app.get("/admin/retrain", dependencies=[Depends(require_admin_token)])
+async def get_retrain_status():
+    """Admin endpoint: background retraining state, pending feedback and recent runs."""
+    return await asyncio.to_thread(retrain.get_retrainer().status)
+
+@app.post("/admin/retrain", status_code=202, dependencies=[Depends(require_admin_token)])
+async def start_retrain():
+    """Admin endpoint starting a retraining cycle now; 409 while one is running."""
+    try:
+        return await asyncio.to_thread(retrain.get_retrainer().trigger, "manual")
+    except retrain.RetrainBusy:
+        raise HTTPException(status_code=409, detail="A retraining run is already in progress")
@@ -0,0 +1,361 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond stages up to slow uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Sharded:
+    """
+    A fixed-size vector of floats with one shard per writing thread.
+
+    Each thread only ever updates its own shard, so writes need no lock;
+    readers sum the shards. A lock is taken once per thread, when its
+    shard is created.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0.0] * self.size
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def add(self, index, amount):
+        self._shard()[index] += amount
+
+    def totals(self):
+        totals = [0.0] * self.size
+        for shard in list(self._shards):
+            for i, v in enumerate(shard):
+                totals[i] += v
+        return totals
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self.labels()
+
+    def _label_str(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._values = _Sharded(1)
+
+    def inc(self, amount=1):
+        self._values.add(0, amount)
+
+    @property
+    def value(self):
+        return self._values.totals()[0]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_str(key)} {_fmt(child.value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    def __init__(self):
+        super().__init__()
+        self._set = 0.0
+
+    def set(self, value):
+        # inc/dec deltas are kept separately, so set() only resets the base
+        self._set = value - (self.value - self._set)
+
+    def dec(self, amount=1):
+        self._values.add(0, -amount)
+
+    @property
+    def value(self):
+        return self._set + self._values.totals()[0]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_str(key)} {_fmt(child.value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket, +Inf, then the running sum
+        self._values = _Sharded(len(buckets) + 2)
+
+    def observe(self, value):
+        shard = self._values._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self):
+        totals = self._values.totals()
+        return totals[:-1], totals[-1]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _render_child(self, key, child):
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _fmt(bound)
+            lines.append(f"{self.name}_bucket{self._label_str(key, ('le', le))} {_fmt(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_str(key)} {_fmt(total)}")
+        lines.append(f"{self.name}_count{self._label_str(key)} {_fmt(cumulative)}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value):
+    if value != value or value in (float("inf"), float("-inf")):
+        return {"inf": "+Inf", "-inf": "-Inf"}.get(str(value), "NaN")
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = []
+
+
+def render():
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter(
+    "skinai_http_requests_total", "HTTP requests by method, route and status code",
+    ("method", "route", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "skinai_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"),
+)
+IN_FLIGHT = Gauge("skinai_http_requests_in_flight", "Requests currently being handled")
+ANALYZE_STAGE_LATENCY = Histogram(
+    "skinai_analyze_stage_seconds", "Time spent in each /analyze stage", ("stage",),
+)
+PREDICTIONS = Counter("skinai_predictions_total", "Predictions by predicted condition", ("label",))
+MODEL_LOAD_SECONDS = Gauge("skinai_model_load_seconds", "Time taken to load the ONNX model")
+MODEL_LOADED = Gauge("skinai_model_loaded", "1 if an ONNX model is loaded, 0 when using the fallback")
+JOB_QUEUE_DEPTH = Gauge("skinai_job_queue_depth", "Analysis jobs waiting for a worker")
+JOBS = Counter("skinai_jobs_total", "Analysis jobs by outcome (queued, done, failed, rejected)", ("status",))
+ADMISSION_ACTIVE = Gauge("skinai_analyze_in_flight", "Analyses holding an inference slot")
+ADMISSION_QUEUE_DEPTH = Gauge("skinai_analyze_queue_depth", "Analyses waiting for an inference slot")
+ADMISSION_WAIT = Histogram("skinai_analyze_queue_wait_seconds", "Time spent waiting for an inference slot")
+ADMISSION_SHED = Counter(
+    "skinai_analyze_shed_total", "Analyses rejected by admission control (queue_full, deadline, timeout)",
+    ("reason",),
+)
+QUALITY_ISSUES = Counter(
+    "skinai_quality_issues_total", "Uploads failing a quality check, by issue and action (rejected, flagged)",
+    ("issue", "action"),
+)
+ANALYSES_REUSED = Counter(
+    "skinai_analyze_reused_total", "Analyses answered from a near-identical recent upload",
+)
+LIVE_SESSIONS = Gauge("skinai_live_sessions", "Connected live-camera WebSocket clients")
+LIVE_FRAMES = Counter(
+    "skinai_live_frames_total", "Live-camera frames by outcome (analyzed, dropped, error)", ("outcome",),
+)
+LIVE_BATCH_SIZE = Histogram(
+    "skinai_live_batch_size", "Frames per batched live-camera inference", buckets=(1, 2, 4, 8, 16, 32),
+)
+RETRAIN_RUNS = Counter(
+    "skinai_retrain_runs_total", "Background retraining cycles by outcome (succeeded, failed, cancelled)",
+    ("status",),
+)
+RETRAIN_LAST_DURATION = Gauge("skinai_retrain_last_duration_seconds", "Duration of the last retraining cycle")
+
+
+class StageTimer:
+    """
+    Accumulates per-stage wall time for one request and, if a histogram
+    is set, feeds it as each stage finishes.
+    """
+
+    def __init__(self, histogram=ANALYZE_STAGE_LATENCY):
+        self.histogram = histogram
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def record(self, name, elapsed):
+        """Add `elapsed` seconds measured elsewhere to stage `name`."""
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+        if self.histogram is not None:
+            self.histogram.labels(name).observe(elapsed)
+
+    def as_ms(self):
+        """Stage durations plus the request total so far, in milliseconds."""
+        timings = {name: round(sec * 1000, 3) for name, sec in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
+
+    def header(self):
+        """Render as a Server-Timing header value."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_ms().items())
+
+
+def get_timer(request, histogram=None):
+    """
+    Return the StageTimer that ServerTimingMiddleware attached to this
+    request (or a detached one), optionally feeding `histogram`.
+    """
+    timer = getattr(request.state, "timer", None)
+    if timer is None:
+        timer = StageTimer(histogram=None)
+        request.state.timer = timer
+    if histogram is not None:
+        timer.histogram = histogram
+    return timer
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests by templated route and status and
+    tracking in-flight requests and latency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            # Templated path keeps label cardinality bounded (no record ids)
+            path = getattr(route, "path", "unmatched")
+            HTTP_LATENCY.labels(scope["method"], path).observe(time.perf_counter() - t0)
+            HTTP_REQUESTS.labels(scope["method"], path, status["code"]).inc()
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware attaching a StageTimer to every request (as
+    request.state.timer) and reporting its stages in a Server-Timing
+    response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timer = StageTimer(histogram=None)
+        scope.setdefault("state", {})["timer"] = timer
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
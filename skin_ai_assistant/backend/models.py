@@ -1,14 +1,18 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Boolean, JSON, Float
+from sqlalchemy import Column, String, DateTime, Boolean, JSON, Float, Index, Integer
 from datetime import datetime
 from .db import Base
 
 class InferenceRecord(Base):
     __tablename__ = "inferences"
+    __table_args__ = (
+        # Admin listing: newest first, optionally filtered on needs_review
+        Index("ix_inferences_review_created", "needs_review", "created_at"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     image_path = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     predicted_condition = Column(String, nullable=False)
     predicted_confidence = Column(Float, nullable=True)
@@ -25,6 +29,14 @@ class InferenceRecord(Base):
 
     predictions_json = Column(JSON)
 
+    # 64-bit dHash of the image (hex) for near-duplicate detection, split into
+    # four indexed 16-bit bands: hashes within Hamming distance 3 share a band
+    image_hash = Column(String(16))
+    hash_band0 = Column(Integer, index=True)
+    hash_band1 = Column(Integer, index=True)
+    hash_band2 = Column(Integer, index=True)
+    hash_band3 = Column(Integer, index=True)
+
     # Feedback
     is_correct = Column(Boolean, default=None)
     corrected_condition = Column(String)
@@ -0,0 +1,113 @@
+"""
+Perceptual (difference) hashes for near-duplicate detection.
+
+A dHash compares the brightness of neighbouring pixels on a 9x8
+grayscale thumbnail, so it survives recompression, resizing and small
+crops or exposure changes; near-identical images differ in only a few
+of its 64 bits.
+
+For lookup the hash is split into four 16-bit bands stored in indexed
+columns. Two hashes within Hamming distance 3 must agree exactly on at
+least one band (pigeonhole), so an equality query on the bands finds
+every such candidate without scanning the table.
+"""
+from sqlalchemy import or_
+
+from .models import InferenceRecord
+
+BANDS = 4
+BAND_BITS = 64 // BANDS
+BAND_COLUMNS = [f"hash_band{i}" for i in range(BANDS)]
+# Most distinct hashes per band bucket compared pairwise by cluster()
+MAX_BUCKET = 256
+
+
+def dhash(img):
+    """64-bit difference hash of an RGB (or grayscale) uint8 image, as an int."""
+    import cv2
+    import numpy as np
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def bands(value):
+    return [(value >> (BAND_BITS * i)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+def hash_columns(value):
+    """InferenceRecord column values for a hash."""
+    return {"image_hash": f"{value:016x}", **dict(zip(BAND_COLUMNS, bands(value)))}
+
+
+def find_near_duplicate(db, value, max_distance=3, since=None, limit=200):
+    """
+    The closest record whose image hash is within max_distance of value,
+    among the `limit` most recent candidates sharing a band (optionally
+    created after `since`), as (record, distance), or None. Ties go to
+    the most recent record. Exhaustive for max_distance <= 3; larger
+    distances only find matches that still share a band.
+    """
+    query = db.query(InferenceRecord).filter(or_(*(
+        getattr(InferenceRecord, column) == band for column, band in zip(BAND_COLUMNS, bands(value))
+    )))
+    if since is not None:
+        query = query.filter(InferenceRecord.created_at >= since)
+    best = None
+    for record in query.order_by(InferenceRecord.created_at.desc()).limit(limit):
+        distance = hamming(value, int(record.image_hash, 16))
+        if distance <= max_distance and (best is None or distance < best[1]):
+            best = (record, distance)
+            if distance == 0:
+                break
+    return best
+
+
+def cluster(hashes, max_distance=3, max_bucket=MAX_BUCKET):
+    """
+    Group keys whose hashes are within max_distance of each other
+    (transitively). `hashes` maps key -> hash; returns a list of key
+    lists, one per cluster, in first-seen order.
+
+    Keys with identical hashes are joined directly, and only the first
+    max_bucket distinct hashes of a band bucket are compared pairwise.
+    This bounds the work on degenerate buckets (thousands of near-black
+    frames, say) at the cost of links only such a bucket would find.
+    """
+    parent = {key: key for key in hashes}
+
+    def root(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    # One representative key per distinct hash
+    first = {}
+    for key, value in hashes.items():
+        if value in first:
+            parent[root(key)] = root(first[value])
+        else:
+            first[value] = key
+
+    buckets = {}
+    for value, key in first.items():
+        for i, band in enumerate(bands(value)):
+            buckets.setdefault((i, band), []).append(key)
+
+    for members in buckets.values():
+        members = members[:max_bucket]
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if root(a) != root(b) and hamming(hashes[a], hashes[b]) <= max_distance:
+                    parent[root(b)] = root(a)
+
+    clusters = {}
+    for key in hashes:
+        clusters.setdefault(root(key), []).append(key)
+    return list(clusters.values())
@@ -0,0 +1,214 @@
+import contextvars
+import cProfile
+import pstats
+import random
+import re
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from . import config
+
+PROFILE_HEADER = "x-profile"
+TOKEN_HEADER = "x-admin-token"
+EXTENSIONS = {"sample": ".folded", "cprofile": ".prof"}
+
+
+# Profiler of the request being handled, seen by threads its work is handed to
+_ACTIVE = contextvars.ContextVar("skinai_profiler", default=None)
+
+# cProfile profilers must not overlap: concurrent enable() calls replace each
+# other before Python 3.12 and raise ValueError from 3.12 on
+_CPROFILE_LOCK = threading.Lock()
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of a set of threads every `interval`
+    seconds from a background thread and aggregates them in folded
+    format ("outer;inner count"), as read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="skinai-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def add_thread(self, thread_id):
+        self.thread_ids.add(thread_id)
+
+    def remove_thread(self, thread_id):
+        self.thread_ids.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in tuple(self.thread_ids):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}:{code.co_firstlineno}")
+                    frame = frame.f_back
+                if stack:
+                    key = ";".join(reversed(stack))
+                    self.counts[key] = self.counts.get(key, 0) + 1
+
+    def write(self, path):
+        lines = (f"{stack} {count}" for stack, count in sorted(self.counts.items()))
+        Path(path).write_text("\n".join(lines) + "\n")
+
+
+class CProfileProfiler:
+    """
+    Deterministic profiler; writes pstats output (snakeviz, flameprof).
+    Before Python 3.12 cProfile only sees the thread that enabled it, so
+    each added thread gets its own profile, merged on write; from 3.12 on
+    one profile covers every thread.
+    """
+
+    PER_THREAD = sys.version_info < (3, 12)
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self._threads = {}
+        self._finished = []
+        self._stopped = False
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self._stopped = True
+        self.profile.disable()
+
+    def add_thread(self, thread_id):
+        """Called on the thread itself."""
+        if self.PER_THREAD and not self._stopped:
+            profile = cProfile.Profile()
+            profile.enable()
+            self._threads[thread_id] = profile
+
+    def remove_thread(self, thread_id):
+        profile = self._threads.pop(thread_id, None)
+        if profile is not None:
+            profile.disable()
+            self._finished.append(profile)
+
+    def write(self, path):
+        stats = pstats.Stats(self.profile)
+        for profile in self._finished:
+            stats.add(profile)
+        stats.dump_stats(str(path))
+
+
+@contextmanager
+def worker_thread():
+    """
+    Include the calling thread in the current request's profile, if it
+    is being profiled; wrap work handed off the event loop in this.
+    """
+    profiler = _ACTIVE.get()
+    if profiler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profiler.add_thread(thread_id)
+    try:
+        yield
+    finally:
+        profiler.remove_thread(thread_id)
+
+
+def list_profiles():
+    """Stored profiles, newest first."""
+    if not config.PROFILES_DIR.exists():
+        return []
+    paths = [p for p in config.PROFILES_DIR.iterdir() if p.suffix in EXTENSIONS.values()]
+    return sorted(paths, key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def profile_path(name):
+    """Resolve a profile name from list_profiles(), or None if unknown."""
+    if Path(name).name != name:
+        return None
+    path = config.PROFILES_DIR / name
+    return path if path.is_file() and path.suffix in EXTENSIONS.values() else None
+
+
+def _rotate():
+    for old in list_profiles()[config.PROFILE_KEEP:]:
+        old.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling a random SKINAI_PROFILE_RATE fraction of
+    requests, plus any request sent with `X-Profile: 1` and a matching
+    `X-Admin-Token`. The profile id is returned in an X-Profile-Id header.
+
+    The event loop thread is profiled, plus any worker thread running the
+    request's work inside worker_thread() (as /analyze does); other
+    requests interleaved on the loop show up in the same profile. Only
+    one cProfile request runs at a time; overlapping ones are sampled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope):
+        headers = dict(scope.get("headers", []))
+        if headers.get(PROFILE_HEADER.encode()) == b"1":
+            token = headers.get(TOKEN_HEADER.encode(), b"").decode("latin-1")
+            if config.ADMIN_TOKEN and token == config.ADMIN_TOKEN:
+                return True
+        return config.PROFILE_RATE > 0 and random.random() < config.PROFILE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        mode = config.PROFILE_MODE if config.PROFILE_MODE in EXTENSIONS else "sample"
+        if mode == "cprofile" and not _CPROFILE_LOCK.acquire(blocking=False):
+            mode = "sample"
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        profile_id = (
+            f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{scope['method']}_{slug}_"
+            f"{uuid.uuid4().hex[:8]}{EXTENSIONS[mode]}"
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if mode == "cprofile":
+            profiler = CProfileProfiler()
+        else:
+            profiler = SamplingProfiler(threading.get_ident(), config.PROFILE_INTERVAL_MS / 1000)
+        token = _ACTIVE.set(profiler)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            _ACTIVE.reset(token)
+            if mode == "cprofile":
+                _CPROFILE_LOCK.release()
+            config.PROFILES_DIR.mkdir(exist_ok=True, parents=True)
+            profiler.write(config.PROFILES_DIR / profile_id)
+            _rotate()
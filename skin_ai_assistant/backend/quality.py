@@ -0,0 +1,98 @@
+"""
+Cheap image-quality checks run on a small grayscale copy of each upload
+before it reaches the model: resolution, blur (variance of the
+Laplacian), exposure (luma histogram) and, optionally, a Haar-cascade
+face check. A full-size ResNet pass costs far more than all of these.
+"""
+import logging
+import threading
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Longest side of the grayscale copy the checks run on
+ANALYSIS_SIDE = 256
+
+MESSAGES = {
+    "too_small": "The image resolution is too low. Please upload a larger photo.",
+    "too_blurry": "The image is too blurry. Hold the camera steady and make sure your skin is in focus.",
+    "too_dark": "The image is too dark. Try again in better lighting.",
+    "too_bright": "The image is overexposed. Avoid direct light or flash.",
+    "no_face": "No face was found. Please upload a clear photo of your face.",
+}
+
+_CASCADE = None
+_CASCADE_LOCK = threading.Lock()
+
+
+def _face_cascade():
+    """The frontal-face Haar cascade, or False if this OpenCV build has none."""
+    global _CASCADE
+    if _CASCADE is None:
+        import cv2
+        with _CASCADE_LOCK:
+            if _CASCADE is None:
+                if hasattr(cv2, "CascadeClassifier"):
+                    _CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+                else:
+                    # OpenCV 5 moved Haar cascades out of the main package
+                    logger.warning("Face check disabled: cv2.CascadeClassifier is not available")
+                    _CASCADE = False
+    return _CASCADE
+
+
+def assess(img, face_check=None):
+    """
+    Run the quality checks on an RGB uint8 image.
+
+    Returns {"ok", "issues", "measures"}; issues are keys of MESSAGES in
+    the order checked, measures the raw numbers they were judged on.
+    """
+    import cv2
+    import numpy as np
+    if face_check is None:
+        face_check = config.QUALITY_FACE_CHECK
+
+    height, width = img.shape[:2]
+    issues = []
+    if min(height, width) < config.QUALITY_MIN_SIDE:
+        issues.append("too_small")
+
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    scale = ANALYSIS_SIDE / max(height, width)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    # Blur: sharp images have strong edges, i.e. a high-variance Laplacian
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    if sharpness < config.QUALITY_BLUR_MIN:
+        issues.append("too_blurry")
+
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    hist /= hist.sum()
+    brightness = float((hist * np.arange(256)).sum())
+    dark = float(hist[:32].sum())
+    clipped = float(hist[224:].sum())
+    if brightness < config.QUALITY_BRIGHTNESS_MIN or dark > config.QUALITY_CLIPPED_MAX:
+        issues.append("too_dark")
+    elif brightness > config.QUALITY_BRIGHTNESS_MAX or clipped > config.QUALITY_CLIPPED_MAX:
+        issues.append("too_bright")
+
+    measures = {
+        "width": width,
+        "height": height,
+        "sharpness": round(sharpness, 2),
+        "brightness": round(brightness, 2),
+        "dark_fraction": round(dark, 3),
+        "bright_fraction": round(clipped, 3),
+    }
+    if face_check and _face_cascade():
+        min_face = max(24, ANALYSIS_SIDE // 8)
+        faces = _face_cascade().detectMultiScale(gray, scaleFactor=1.2, minNeighbors=4, minSize=(min_face, min_face))
+        measures["faces"] = len(faces)
+        if len(faces) == 0:
+            issues.append("no_face")
+
+    return {"ok": not issues, "issues": issues, "measures": measures}
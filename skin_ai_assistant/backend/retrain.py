@@ -0,0 +1,295 @@
+"""
+Background retraining: watches how much feedback has arrived since the
+last cycle and, past a threshold (or on a schedule), rebuilds the dataset
+and retrains, exports and validates a model (ml/train.py promotes it if
+it passes its gates).
+
+Each step runs as a separate low-priority process (nice'd, with BLAS and
+OpenMP thread pools capped) so serving keeps the CPU it needs. State and
+run history survive restarts in a small JSON file; step output goes to
+one log file per run.
+"""
+import functools
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from . import config, metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STEPS = (
+    ("build_dataset", (sys.executable, "-m", "ml.build_dataset")),
+    ("train", (sys.executable, "-m", "ml.train")),
+)
+
+# Thread pools honoured by torch, numpy and friends in the child processes
+THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+class RetrainBusy(Exception):
+    """A retraining cycle is already running."""
+
+
+def feedback_count():
+    """Records that have received feedback (correct or corrected)."""
+    from .db import SessionLocal
+    from .models import InferenceRecord
+    db = SessionLocal()
+    try:
+        return db.query(InferenceRecord).filter(InferenceRecord.is_correct.isnot(None)).count()
+    finally:
+        db.close()
+
+
+class Retrainer:
+    """
+    Triggers a cycle when `min_feedback` new feedback records have arrived
+    since the last one, or when `interval` seconds have passed and there
+    is any new feedback (interval 0 disables the schedule). Only one cycle
+    runs at a time.
+    """
+
+    def __init__(self, steps=DEFAULT_STEPS, state_dir=None, min_feedback=200, interval=0, poll=60,
+                 threads=2, nice=10, history=20, count=feedback_count, on_promoted=None):
+        self.steps = steps
+        self.state_dir = state_dir if state_dir is not None else config.RETRAIN_DIR
+        self.min_feedback = min_feedback
+        self.interval = interval
+        self.poll = poll
+        self.threads = threads
+        self.nice = nice
+        self.history = history
+        self.count = count
+        self.on_promoted = on_promoted
+        self.current = None
+        self._proc = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._state = self._load_state()
+
+    @property
+    def state_path(self):
+        return self.state_dir / "state.json"
+
+    def _load_state(self):
+        try:
+            return json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return {"feedback_at_last_run": 0, "last_started_at": None, "runs": []}
+
+    def _save_state(self):
+        self.state_dir.mkdir(exist_ok=True, parents=True)
+        tmp = self.state_path.with_name("state.json.tmp")
+        tmp.write_text(json.dumps(self._state, indent=2))
+        os.replace(tmp, self.state_path)
+
+    # --- triggering ---
+
+    def start(self):
+        """Watch feedback volume in a background thread."""
+        if self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="skinai-retrain", daemon=True)
+            self._watcher.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+        if self._watcher is not None:
+            self._watcher.join(timeout)
+            self._watcher = None
+
+    def pending_feedback(self):
+        return max(0, self.count() - self._state["feedback_at_last_run"])
+
+    def due(self):
+        """Why a cycle should start now ("threshold" or "schedule"), or None."""
+        pending = self.pending_feedback()
+        if pending >= self.min_feedback:
+            return "threshold"
+        last = self._state["last_started_at"]
+        if self.interval > 0 and pending > 0 and (
+            last is None or (datetime.utcnow() - datetime.fromisoformat(last)).total_seconds() >= self.interval
+        ):
+            return "schedule"
+        return None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll):
+            try:
+                reason = self.due()
+                if reason:
+                    self.trigger(reason)
+            except RetrainBusy:
+                pass
+            except Exception as e:
+                logger.error("Retraining watcher failed: %s", e, exc_info=True)
+
+    def trigger(self, reason="manual"):
+        """Start a cycle in the background and return its run record; RetrainBusy if one is running."""
+        with self._lock:
+            if self.current is not None:
+                raise RetrainBusy()
+            run = {
+                "id": uuid.uuid4().hex[:12],
+                "trigger": reason,
+                "status": "running",
+                "started_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+                "duration_s": None,
+                "feedback_count": self.count(),
+                "steps": [],
+                "promoted": None,
+            }
+            self.current = run
+        logger.info("Retraining run %s started (%s, %d feedback records)", run["id"], reason, run["feedback_count"])
+        threading.Thread(target=self._run, args=(run,), name=f"skinai-retrain-{run['id']}", daemon=True).start()
+        return run
+
+    # --- running ---
+
+    def _child_env(self):
+        env = dict(os.environ)
+        for name in THREAD_ENV:
+            env[name] = str(self.threads)
+        return env
+
+    def _spawn(self, cmd, log):
+        """Start a step already at low priority, so it never competes with serving at normal priority."""
+        kwargs = {}
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+        elif self.nice:
+            nice = shutil.which("nice")
+            if nice:
+                cmd = (nice, "-n", str(self.nice)) + tuple(cmd)
+            else:
+                # preexec_fn is not fork-safe with threads around; only without nice(1)
+                kwargs["preexec_fn"] = functools.partial(os.nice, self.nice)
+        return subprocess.Popen(
+            cmd, cwd=config.BASE_DIR, env=self._child_env(), stdout=log, stderr=subprocess.STDOUT, **kwargs,
+        )
+
+    def _run(self, run):
+        t0 = time.perf_counter()
+        status = "failed"
+        try:
+            status = self._run_steps(run)
+            if status == "succeeded":
+                run["promoted"] = self._promoted_since(run["started_at"])
+        except Exception as e:
+            logger.error("Retraining run %s crashed: %s", run["id"], e, exc_info=True)
+            status = "failed"
+        finally:
+            # Whatever happened, the run is recorded and the next one may start
+            for step in run["steps"]:
+                if step["status"] == "running":
+                    step["status"] = "failed"
+            run["status"] = status
+            run["finished_at"] = datetime.utcnow().isoformat()
+            run["duration_s"] = round(time.perf_counter() - t0, 3)
+            metrics.RETRAIN_RUNS.labels(status).inc()
+            metrics.RETRAIN_LAST_DURATION.set(run["duration_s"])
+            logger.info("Retraining run %s %s in %.1fs", run["id"], status, run["duration_s"])
+            with self._lock:
+                try:
+                    self._state["feedback_at_last_run"] = run["feedback_count"]
+                    self._state["last_started_at"] = run["started_at"]
+                    self._state["runs"] = ([run] + self._state["runs"])[:self.history]
+                    self._save_state()
+                except Exception as e:
+                    logger.error("Saving retraining state failed: %s", e, exc_info=True)
+                finally:
+                    self.current = None
+
+        if run["promoted"] and self.on_promoted is not None:
+            try:
+                self.on_promoted()
+            except Exception as e:
+                logger.error("Reloading the promoted model failed: %s", e, exc_info=True)
+
+    def _run_steps(self, run):
+        """Run each step in turn, logging to the run's log file; returns the run status."""
+        self.state_dir.mkdir(exist_ok=True, parents=True)
+        log_path = self.state_dir / f"{run['id']}.log"
+        run["log"] = log_path.name
+        with open(log_path, "wb") as log:
+            for name, cmd in self.steps:
+                if self._stop.is_set():
+                    return "cancelled"
+                step = {"name": name, "status": "running", "duration_s": None, "returncode": None}
+                run["steps"].append(step)
+                step_t0 = time.perf_counter()
+                log.write(f"=== {name}: {' '.join(cmd)}\n".encode())
+                log.flush()
+                try:
+                    self._proc = self._spawn(cmd, log)
+                    step["returncode"] = self._proc.wait()
+                except OSError as e:
+                    log.write(f"{e}\n".encode())
+                    step["returncode"] = -1
+                finally:
+                    self._proc = None
+                    step["duration_s"] = round(time.perf_counter() - step_t0, 3)
+                step["status"] = "succeeded" if step["returncode"] == 0 else "failed"
+                if step["returncode"] != 0:
+                    return "failed"
+        return "succeeded"
+
+    @staticmethod
+    def _promoted_since(started_at):
+        """Whether ml/train.py promoted its candidate during this run (None if it left no manifest)."""
+        manifest_path = config.CANDIDATE_DIR / "manifest.json"
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if manifest.get("created_at", "") < started_at:
+            return None
+        return bool(manifest.get("promoted"))
+
+    def status(self):
+        with self._lock:
+            runs = list(self._state["runs"])
+            current = dict(self.current, steps=list(self.current["steps"])) if self.current else None
+        if current is not None:
+            current["elapsed_s"] = round(
+                (datetime.utcnow() - datetime.fromisoformat(current["started_at"])).total_seconds(), 3,
+            )
+        return {
+            "watching": self._watcher is not None,
+            "running": current is not None,
+            "current": current,
+            "pending_feedback": self.pending_feedback(),
+            "min_feedback": self.min_feedback,
+            "interval_s": self.interval,
+            "last_started_at": self._state["last_started_at"],
+            "runs": runs,
+        }
+
+
+_RETRAINER = None
+
+
+def get_retrainer():
+    global _RETRAINER
+    if _RETRAINER is None:
+        _RETRAINER = Retrainer(
+            min_feedback=config.RETRAIN_MIN_FEEDBACK,
+            interval=config.RETRAIN_INTERVAL_HOURS * 3600,
+            poll=config.RETRAIN_POLL_SECONDS,
+            threads=config.RETRAIN_THREADS,
+            nice=config.RETRAIN_NICE,
+        )
+    return _RETRAINER
@@ -0,0 +1,79 @@
+import gc
+import time
+import numpy as np
+
+
+def synthetic_jpeg(side, seed=0):
+    """A face-sized JPEG with smooth gradients plus noise (compresses like a photo)."""
+    import cv2
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:side, 0:side].astype(np.float32) / side
+    base = np.stack([200 * x + 30, 150 * y + 50, 120 * (1 - x) + 60], axis=-1)
+    img = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buf.tobytes()
+
+
+def measure(fn, iterations=50, warmup=5, min_time_s=0.0):
+    """
+    Call fn repeatedly and return latency statistics in milliseconds.
+
+    Garbage collection is disabled while timing so a collection pause is
+    not charged to whichever call happens to trigger it.
+    """
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        while len(times) < iterations or time.perf_counter() - start < min_time_s:
+            t0 = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - t0) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return summarize(times)
+
+
+def summarize(times):
+    """Latency statistics for a list of timings in milliseconds."""
+    arr = np.array(times)
+    return {
+        "n": len(times),
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "min_ms": float(arr.min()),
+    }
+
+
+def compare(results, baseline, p50_threshold=0.25, p99_threshold=0.5):
+    """
+    Compare results against a baseline and list regressions.
+
+    A benchmark regresses when its p50 (or p99) grew by more than the
+    given fraction over the baseline. Benchmarks missing from either side
+    are ignored.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key, threshold in (("p50_ms", p50_threshold), ("p99_ms", p99_threshold)):
+            limit = base[key] * (1 + threshold)
+            if current[key] > limit:
+                regressions.append({
+                    "benchmark": name,
+                    "metric": key,
+                    "baseline": base[key],
+                    "current": current[key],
+                    "change": current[key] / base[key] - 1 if base[key] else float("inf"),
+                })
+    return regressions
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Asyncio load generator for a locally running backend (see run_backend.py).
+
+Replays /analyze uploads mixed with /feedback and /admin/inferences calls,
+either open-loop (fixed arrival rate, latency measured from the scheduled
+send time so queueing is not hidden) or closed-loop (fixed number of
+concurrent clients). Sweeping several load levels produces a
+latency-vs-load curve.
+
+    python -m benchmarks.loadgen --mode open --rps 5 10 20 40 --duration 20
+    python -m benchmarks.loadgen --mode closed --concurrency 1 2 4 8 --images ./faces
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from benchmarks.harness import synthetic_jpeg
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+DEFAULT_MIX = "analyze=0.8,feedback=0.1,admin=0.1"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in ("analyze", "feedback", "admin"):
+            raise ValueError(f"Unknown operation in mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def load_images(directory=None, count=8):
+    """Return a list of (filename, bytes) to upload."""
+    if directory:
+        paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in IMAGE_EXTS)
+        if not paths:
+            raise ValueError(f"No images found in {directory}")
+        return [(p.name, p.read_bytes()) for p in paths]
+    sides = (480, 720, 1080, 1440)
+    return [(f"synthetic_{i}.jpg", synthetic_jpeg(sides[i % len(sides)], seed=i)) for i in range(count)]
+
+
+class Workload:
+    """Picks operations according to the mix and issues the requests."""
+
+    def __init__(self, client, images, mix, seed=0):
+        self.client = client
+        self.images = images
+        self.ops = list(mix)
+        self.weights = [mix[o] for o in self.ops]
+        self.rng = random.Random(seed)
+        self.inference_ids = []
+        self.stage_ms = {}
+
+    def pick(self):
+        op = self.rng.choices(self.ops, self.weights)[0]
+        # Feedback needs an inference to refer to
+        if op == "feedback" and not self.inference_ids:
+            op = "analyze"
+        return op
+
+    async def request(self, op):
+        if op == "analyze":
+            name, data = self.rng.choice(self.images)
+            resp = await self.client.post(
+                "/analyze",
+                files={"file": (name, data, "image/jpeg")},
+                data={"skin_type": "any", "fitzpatrick": "unspecified", "ethnicity": "unspecified"},
+            )
+            if resp.status_code == 200:
+                self.inference_ids.append(resp.json()["inference_id"])
+                del self.inference_ids[:-1000]
+        elif op == "feedback":
+            resp = await self.client.post(
+                "/feedback",
+                data={"inference_id": self.rng.choice(self.inference_ids), "is_correct": "true"},
+            )
+        else:
+            resp = await self.client.get("/admin/inferences", params={"limit": 20})
+        for stage, ms in parse_server_timing(resp.headers.get("server-timing", "")).items():
+            self.stage_ms.setdefault((op, stage), []).append(ms)
+        return resp.status_code
+
+    def take_stage_means(self):
+        """Mean server-side stage durations per operation since the last call."""
+        means = {}
+        for (op, stage), values in self.stage_ms.items():
+            means.setdefault(op, {})[stage] = round(sum(values) / len(values), 3)
+        self.stage_ms = {}
+        return means
+
+
+def parse_server_timing(header):
+    """Parse 'read;dur=1.2, infer;dur=30' into {"read": 1.2, "infer": 30.0}."""
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+async def _timed(workload, op, started, samples):
+    try:
+        status = await workload.request(op)
+        error = None if 200 <= status < 300 else f"http_{status}"
+    except httpx.TimeoutException:
+        error = "timeout"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    samples.append((op, time.perf_counter() - started, error))
+
+
+async def run_closed(workload, concurrency, duration):
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await _timed(workload, workload.pick(), time.perf_counter(), samples)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples
+
+
+async def run_open(workload, rps, duration, max_inflight):
+    samples = []
+    tasks = set()
+    start = time.perf_counter()
+    total = int(rps * duration)
+
+    for i in range(total):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_inflight:
+            # The generator itself is saturated; count it rather than block
+            samples.append((workload.pick(), 0.0, "client_overload"))
+            continue
+        task = asyncio.create_task(_timed(workload, workload.pick(), scheduled, samples))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    return samples
+
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        ok = np.array([lat for _, lat, err in rows if err is None]) * 1000
+        errors = {}
+        for _, _, err in rows:
+            if err is not None:
+                errors[err] = errors.get(err, 0) + 1
+        out = {
+            "requests": len(rows),
+            "ok": int(len(ok)),
+            "errors": errors,
+            "error_rate": (len(rows) - len(ok)) / len(rows) if rows else 0.0,
+            "throughput_rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+        }
+        for p in (50, 95, 99):
+            out[f"p{p}_ms"] = float(np.percentile(ok, p)) if len(ok) else None
+        return out
+
+    summary = stats(samples)
+    summary["by_op"] = {
+        op: stats([s for s in samples if s[0] == op])
+        for op in sorted({s[0] for s in samples})
+    }
+    return summary
+
+
+async def sweep(args):
+    images = load_images(args.images)
+    mix = parse_mix(args.mix)
+    levels = args.rps if args.mode == "open" else args.concurrency
+    max_conn = max(levels) if args.mode == "closed" else args.max_inflight
+    limits = httpx.Limits(max_connections=max_conn, max_keepalive_connections=max_conn)
+
+    curve = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        workload = Workload(client, images, mix)
+        # Warm up connections and the model
+        for _ in range(3):
+            await workload.request("analyze")
+        workload.take_stage_means()
+
+        for level in levels:
+            t0 = time.perf_counter()
+            if args.mode == "open":
+                samples = await run_open(workload, level, args.duration, args.max_inflight)
+            else:
+                samples = await run_closed(workload, level, args.duration)
+            elapsed = time.perf_counter() - t0
+            summary = summarize(samples, elapsed)
+            summary["load"] = level
+            summary["server_stages_ms"] = workload.take_stage_means()
+            curve.append(summary)
+            print(
+                f"{args.mode:>6} load={level:<6} thr={summary['throughput_rps']:7.1f} rps  "
+                f"p50={_fmt(summary['p50_ms'])}  p95={_fmt(summary['p95_ms'])}  "
+                f"p99={_fmt(summary['p99_ms'])}  err={summary['error_rate']:.1%}"
+            )
+            stages = summary["server_stages_ms"].get("analyze")
+            if stages:
+                print("       analyze stages: " + "  ".join(f"{k}={v:.1f}ms" for k, v in stages.items()))
+    return curve
+
+
+def _fmt(ms):
+    return f"{ms:8.1f}ms" if ms is not None else "       -  "
+
+
+def write_curve(curve, mode, out):
+    out.parent.mkdir(exist_ok=True, parents=True)
+    out.write_text(json.dumps({"mode": mode, "curve": curve}, indent=2))
+    with open(out.with_suffix(".csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["load", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"])
+        for row in curve:
+            writer.writerow([row["load"], row["throughput_rps"], row["p50_ms"], row["p95_ms"],
+                             row["p99_ms"], row["error_rate"]])
+
+    # Quick text plot of p99 vs load
+    worst = max((row["p99_ms"] or 0) for row in curve) or 1
+    print("\np99 latency vs load")
+    for row in curve:
+        bar = "#" * int(40 * (row["p99_ms"] or 0) / worst)
+        print(f"{row['load']:>8} | {bar} {_fmt(row['p99_ms']).strip()}")
+    print(f"\nCurve written to {out} and {out.with_suffix('.csv')}")
+
+
+def main(argv=None):
+    default_url = os.getenv("SKINAI_API_URL", f"http://127.0.0.1:{os.getenv('BACKEND_PORT', '8000')}")
+    parser = argparse.ArgumentParser(description="Skin AI backend load generator")
+    parser.add_argument("--url", default=default_url)
+    parser.add_argument("--mode", choices=["open", "closed"], default="closed")
+    parser.add_argument("--rps", type=float, nargs="+", default=[5, 10, 20], help="Open-loop arrival rates")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="Closed-loop client counts")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per load level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. analyze=0.8,feedback=0.1,admin=0.1")
+    parser.add_argument("--images", type=Path, default=None, help="Directory of images (default: synthetic)")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--out", type=Path, default=Path(__file__).resolve().parent / "results" / "loadgen.json")
+    args = parser.parse_args(argv)
+
+    curve = asyncio.run(sweep(args))
+    write_curve(curve, args.mode, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory of N processes serving the same ONNX model.
+
+Starts N worker processes per variant, each loading the model and
+running one inference (as a uvicorn worker would), and reports their
+RSS, PSS (RSS with shared pages split between the processes mapping
+them) and private memory:
+
+  inline           weights embedded in the .onnx file (every worker copies them)
+  external         page-aligned external weights file, prepacking on
+  external+shared  external weights used in place (SKINAI_ORT_SHARE_WEIGHTS=1)
+
+    python -m benchmarks.memory --workers 4
+
+Linux only: reads /proc/<pid>/smaps_rollup.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+VARIANTS = (
+    ("inline", "inline", "0"),
+    ("external", "external", "0"),
+    ("external+shared", "external", "1"),
+)
+
+
+def child(model_path):
+    """Worker body: load the model, run it once, then idle until stdin closes."""
+    import numpy as np
+    from backend.inference import SkinAIModel
+    model_path = Path(model_path)
+    model = SkinAIModel(model_path, model_path.parent / "class_names.txt", model_path.parent / "heads.json")
+    model.infer(np.zeros((1, 3, 224, 224), np.float32))
+    print("ready", flush=True)
+    sys.stdin.read()
+
+
+def smaps_rollup(pid):
+    """Rss, Pss and private (clean + dirty) memory of a process, in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields["Rss"],
+        "pss_mb": fields["Pss"],
+        "private_mb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def measure_workers(model_path, workers, share):
+    env = dict(os.environ, SKINAI_ORT_SHARE_WEIGHTS=share)
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.memory", "--child", str(model_path)],
+            cwd=BENCH_DIR.parent, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        for p in procs:
+            # Skip the model's own log line, wait for the worker to be ready
+            while p.stdout.readline().strip() != "ready":
+                if p.poll() is not None:
+                    raise RuntimeError(f"Worker exited with code {p.returncode}")
+        # Measure only once every worker is up, so shared pages are split N ways
+        return [smaps_rollup(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+
+def build_models(work_dir, channels, embedding_dim):
+    from utils.onnx_models import make_random_model, externalize_weights
+    inline = make_random_model(work_dir / "inline", channels=channels, embedding_dim=embedding_dim)
+    shutil.copytree(work_dir / "inline", work_dir / "external")
+    external = work_dir / "external" / inline.name
+    externalize_weights(external)
+    return {"inline": inline, "external": external}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-worker RSS of N processes serving one ONNX model")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--channels", type=int, default=768, help="Width of the synthetic model")
+    parser.add_argument("--embedding-dim", type=int, default=8192, help="Embedding size of the synthetic model")
+    parser.add_argument("--model", type=Path, help="Measure this .onnx (as exported) instead of a synthetic one")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child(args.child)
+    if not Path("/proc/self/smaps_rollup").exists():
+        sys.exit("benchmarks.memory needs /proc/<pid>/smaps_rollup (Linux)")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="skinai_mem_"))
+    try:
+        if args.model:
+            variants = [("model", args.model, "0"), ("model+shared", args.model, "1")]
+        else:
+            models = build_models(work_dir, args.channels, args.embedding_dim)
+            weights_mb = (models["external"].with_name(models["external"].name + ".data").stat().st_size
+                          / (1024 * 1024))
+            print(f"Synthetic model with {weights_mb:.1f} MB of weights")
+            variants = [(name, models[kind], share) for name, kind, share in VARIANTS]
+
+        print(f"{args.workers} workers per variant\n")
+        print(f"{'variant':<18}{'RSS/worker':>12}{'PSS/worker':>12}{'private/worker':>16}{'PSS total':>12}")
+        for name, path, share in variants:
+            rows = measure_workers(path, args.workers, share)
+            mean = {k: sum(r[k] for r in rows) / len(rows) for k in rows[0]}
+            total_pss = sum(r["pss_mb"] for r in rows)
+            print(f"{name:<18}{mean['rss_mb']:>10.1f}MB{mean['pss_mb']:>10.1f}MB"
+                  f"{mean['private_mb']:>14.1f}MB{total_pss:>10.1f}MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the inference and request hot paths.
+
+Runs fully offline: images are synthetic and the model is a small randomly
+initialized ONNX graph with the production interface. Results are written
+as JSON and compared against a stored baseline; the run fails when p50 or
+p99 regress past the configured thresholds, or when there is no baseline
+to compare against (baselines are machine-specific, so record one on the
+machine that runs the gate).
+
+    python -m benchmarks.run                     # run and compare
+    python -m benchmarks.run --save-baseline     # record a new baseline
+    python -m benchmarks.run --allow-missing-baseline   # just measure
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUT = BENCH_DIR / "results" / "latest.json"
+RESOLUTIONS = (256, 640, 1280, 2048)
+
+# Keep everything the benchmarks write out of the real DB and upload dir;
+# must happen before backend.config is imported. Always overridden, so a
+# shell configured for the service cannot point the benchmarks at its DB.
+WORK_DIR = Path(tempfile.mkdtemp(prefix="skinai_bench_"))
+os.environ["SKINAI_DB_URL"] = f"sqlite:///{WORK_DIR / 'bench.db'}"
+
+from benchmarks.harness import measure, compare, summarize, synthetic_jpeg  # noqa: E402
+
+
+class Context:
+    """Lazily built shared fixtures (model, images, app client)."""
+
+    def __init__(self):
+        self._model = None
+        self._client = None
+        self.images = {side: synthetic_jpeg(side) for side in RESOLUTIONS}
+
+    @property
+    def model(self):
+        if self._model is None:
+            from backend.inference import SkinAIModel
+            from utils.onnx_models import make_random_model
+            model_dir = WORK_DIR / "model"
+            path = make_random_model(model_dir)
+            self._model = SkinAIModel(path, model_dir / "class_names.txt", model_dir / "heads.json")
+        return self._model
+
+    @property
+    def client(self):
+        if self._client is None:
+            from fastapi.testclient import TestClient
+            from backend import main
+            # Per-request INFO logs would dominate both output and timings
+            for name in ("backend", "httpx"):
+                logging.getLogger(name).setLevel(logging.WARNING)
+            from backend.embeddings import EmbeddingIndex
+            main.MODEL = self.model
+            main.IMAGES = WORK_DIR / "uploads"
+            main.IMAGES.mkdir(exist_ok=True)
+            index = EmbeddingIndex(WORK_DIR / "embeddings")
+            main.get_index = lambda: index
+            # Entering the client runs the lifespan hook (creates the schema)
+            self._client = TestClient(main.app).__enter__()
+        return self._client
+
+
+def bench_preprocess(ctx, iterations):
+    return {
+        f"preprocess[{side}]": measure(lambda b=img: ctx.model.preprocess(b), iterations)
+        for side, img in ctx.images.items()
+    }
+
+
+def bench_predict(ctx, iterations):
+    results = {
+        f"predict[{side}]": measure(lambda b=img: ctx.model.predict(b), iterations)
+        for side, img in ctx.images.items()
+    }
+    batch = ctx.model.preprocess(ctx.images[640])
+    results["infer[batch=1]"] = measure(lambda: ctx.model.infer(batch), iterations)
+    batch8 = np.repeat(batch, 8, axis=0)
+    results["infer[batch=8]"] = measure(lambda: ctx.model.infer(batch8), iterations)
+    return results
+
+
+def bench_quality(ctx, iterations):
+    from backend import quality
+    results = {}
+    for side, img in ctx.images.items():
+        decoded = ctx.model.decode(img)
+        results[f"quality[{side}]"] = measure(lambda a=decoded: quality.assess(a, face_check=False), iterations)
+    return results
+
+
+def bench_db_insert(ctx, iterations):
+    from backend.db import Base, engine, SessionLocal
+    from backend.models import InferenceRecord
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    def insert():
+        db.add(InferenceRecord(
+            image_path="bench.jpg",
+            predicted_condition="normal",
+            predicted_confidence=0.5,
+            user_skin_type="any",
+            user_fitzpatrick="III",
+            user_ethnicity="unspecified",
+            predictions_json={"condition": "normal", "confidence": 0.5},
+        ))
+        db.commit()
+
+    try:
+        return {"db_insert": measure(insert, iterations)}
+    finally:
+        db.close()
+
+
+def bench_analyze(ctx, iterations):
+    client = ctx.client
+    results = {}
+    for side in (640, 2048):
+        files = {"file": ("bench.jpg", ctx.images[side], "image/jpeg")}
+
+        def call(files=files):
+            resp = client.post("/analyze", files=files)
+            assert resp.status_code == 200, resp.text
+
+        results[f"analyze_roundtrip[{side}]"] = measure(call, iterations)
+
+        # Same image as a raw body: no multipart parsing or spooled temp file
+        def call_raw(body=ctx.images[side]):
+            resp = client.post("/analyze/raw", content=body, headers={"Content-Type": "application/octet-stream"})
+            assert resp.status_code == 200, resp.text
+
+        results[f"analyze_raw[{side}]"] = measure(call_raw, iterations)
+
+    # Pre-decoded pixels at the model's input size skip JPEG decoding too
+    pixels = ctx.model.decode(ctx.images[640])[:224, :224].tobytes()
+
+    def call_rgb():
+        resp = client.post("/analyze/raw", content=pixels, headers={
+            "Content-Type": "application/octet-stream", "X-Image-Shape": "224,224",
+        })
+        assert resp.status_code == 200, resp.text
+
+    results["analyze_raw_rgb[224]"] = measure(call_rgb, iterations)
+    return results
+
+
+def bench_startup(ctx, iterations):
+    # Each sample is a fresh interpreter, so keep the count modest
+    runs = max(3, min(iterations, 10))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup"],
+            cwd=BENCH_DIR.parent, capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "startup_import": summarize([s["import_ms"] for s in samples]),
+        "startup_ready": summarize([s["ready_ms"] for s in samples]),
+    }
+
+
+BENCHMARKS = {
+    "preprocess": bench_preprocess,
+    "predict": bench_predict,
+    "quality": bench_quality,
+    "db_insert": bench_db_insert,
+    "analyze": bench_analyze,
+    "startup": bench_startup,
+}
+
+
+def environment():
+    import onnxruntime
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "onnxruntime": onnxruntime.__version__,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def run(selected, iterations):
+    ctx = Context()
+    results = {}
+    for name in selected:
+        print(f"-- {name}")
+        for bench, stats in BENCHMARKS[name](ctx, iterations).items():
+            print(f"   {bench:<28} p50 {stats['p50_ms']:8.3f} ms   p99 {stats['p99_ms']:8.3f} ms")
+            results[bench] = stats
+    return results
+
+
+def check(results, baseline_path, p50_threshold, p99_threshold, allow_missing=False):
+    """
+    Exit status of the regression gate. A missing baseline, or one that
+    shares no benchmark with the results, fails unless `allow_missing`:
+    otherwise the gate would compare against nothing and always pass.
+    """
+    baseline = json.loads(baseline_path.read_text())["results"] if baseline_path.exists() else {}
+    if not baseline.keys() & results.keys():
+        print(f"No baseline for these benchmarks at {baseline_path}; run with --save-baseline to create one.")
+        return 0 if allow_missing else 2
+
+    regressions = compare(results, baseline, p50_threshold, p99_threshold)
+    if not regressions:
+        print("[PASS] No regressions against baseline.")
+        return 0
+
+    print("[FAIL] Regressions against baseline:")
+    for r in regressions:
+        print(f"   {r['benchmark']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} ms ({r['change']:+.0%})")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Skin AI hot-path benchmarks")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Benchmark groups to run")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT, help="Where to write the results JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Pass instead of failing when there is no baseline to compare against")
+    parser.add_argument("--p50-threshold", type=float, default=0.25, help="Allowed p50 regression (fraction)")
+    parser.add_argument("--p99-threshold", type=float, default=0.5, help="Allowed p99 regression (fraction)")
+    args = parser.parse_args(argv)
+
+    results = run(args.only or list(BENCHMARKS), args.iterations)
+    report = {"environment": environment(), "results": results}
+
+    args.out.parent.mkdir(exist_ok=True, parents=True)
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.out}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    return check(results, args.baseline, args.p50_threshold, args.p99_threshold, args.allow_missing_baseline)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""
+Measure backend startup in a fresh interpreter: time to import
+backend.main, and time until the lifespan hook has run and /health
+answers. Prints one JSON line; driven by `python -m benchmarks.run --only startup`.
+"""
+import json
+import sys
+import time
+
+HEAVY_MODULES = ("numpy", "cv2", "onnxruntime")
+
+
+def main():
+    t0 = time.perf_counter()
+    from backend.main import app
+    import_ms = (time.perf_counter() - t0) * 1000
+    eager = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        resp = client.get("/health")
+        ready_ms = (time.perf_counter() - t0) * 1000
+        model_loaded = resp.json()["model_loaded"]
+
+    print(json.dumps({
+        "import_ms": import_ms,
+        "ready_ms": ready_ms,
+        "model_loaded": model_loaded,
+        "eager_heavy_imports": eager,
+    }))
+
+
+if __name__ == "__main__":
+    main()
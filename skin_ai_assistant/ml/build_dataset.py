@@ -1,12 +1,43 @@
 from sqlalchemy.orm import Session
 from backend.db import SessionLocal
 from backend.models import InferenceRecord
-from backend.config import BASE_DIR
+from backend.config import BASE_DIR, DEDUP_MAX_DISTANCE
+from backend import phash
 from pathlib import Path
 import shutil
+import json
+from datetime import datetime
 
 DATA = BASE_DIR / "dataset"
 
+def image_hash(record):
+    """The record's stored dHash, or one computed from its image (rows from before hashing)."""
+    if record.image_hash:
+        return int(record.image_hash, 16)
+    import cv2
+    img = cv2.imread(str(BASE_DIR / record.image_path), cv2.IMREAD_GRAYSCALE)
+    return phash.dhash(img) if img is not None else None
+
+def collapse_duplicates(recs, max_distance=DEDUP_MAX_DISTANCE):
+    """
+    Keep one record per cluster of near-duplicate images: the most recent,
+    whose feedback is the latest word on the label. Records whose image
+    cannot be hashed are kept as they are.
+    """
+    hashes = {}
+    for r in recs:
+        h = image_hash(r)
+        if h is not None:
+            hashes[r.id] = h
+    by_id = {r.id: r for r in recs}
+    keep = {r.id for r in recs if r.id not in hashes}
+    clusters = phash.cluster(hashes, max_distance)
+    for ids in clusters:
+        keep.add(max(ids, key=lambda i: by_id[i].created_at or datetime.min))
+    print(f"Collapsed {len(hashes) - len(clusters)} near-duplicate images "
+          f"({len(recs)} records -> {len(keep)})")
+    return [r for r in recs if r.id in keep]
+
 def build():
     if DATA.exists(): shutil.rmtree(DATA)
     (DATA/'train').mkdir(parents=True)
@@ -14,10 +45,15 @@ def build():
 
     db: Session = SessionLocal()
     recs = db.query(InferenceRecord).filter_by(is_correct=True).all()
+    # Before the split, so copies of one image cannot land in both train and val
+    recs = collapse_duplicates(recs)
 
     train_split = int(len(recs)*0.8)
     train, val = recs[:train_split], recs[train_split:]
 
+    # Per-image labels for the auxiliary heads trained in ml/train.py
+    metadata = {}
+
     def copy(records, root):
         for r in records:
             label = r.corrected_condition or r.predicted_condition
@@ -25,9 +61,16 @@ def build():
             dst = root/label
             dst.mkdir(exist_ok=True)
             shutil.copy2(src, dst/src.name)
+            metadata[(dst/src.name).relative_to(DATA).as_posix()] = {
+                "skin_type": r.user_skin_type,
+                "fitzpatrick": r.user_fitzpatrick,
+                "acne_grade": r.corrected_acne_grade,
+                "pih_level": r.corrected_pih_level,
+            }
 
     copy(train, DATA/'train')
     copy(val, DATA/'val')
+    (DATA/'metadata.json').write_text(json.dumps(metadata, indent=2))
 
 if __name__ == "__main__":
     build()
\ No newline at end of file
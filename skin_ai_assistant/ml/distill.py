@@ -0,0 +1,161 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.optim import AdamW
+from torchvision import models
+import json
+
+from backend.config import MODELS_DIR
+from ml.train import load_data, MultiHeadNet
+from ml.export import benchmark, export_onnx
+
+STUDENT_DIR = MODELS_DIR / "student"
+TEACHER_CKPT = MODELS_DIR / "best_model.pt"
+
+# Soft-target temperature and the weight of the distillation term vs. hard labels
+TEMPERATURE = 4.0
+ALPHA = 0.7
+EPOCHS = 12
+
+STUDENTS = {
+    "mobilenet_v3_large": (models.mobilenet_v3_large, models.MobileNet_V3_Large_Weights.IMAGENET1K_V2),
+    "mobilenet_v3_small": (models.mobilenet_v3_small, models.MobileNet_V3_Small_Weights.IMAGENET1K_V1),
+    "efficientnet_b0": (models.efficientnet_b0, models.EfficientNet_B0_Weights.IMAGENET1K_V1),
+}
+
+
+def load_teacher(num_classes):
+    """
+    Rebuild the ResNet50 trained by ml/train.py from its best checkpoint.
+    """
+    ckpt = torch.load(TEACHER_CKPT, map_location="cpu")
+    if "heads" in ckpt:
+        teacher = MultiHeadNet(num_classes, heads=ckpt["heads"], pretrained=False)
+    else:
+        teacher = models.resnet50()
+        teacher.fc = nn.Linear(teacher.fc.in_features, num_classes)
+    teacher.load_state_dict(ckpt["model"])
+    return teacher, ckpt["classes"]
+
+
+def build_student(arch, num_classes):
+    ctor, weights = STUDENTS[arch]
+    student = ctor(weights=weights)
+    # Both MobileNetV3 and EfficientNet end in a Sequential classifier
+    last = student.classifier[-1]
+    student.classifier[-1] = nn.Linear(last.in_features, num_classes)
+    return student
+
+
+def logits_of(model, x):
+    """Condition logits of a plain or multi-head model."""
+    out = model(x)
+    return out[0] if isinstance(out, tuple) else out
+
+
+def distillation_loss(student_logits, teacher_logits, targets):
+    soft = F.kl_div(
+        F.log_softmax(student_logits / TEMPERATURE, dim=1),
+        F.softmax(teacher_logits / TEMPERATURE, dim=1),
+        reduction="batchmean",
+    ) * (TEMPERATURE ** 2)
+    hard = F.cross_entropy(student_logits, targets)
+    return ALPHA * soft + (1 - ALPHA) * hard
+
+
+def evaluate(model, loader, device):
+    model.eval()
+    correct, total = 0, 0
+    with torch.no_grad():
+        for x, y in loader:
+            x, y = x.to(device), y.to(device)
+            correct += (logits_of(model, x).argmax(1) == y).sum().item()
+            total += len(y)
+    return correct / total if total else 0.0
+
+
+def distill(arch="mobilenet_v3_large"):
+    train_loader, val_loader, classes = load_data()
+
+    teacher, teacher_classes = load_teacher(len(classes))
+    if teacher_classes != classes:
+        raise ValueError(f"Teacher classes {teacher_classes} do not match dataset classes {classes}")
+
+    student = build_student(arch, len(classes))
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    teacher.to(device).eval()
+    student.to(device)
+    optimizer = AdamW(student.parameters(), lr=3e-4, weight_decay=1e-4)
+
+    # Below any real accuracy, so the first epoch always writes a checkpoint
+    # (and replaces one left by an earlier run)
+    best_acc = -1
+    ckpt_path = STUDENT_DIR / f"{arch}.pt"
+    STUDENT_DIR.mkdir(exist_ok=True, parents=True)
+
+    for epoch in range(EPOCHS):
+        student.train()
+        for x, y in train_loader:
+            x, y = x.to(device), y.to(device)
+            with torch.no_grad():
+                teacher_logits = logits_of(teacher, x)
+            optimizer.zero_grad()
+            loss = distillation_loss(student(x), teacher_logits, y)
+            loss.backward()
+            optimizer.step()
+
+        acc = evaluate(student, val_loader, device)
+        print("Epoch", epoch, "Student Acc", acc)
+
+        if acc > best_acc:
+            best_acc = acc
+            torch.save({
+                "model": student.state_dict(),
+                "classes": classes,
+                "arch": arch
+            }, ckpt_path)
+
+    student.load_state_dict(torch.load(ckpt_path, map_location=device)["model"])
+    teacher_acc = evaluate(teacher, val_loader, device)
+
+    student_onnx = STUDENT_DIR / f"{arch}.onnx"
+    teacher_onnx = STUDENT_DIR / "teacher_resnet50.onnx"
+    export_onnx(student.cpu(), student_onnx)
+    export_onnx(teacher.cpu(), teacher_onnx)
+    (STUDENT_DIR / "class_names.txt").write_text("\n".join(classes))
+
+    # Single-image latency under the same thread settings the backend uses
+    teacher_lat = benchmark(teacher_onnx, batch_sizes=(1,), runs=50)["1"]
+    student_lat = benchmark(student_onnx, batch_sizes=(1,), runs=50)["1"]
+
+    report = {
+        "arch": arch,
+        "classes": classes,
+        "teacher": {
+            "accuracy": teacher_acc,
+            "latency": teacher_lat,
+            "size_mb": teacher_onnx.stat().st_size / 1e6,
+        },
+        "student": {
+            "accuracy": best_acc,
+            "latency": student_lat,
+            "size_mb": student_onnx.stat().st_size / 1e6,
+        },
+        "accuracy_delta": best_acc - teacher_acc,
+        "speedup_p50": teacher_lat["p50_ms"] / student_lat["p50_ms"],
+    }
+    (STUDENT_DIR / f"{arch}_report.json").write_text(json.dumps(report, indent=2))
+
+    print(f"Teacher acc {teacher_acc:.3f}, p50 {teacher_lat['p50_ms']:.1f} ms")
+    print(f"Student acc {best_acc:.3f}, p50 {student_lat['p50_ms']:.1f} ms")
+    print(f"Speedup x{report['speedup_p50']:.1f}, accuracy delta {report['accuracy_delta']:+.3f}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Distill the ResNet50 teacher into a small CPU student.")
+    parser.add_argument("--arch", choices=sorted(STUDENTS), default="mobilenet_v3_large")
+    args = parser.parse_args()
+    distill(args.arch)
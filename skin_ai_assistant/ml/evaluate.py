@@ -0,0 +1,202 @@
+"""
+Offline evaluation of the served ONNX model.
+
+Images go through the exact SkinAIModel decode/transform path the backend
+uses, decoded in a thread pool (cv2 releases the GIL) while the previous
+batch is running through onnxruntime.
+"""
+import numpy as np
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from backend.config import BASE_DIR, BEST_MODEL
+from backend.inference import SkinAIModel
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def iter_directory(root):
+    """
+    Yield (path, label) pairs from an ImageFolder-style tree (root/<label>/*.jpg).
+    """
+    root = Path(root)
+    for label_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        for path in sorted(label_dir.iterdir()):
+            if path.suffix.lower() in IMAGE_EXTS:
+                yield path, label_dir.name
+
+
+def iter_feedback(chunk_size=1000):
+    """
+    Yield (path, label) pairs for every record whose label was confirmed
+    or corrected through /feedback.
+    """
+    from backend.db import SessionLocal
+    from backend.models import InferenceRecord
+
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(InferenceRecord.image_path, InferenceRecord.predicted_condition,
+                     InferenceRecord.is_correct, InferenceRecord.corrected_condition)
+            .filter(InferenceRecord.is_correct.isnot(None))
+            .yield_per(chunk_size)
+        )
+        for image_path, predicted, is_correct, corrected in query:
+            label = predicted if is_correct else corrected
+            if label:
+                yield BASE_DIR / image_path, label
+    finally:
+        db.close()
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load(model, path):
+    try:
+        return model.transform(model.decode(Path(path).read_bytes()))
+    except (OSError, ValueError):
+        return None
+
+
+def evaluate(samples, model, batch_size=64, workers=None):
+    """
+    Stream (path, label) samples through the model and collect metrics.
+    """
+    workers = workers or os.cpu_count() or 4
+    y_true, y_pred = [], []
+    skipped = 0
+    infer_s = 0.0
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batches = _batched(samples, batch_size)
+        pending = None
+        for batch in batches:
+            # Queue decoding of this batch before running the previous one
+            futures = [(label, pool.submit(_load, model, path)) for path, label in batch]
+            if pending is not None:
+                n_skipped, t_infer = _run(model, pending, y_true, y_pred)
+                skipped += n_skipped
+                infer_s += t_infer
+            pending = futures
+        if pending is not None:
+            n_skipped, t_infer = _run(model, pending, y_true, y_pred)
+            skipped += n_skipped
+            infer_s += t_infer
+    elapsed = time.perf_counter() - t_start
+
+    report = build_report(y_true, y_pred, model.labels, elapsed, skipped)
+    report["inference_s"] = infer_s
+    return report
+
+
+def _run(model, futures, y_true, y_pred):
+    labels, arrays = [], []
+    skipped = 0
+    for label, fut in futures:
+        arr = fut.result()
+        if arr is None:
+            skipped += 1
+            continue
+        labels.append(label)
+        arrays.append(arr)
+    if arrays:
+        t0 = time.perf_counter()
+        preds = model.predict_batch(np.stack(arrays))
+        elapsed = time.perf_counter() - t0
+        y_true.extend(labels)
+        y_pred.extend(label for label, _ in preds)
+        return skipped, elapsed
+    return skipped, 0.0
+
+
+def build_report(y_true, y_pred, model_labels, elapsed, skipped=0):
+    classes = list(model_labels) or []
+    for label in sorted(set(y_true) | set(y_pred)):
+        if label not in classes:
+            classes.append(label)
+    index = {c: i for i, c in enumerate(classes)}
+
+    cm = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    if y_true:
+        np.add.at(cm, ([index[t] for t in y_true], [index[p] for p in y_pred]), 1)
+
+    tp = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+
+    total = int(cm.sum())
+    return {
+        "images": total,
+        "skipped": skipped,
+        "accuracy": float(tp.sum() / total) if total else 0.0,
+        "macro_f1": float(f1[support > 0].mean()) if (support > 0).any() else 0.0,
+        "throughput_images_per_s": total / elapsed if elapsed > 0 else 0.0,
+        "elapsed_s": elapsed,
+        "classes": classes,
+        "per_class": {
+            c: {
+                "precision": float(precision[i]),
+                "recall": float(recall[i]),
+                "f1": float(f1[i]),
+                "support": int(support[i]),
+            }
+            for i, c in enumerate(classes)
+        },
+        "confusion_matrix": cm.tolist(),
+    }
+
+
+def print_report(report):
+    print(f"Images: {report['images']} (skipped {report['skipped']})")
+    print(f"Accuracy: {report['accuracy']:.4f}  Macro F1: {report['macro_f1']:.4f}")
+    print(f"Throughput: {report['throughput_images_per_s']:.1f} images/s")
+    print()
+    print(f"{'class':<20}{'precision':>10}{'recall':>10}{'f1':>10}{'support':>10}")
+    for c, m in report["per_class"].items():
+        print(f"{c:<20}{m['precision']:>10.3f}{m['recall']:>10.3f}{m['f1']:>10.3f}{m['support']:>10}")
+    print()
+    print("Confusion matrix (rows = true, cols = predicted):")
+    width = max(len(c) for c in report["classes"]) + 2 if report["classes"] else 8
+    print(" " * width + "".join(f"{c[:8]:>9}" for c in report["classes"]))
+    for c, row in zip(report["classes"], report["confusion_matrix"]):
+        print(f"{c:<{width}}" + "".join(f"{v:>9}" for v in row))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Evaluate the served ONNX model offline.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", type=Path, help="ImageFolder-style directory (root/<label>/*.jpg)")
+    source.add_argument("--feedback", action="store_true", help="Use feedback-labelled DB records")
+    parser.add_argument("--model", type=Path, default=BEST_MODEL, help="ONNX model to evaluate")
+    parser.add_argument("--labels", type=Path, default=None, help="class_names.txt (defaults to next to --model)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", type=Path, default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    model = SkinAIModel(args.model, args.labels or args.model.parent / "class_names.txt")
+    samples = iter_directory(args.dir) if args.dir else iter_feedback()
+    report = evaluate(samples, model, batch_size=args.batch_size, workers=args.workers)
+    report["model"] = str(args.model)
+    print_report(report)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
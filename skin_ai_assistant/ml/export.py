@@ -0,0 +1,261 @@
+import torch
+import torch.nn as nn
+import numpy as np
+import onnxruntime as ort
+import hashlib
+import json
+import shutil
+import os
+import time
+from datetime import datetime
+
+from backend.config import (
+    BEST_MODEL, LABELS_PATH, HEADS_PATH, MANIFEST_PATH, CANDIDATE_DIR,
+    ORT_INTRA_OP_THREADS, ORT_INTER_OP_THREADS, PARITY_ATOL, LATENCY_BUDGET_MS,
+)
+from backend.inference import create_session, external_weights_path
+from utils.onnx_models import externalize_weights, retarget_weights
+
+BATCH_SIZES = (1, 8, 32)
+
+
+def sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class WithEmbedding(nn.Module):
+    """
+    Expose the classifier's input (the penultimate layer) as a second
+    output, so the backend gets an embedding from the same ONNX pass.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        head = model.fc if hasattr(model, "fc") else model.classifier[-1]
+        self._features = None
+        self.hook = head.register_forward_hook(self._capture)
+
+    def _capture(self, module, inputs, output):
+        self._features = inputs[0]
+
+    def forward(self, x):
+        out = self.model(x)
+        if isinstance(out, tuple):
+            # Multi-head model: condition logits first, then the task heads
+            return (out[0], self._features) + out[1:]
+        return out, self._features
+
+
+def export_onnx(model, path):
+    path.parent.mkdir(exist_ok=True, parents=True)
+    device = next(model.parameters()).device
+    model.eval()
+    wrapped = WithEmbedding(model)
+    output_names = ["logits", "embedding"] + list(getattr(model, "head_names", []))
+    dynamic_axes = {name: {0: "batch"} for name in ["input"] + output_names}
+    try:
+        torch.onnx.export(
+            wrapped,
+            torch.randn(1, 3, 224, 224).to(device),
+            path,
+            input_names=["input"],
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=17
+        )
+    finally:
+        wrapped.hook.remove()
+    return path
+
+
+def export_candidate(model, out_dir=CANDIDATE_DIR):
+    """
+    Export to a candidate directory instead of the production path.
+    """
+    out_dir.mkdir(exist_ok=True, parents=True)
+    return export_onnx(model, out_dir / "skin_model.raw.onnx")
+
+
+def optimize(raw_path, out_path):
+    """
+    Apply onnxruntime graph optimizations offline and save the result.
+
+    ORT_ENABLE_EXTENDED is used rather than ORT_ENABLE_ALL: the layout
+    transforms of the latter are specific to the exporting machine.
+
+    The weights are then moved to a page-aligned external data file so
+    serving processes can memory-map and share them.
+    """
+    create_session(
+        raw_path,
+        optimized_model_path=out_path,
+        level=ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    )
+    externalize_weights(out_path)
+    return out_path
+
+
+def check_parity(model, onnx_path, val_loader, max_batches=4, atol=PARITY_ATOL):
+    """
+    Compare ONNX logits against the PyTorch model on validation images.
+    """
+    session = create_session(onnx_path)
+    name = session.get_inputs()[0].name
+    device = next(model.parameters()).device
+    model.eval()
+
+    max_diff, agree, total = 0.0, 0, 0
+    with torch.no_grad():
+        for i, (x, _) in enumerate(val_loader):
+            if i >= max_batches:
+                break
+            ref = model(x.to(device))
+            if isinstance(ref, tuple):
+                ref = ref[0]
+            ref = ref.cpu().numpy()
+            out = session.run(None, {name: x.numpy()})[0]
+            max_diff = max(max_diff, float(np.abs(ref - out).max()))
+            agree += int((ref.argmax(1) == out.argmax(1)).sum())
+            total += len(x)
+
+    return {
+        "max_abs_diff": max_diff,
+        "top1_agreement": agree / total if total else 0.0,
+        "atol": atol,
+        "passed": total > 0 and max_diff <= atol,
+    }
+
+
+def benchmark(onnx_path, batch_sizes=BATCH_SIZES, runs=20, warmup=3):
+    session = create_session(onnx_path)
+    name = session.get_inputs()[0].name
+    results = {}
+    for bs in batch_sizes:
+        x = np.random.rand(bs, 3, 224, 224).astype(np.float32)
+        for _ in range(warmup):
+            session.run(None, {name: x})
+        times = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            session.run(None, {name: x})
+            times.append((time.perf_counter() - t0) * 1000)
+        p50 = float(np.percentile(times, 50))
+        results[str(bs)] = {
+            "p50_ms": p50,
+            "p99_ms": float(np.percentile(times, 99)),
+            "images_per_s": bs * 1000 / p50,
+        }
+    return results
+
+
+def _copy_into_place(src, dst):
+    """Copy next to the destination, then rename, so readers never see a half-written file."""
+    tmp = dst.with_name(dst.name + ".tmp")
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+def promote(candidate_dir=CANDIDATE_DIR):
+    """
+    Copy a validated candidate over the production model.
+
+    Replacing the graph is the single commit point. Its weights go first,
+    under a name versioned by their hash that only the new graph
+    references, and the class names and head specs are embedded in the
+    graph as metadata, so a backend loading at any moment gets one
+    consistent model. The standalone label, head and manifest files
+    follow. Weights referenced by neither the new nor the previous graph
+    are then removed; the previous ones stay for processes that read the
+    old graph just before the swap.
+    """
+    graph = candidate_dir / "skin_model.onnx"
+    labels = candidate_dir / "class_names.txt"
+    heads = candidate_dir / "heads.json"
+    keep = {external_weights_path(BEST_MODEL) if BEST_MODEL.exists() else None}
+
+    weights = external_weights_path(graph)
+    data_name = None
+    if weights is not None:
+        versioned = BEST_MODEL.with_name(f"{BEST_MODEL.name}.{sha256(weights)[:12]}.data")
+        _copy_into_place(weights, versioned)
+        data_name = versioned.name
+        keep.add(versioned)
+
+    tmp = BEST_MODEL.with_name(BEST_MODEL.name + ".tmp")
+    metadata = {
+        "class_names": json.dumps(labels.read_text().splitlines()),
+        "heads": heads.read_text(),
+    }
+    retarget_weights(graph, tmp, data_name, metadata)
+    os.replace(tmp, BEST_MODEL)
+
+    for src, dst in ((labels, LABELS_PATH), (heads, HEADS_PATH), (candidate_dir / "manifest.json", MANIFEST_PATH)):
+        _copy_into_place(src, dst)
+
+    for stale in BEST_MODEL.parent.glob(f"{BEST_MODEL.name}*.data"):
+        if stale not in keep:
+            try:
+                stale.unlink()
+            except OSError:  # still mapped by a running process (Windows)
+                pass
+
+
+def validate_and_promote(model, classes, val_loader, accuracy, checkpoint=None,
+                         candidate_dir=CANDIDATE_DIR, latency_budget_ms=LATENCY_BUDGET_MS):
+    """
+    Export, optimize, verify and benchmark a model, then promote it to
+    production only if parity and the batch-1 latency budget both pass.
+    """
+    raw_path = export_candidate(model, candidate_dir)
+    onnx_path = optimize(raw_path, candidate_dir / "skin_model.onnx")
+    labels_path = candidate_dir / "class_names.txt"
+    labels_path.write_text("\n".join(classes))
+    heads_path = candidate_dir / "heads.json"
+    heads_path.write_text(json.dumps(getattr(model, "head_specs", {}), indent=2))
+
+    parity = check_parity(model, onnx_path, val_loader)
+    latency = benchmark(onnx_path)
+    latency_ok = latency["1"]["p50_ms"] <= latency_budget_ms
+
+    manifest = {
+        "created_at": datetime.utcnow().isoformat(),
+        "classes": list(classes),
+        "heads": getattr(model, "head_specs", {}),
+        "accuracy": accuracy,
+        "parity": parity,
+        "latency": latency,
+        "latency_budget_ms": latency_budget_ms,
+        "threads": {"intra_op": ORT_INTRA_OP_THREADS, "inter_op": ORT_INTER_OP_THREADS},
+        "onnxruntime": ort.__version__,
+        "hashes": {
+            "model": sha256(onnx_path),
+            "weights": sha256(external_weights_path(onnx_path)),
+            "labels": sha256(labels_path),
+            "heads": sha256(heads_path),
+        },
+        "promoted": parity["passed"] and latency_ok,
+    }
+    if checkpoint is not None and checkpoint.exists():
+        manifest["hashes"]["checkpoint"] = sha256(checkpoint)
+    (candidate_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    print(f"Parity: max diff {parity['max_abs_diff']:.2e}, agreement {parity['top1_agreement']:.3f}")
+    for bs, r in latency.items():
+        print(f"Batch {bs}: p50 {r['p50_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms")
+
+    if manifest["promoted"]:
+        promote(candidate_dir)
+        print(f"Promoted candidate to {BEST_MODEL}")
+    else:
+        reasons = []
+        if not parity["passed"]:
+            reasons.append("parity")
+        if not latency_ok:
+            reasons.append(f"latency (p50 {latency['1']['p50_ms']:.1f} ms > {latency_budget_ms} ms)")
+        print(f"Candidate NOT promoted, failed: {', '.join(reasons)}. Left in {candidate_dir}")
+    return manifest
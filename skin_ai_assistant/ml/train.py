@@ -8,11 +8,96 @@ import mlflow
 import mlflow.pytorch
 import json
 
-from backend.config import BASE_DIR, MODELS_DIR, BEST_MODEL
+from backend.config import BASE_DIR, MODELS_DIR
+from ml.export import validate_and_promote
 
 DATA = BASE_DIR / "dataset"
 
-def load_data():
+# Auxiliary heads sharing the backbone with the condition classifier.
+# Labels come from dataset/metadata.json written by build_dataset.py.
+HEADS = {
+    "skin_type": {"type": "classification", "labels": ["oily", "dry", "combination", "sensitive", "normal"]},
+    "fitzpatrick": {"type": "classification", "labels": ["I", "II", "III", "IV", "V", "VI"]},
+    "acne_grade": {"type": "regression"},
+    "pih_level": {"type": "regression"},
+}
+AUX_LOSS_WEIGHT = 0.5
+
+
+class MultiHeadNet(nn.Module):
+    """
+    ResNet50 backbone with the condition classifier as `fc` plus one
+    small linear head per auxiliary task, all fed by the same features.
+    """
+
+    def __init__(self, num_classes, heads=HEADS, pretrained=True):
+        super().__init__()
+        self.backbone = models.resnet50(weights=models.ResNet50_Weights.IMAGENET1K_V2 if pretrained else None)
+        in_features = self.backbone.fc.in_features
+        self.backbone.fc = nn.Identity()
+        self.fc = nn.Linear(in_features, num_classes)
+        self.head_specs = heads
+        self.head_names = list(heads)
+        self.heads = nn.ModuleDict({
+            name: nn.Linear(in_features, len(spec["labels"]) if spec["type"] == "classification" else 1)
+            for name, spec in heads.items()
+        })
+
+    def forward(self, x):
+        features = self.backbone(x)
+        return (self.fc(features),) + tuple(self.heads[name](features) for name in self.head_names)
+
+
+class MultiTaskFolder(datasets.ImageFolder):
+    """
+    ImageFolder that also returns auxiliary targets: a class index (-1 if
+    unknown) for classification heads and a float (NaN if unknown) for
+    regression heads.
+    """
+
+    def __init__(self, root, transform, heads=HEADS, metadata_path=DATA/'metadata.json'):
+        super().__init__(root, transform)
+        self.head_specs = heads
+        meta = json.loads(Path(metadata_path).read_text()) if Path(metadata_path).exists() else {}
+        self.aux = [self._targets(meta.get(Path(path).relative_to(DATA).as_posix(), {})) for path, _ in self.samples]
+        # Labelled samples per head; a head with none would never be trained
+        self.label_counts = {
+            name: sum(bool(t[name] >= 0) if spec["type"] == "classification" else not torch.isnan(t[name])
+                      for t in self.aux)
+            for name, spec in heads.items()
+        }
+
+    def _targets(self, entry):
+        targets = {}
+        for name, spec in self.head_specs.items():
+            value = entry.get(name)
+            if spec["type"] == "classification":
+                labels = spec["labels"]
+                targets[name] = torch.tensor(labels.index(value) if value in labels else -1)
+            else:
+                targets[name] = torch.tensor(float(value) if value is not None else float("nan"))
+        return targets
+
+    def __getitem__(self, index):
+        x, y = super().__getitem__(index)
+        return x, y, self.aux[index]
+
+
+def aux_loss(outputs, aux, heads=HEADS):
+    """Masked loss over the auxiliary heads; unlabeled samples are skipped."""
+    total = 0.0
+    for out, (name, spec) in zip(outputs, heads.items()):
+        target = aux[name].to(out.device)
+        if spec["type"] == "classification":
+            if (target >= 0).any():
+                total = total + nn.functional.cross_entropy(out, target, ignore_index=-1)
+        else:
+            mask = ~torch.isnan(target)
+            if mask.any():
+                total = total + nn.functional.smooth_l1_loss(out.squeeze(1)[mask], target[mask])
+    return total
+
+def load_data(multitask=False):
     transform_train = transforms.Compose([
         transforms.Resize((256,256)),
         transforms.RandomResizedCrop(224),
@@ -28,7 +113,10 @@ def load_data():
         transforms.Normalize([0.485,0.456,0.406],[0.229,0.224,0.225])
     ])
 
-    train_ds = datasets.ImageFolder(DATA/'train', transform_train)
+    if multitask:
+        train_ds = MultiTaskFolder(DATA/'train', transform_train)
+    else:
+        train_ds = datasets.ImageFolder(DATA/'train', transform_train)
     val_ds = datasets.ImageFolder(DATA/'val', transform_val)
 
     train_loader = DataLoader(train_ds, batch_size=32, shuffle=True)
@@ -36,11 +124,26 @@ def load_data():
 
     return train_loader, val_loader, train_ds.classes
 
+def supervised_heads(label_counts, heads=HEADS):
+    """
+    The heads with at least one labelled training sample, each with its
+    count as "labelled"; heads without labels are neither trained,
+    exported nor served.
+    """
+    return {
+        name: dict(spec, labelled=label_counts[name])
+        for name, spec in heads.items()
+        if label_counts.get(name, 0) > 0
+    }
+
 def train():
-    train_loader, val_loader, classes = load_data()
+    train_loader, val_loader, classes = load_data(multitask=True)
+    heads = supervised_heads(train_loader.dataset.label_counts)
+    skipped = sorted(set(HEADS) - set(heads))
+    if skipped:
+        print("No labels for heads", ", ".join(skipped), "- not training them")
 
-    model = models.resnet50(weights=models.ResNet50_Weights.IMAGENET1K_V2)
-    model.fc = nn.Linear(model.fc.in_features, len(classes))
+    model = MultiHeadNet(len(classes), heads=heads)
 
     criterion = nn.CrossEntropyLoss()
     optimizer = Adam(model.parameters(), lr=1e-4)
@@ -54,11 +157,11 @@ def train():
         model.train()
         total, correct = 0, 0
 
-        for x,y in train_loader:
+        for x,y,aux in train_loader:
             x,y = x.to(device), y.to(device)
             optimizer.zero_grad()
-            out = model(x)
-            loss = criterion(out,y)
+            out, *head_outs = model(x)
+            loss = criterion(out,y) + AUX_LOSS_WEIGHT * aux_loss(head_outs, aux, heads)
             loss.backward()
             optimizer.step()
 
@@ -68,7 +171,7 @@ def train():
         with torch.no_grad():
             for x,y in val_loader:
                 x,y = x.to(device), y.to(device)
-                out = model(x)
+                out = model(x)[0]
                 pred = out.argmax(1)
                 val_correct += (pred==y).sum().item()
                 val_total += len(y)
@@ -80,24 +183,14 @@ def train():
             best_acc = acc
             torch.save({
                 "model": model.state_dict(),
-                "classes": classes
+                "classes": classes,
+                "heads": heads
             }, MODELS_DIR/"best_model.pt")
 
-    # Export ONNX
-    dummy = torch.randn(1,3,224,224).to(device)
-    model.eval()
-    torch.onnx.export(
-        model,
-        dummy,
-        BEST_MODEL,
-        input_names=["input"],
-        output_names=["logits"],
-        dynamic_axes={"input":{0:"batch"}, "logits":{0:"batch"}},
-        opset_version=17
-    )
-
-    # Save labels
-    (MODELS_DIR/"best"/"class_names.txt").write_text("\n".join(classes))
+    # Export the best checkpoint, verify it and promote it if it passes
+    ckpt_path = MODELS_DIR/"best_model.pt"
+    model.load_state_dict(torch.load(ckpt_path, map_location=device)["model"])
+    return validate_and_promote(model, classes, val_loader, best_acc, checkpoint=ckpt_path)
 
 if __name__ == "__main__":
     train()
\ No newline at end of file
@@ -1,23 +1,24 @@
 import os
 import sys
 from pathlib import Path
-from utils.port_utils import get_free_port, is_port_free
+from utils.port_utils import hold_port, is_port_free
 import subprocess
 
 
 def main():
     admin_port_env = os.getenv("ADMIN_PORT")
-    if admin_port_env:
-        admin_port = int(admin_port_env)
-        # Verify the specified port is actually free
-        if not is_port_free(admin_port):
-            print(f"[Admin] WARNING: Specified port {admin_port} is in use, finding alternative...")
-            admin_port = get_free_port(8000, 9000)
-            os.environ["ADMIN_PORT"] = str(admin_port)
-    else:
-        # Dynamically find any free port in wide range
-        admin_port = get_free_port(8000, 9000)
-        os.environ["ADMIN_PORT"] = str(admin_port)
+    admin_port = int(admin_port_env) if admin_port_env else 0
+    if admin_port and not is_port_free(admin_port):
+        print(f"[Admin] WARNING: Specified port {admin_port} is in use, finding alternative...")
+        admin_port = 0
+    # Hold the port (bound, not listening) for as long as streamlit runs so
+    # nothing else takes it; streamlit binds it with SO_REUSEADDR on top.
+    # Windows has no such reuse, so there the port is released before launch.
+    placeholder = hold_port("127.0.0.1", admin_port)
+    admin_port = placeholder.getsockname()[1]
+    if os.name != "posix":
+        placeholder.close()
+    os.environ["ADMIN_PORT"] = str(admin_port)
 
     # Set backend URL if provided
     backend_port = os.getenv("BACKEND_PORT", "8000")
@@ -25,15 +26,17 @@ def main():
 
     admin_app_path = Path(__file__).parent / "ui" / "admin_app.py"
 
-    print(f"[Admin] Starting Admin Dashboard on port {admin_port} (dynamically allocated)")
+    print(f"[Admin] Starting Admin Dashboard on port {admin_port}")
     print(f"[Admin] Connecting to backend at {os.environ['SKINAI_API_URL']}")
 
-    subprocess.run([
+    result = subprocess.run([
         sys.executable, "-m", "streamlit", "run",
         str(admin_app_path),
         "--server.port", str(admin_port),
         "--server.address", "localhost"
     ])
+    placeholder.close()
+    sys.exit(result.returncode)
 
 
 if __name__ == "__main__":
@@ -1,33 +1,167 @@
 #!/usr/bin/env python3
 """
 Unified launcher for all Skin AI Assistant services with dynamic port mapping.
-Launches backend, UI, and admin dashboard in separate processes.
-All ports are dynamically allocated from any available free ports.
+Launches backend, UI, and admin dashboard in parallel as separate processes,
+polls each one's health endpoint until it is ready, and restarts any service
+that crashes (with exponential backoff).
+Ports come from the OS (bind to port 0) and stay reserved for the launcher's
+lifetime: the backend inherits its listening socket, and the streamlit ports
+are held by non-listening placeholders.
 """
 import os
+import signal
 import sys
 import subprocess
 import time
+import urllib.request
 from pathlib import Path
-from utils.port_utils import get_multiple_free_ports, get_free_port
+from utils.port_utils import reserve_socket, hold_port
 
+POLL_INTERVAL = 0.05
+READY_WARN_AFTER = 60  # seconds before a slow service gets a warning
+STABLE_AFTER = 60  # a service up this long has its restart backoff reset
 
-def main():
-    # Find 3 free ports for all services dynamically from wide range
-    print(">> Scanning for available free ports...")
+
+class Backoff:
+    """Exponential backoff: initial, initial*factor, ... capped at maximum."""
+
+    def __init__(self, initial, maximum, factor=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        self.current = self.initial
+
+    def next(self):
+        delay = self.current
+        self.current = min(self.current * self.factor, self.maximum)
+        return delay
+
+
+class Service:
+    """One supervised child process plus the URL that says it is ready."""
+
+    def __init__(self, name, script, health_url, env, pass_fds=()):
+        self.name = name
+        self.script = script
+        self.health_url = health_url
+        self.env = env
+        self.pass_fds = tuple(pass_fds)
+        self.proc = None
+        self.restarts = 0
+        self.started_at = self.ready_at = self.restart_at = None
+        self.next_probe = 0.0
+        self.probe_backoff = Backoff(0.1, 2.0, factor=1.5)
+        self.restart_backoff = Backoff(1.0, 30.0)
+
+    def start(self):
+        kwargs = {}
+        if os.name == "posix":
+            # Own process group, so stopping also stops streamlit/uvicorn grandchildren
+            kwargs["start_new_session"] = True
+            kwargs["pass_fds"] = self.pass_fds
+        self.proc = subprocess.Popen([sys.executable, str(self.script)], env=self.env, **kwargs)
+        self.started_at = time.perf_counter()
+        self.ready_at = None
+        self.next_probe = self.started_at
+        self.restart_at = None
+        self.probe_backoff.reset()
+
+    def probe(self):
+        try:
+            with urllib.request.urlopen(self.health_url, timeout=1) as resp:
+                return resp.status == 200
+        except OSError:
+            return False
+
+    def stop(self, timeout=5):
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(self.proc.pid, signal.SIGTERM)
+            else:
+                self.proc.terminate()
+            self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            if os.name == "posix":
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            else:
+                self.proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+def supervise(services):
+    """Poll readiness and restart crashed services until interrupted."""
+    launched = time.perf_counter()
+    all_ready = False
+    warned = set()
+
+    while True:
+        now = time.perf_counter()
+        for svc in services:
+            if svc.restart_at is not None:
+                if now >= svc.restart_at:
+                    svc.restarts += 1
+                    print(f"[{svc.name}] Restarting (attempt {svc.restarts})...")
+                    svc.start()
+                continue
+
+            code = svc.proc.poll()
+            if code is not None:
+                if svc.ready_at is not None and now - svc.ready_at > STABLE_AFTER:
+                    svc.restart_backoff.reset()
+                delay = svc.restart_backoff.next()
+                print(f"[{svc.name}] [ERROR] Exited with code {code}; restarting in {delay:.0f}s")
+                svc.restart_at = now + delay
+                all_ready = False
+                continue
+
+            if svc.ready_at is None and now >= svc.next_probe:
+                if svc.probe():
+                    svc.ready_at = time.perf_counter()
+                    print(f"[{svc.name}] Ready in {svc.ready_at - svc.started_at:.2f}s")
+                else:
+                    svc.next_probe = now + svc.probe_backoff.next()
+                    if now - svc.started_at > READY_WARN_AFTER and svc.name not in warned:
+                        warned.add(svc.name)
+                        print(f"[{svc.name}] [WARNING] Not ready after {READY_WARN_AFTER}s, still waiting...")
+
+        if not all_ready and all(s.ready_at is not None for s in services):
+            all_ready = True
+            print(f"\n[OK] All services ready in {time.perf_counter() - launched:.2f}s")
+        time.sleep(POLL_INTERVAL)
+
+
+def _reserve(env_name, reserve, host):
+    """Reserve the port named in env_name, or any free port if unset or taken."""
+    wanted = int(os.getenv(env_name) or 0)
     try:
-        # Try to get 3 free ports from entire range 8000-9000
-        ports = get_multiple_free_ports(count=3, start_port=8000, max_port=9000)
-        backend_port, ui_port, admin_port = ports[0], ports[1], ports[2]
-        print(f"   Found 3 free ports: {backend_port}, {ui_port}, {admin_port}")
-    except RuntimeError as e:
-        print(f"   [WARNING] {e}")
-        print("   Falling back to range-based allocation...")
-        # Fallback to range-based allocation
-        backend_port = get_free_port(8000, 8100)
-        ui_port = get_free_port(8501, 8600)
-        admin_port = get_free_port(8601, 8700)
-        print(f"   Allocated ports: {backend_port}, {ui_port}, {admin_port}")
+        return reserve(host, wanted)
+    except OSError:
+        print(f"   [WARNING] {env_name}={wanted} is in use, letting the OS pick a free port")
+        return reserve(host, 0)
+
+
+def main():
+    # Bind the requested ports (or let the OS pick free ones) and keep them until we exit
+    backend_sock = _reserve("BACKEND_PORT", reserve_socket, "0.0.0.0")
+    ui_hold = _reserve("UI_PORT", hold_port, "127.0.0.1")
+    admin_hold = _reserve("ADMIN_PORT", hold_port, "127.0.0.1")
+    backend_port = backend_sock.getsockname()[1]
+    ui_port = ui_hold.getsockname()[1]
+    admin_port = admin_hold.getsockname()[1]
+    backend_fds = ()
+    if os.name == "posix":
+        # The backend serves on the inherited socket itself
+        os.environ["BACKEND_FD"] = str(backend_sock.fileno())
+        backend_fds = (backend_sock.fileno(),)
+    else:
+        # No fd passing on Windows: release the port just before uvicorn binds it
+        backend_sock.close()
 
     # Set environment variables
     os.environ["BACKEND_PORT"] = str(backend_port)
@@ -46,41 +180,31 @@ def main():
 
     # Get script directory
     script_dir = Path(__file__).parent
+    env = os.environ.copy()
+    # Placeholders the Streamlit children bind over on POSIX
+    holds = {"UI": ui_hold, "Admin": admin_hold}
+
+    services = [
+        Service("Backend", script_dir / "run_backend.py", f"http://127.0.0.1:{backend_port}/health", env,
+                pass_fds=backend_fds),
+        Service("UI", script_dir / "run_ui.py", f"http://localhost:{ui_port}/_stcore/health", env),
+        Service("Admin", script_dir / "run_admin.py", f"http://localhost:{admin_port}/_stcore/health", env),
+    ]
 
-    processes = []
+    def on_sigterm(signum, frame):
+        raise KeyboardInterrupt
+
+    # Treat `kill` like Ctrl+C: the children live in their own sessions
+    signal.signal(signal.SIGTERM, on_sigterm)
 
     try:
-        # Start backend
-        print(f"[1/3] Starting Backend API on port {backend_port}...")
-        backend_proc = subprocess.Popen(
-            [sys.executable, str(script_dir / "run_backend.py")],
-            env=os.environ.copy()
-        )
-        processes.append(("Backend", backend_proc))
-        print("   Waiting for backend to initialize...")
-        time.sleep(5)  # Give backend more time to start and load model
-
-        # Start UI
-        print(f"[2/3] Starting User UI on port {ui_port}...")
-        ui_proc = subprocess.Popen(
-            [sys.executable, str(script_dir / "run_ui.py")],
-            env=os.environ.copy()
-        )
-        processes.append(("UI", ui_proc))
-        time.sleep(3)  # Give UI time to start
-
-        # Start Admin
-        print(f"[3/3] Starting Admin Dashboard on port {admin_port}...")
-        admin_proc = subprocess.Popen(
-            [sys.executable, str(script_dir / "run_admin.py")],
-            env=os.environ.copy()
-        )
-        processes.append(("Admin", admin_proc))
-        time.sleep(2)  # Give admin time to start
+        for svc in services:
+            print(f"Starting {svc.name}...")
+            if os.name != "posix" and svc.name in holds:
+                # No SO_REUSEADDR on Windows: release the port just before streamlit binds it
+                holds[svc.name].close()
+            svc.start()
 
-        print()
-        print("[OK] All services started successfully!")
-        print("=" * 70)
         print()
         print("Access URLs:")
         print(f"   - API Documentation: http://127.0.0.1:{backend_port}/docs")
@@ -90,25 +214,19 @@ def main():
         print("Press Ctrl+C to stop all services")
         print("=" * 70)
 
-        # Wait for all processes
-        for name, proc in processes:
-            proc.wait()
+        supervise(services)
 
     except KeyboardInterrupt:
         print("\n\n[STOP] Shutting down all services...")
-        for name, proc in processes:
-            print(f"   Stopping {name}...")
-            proc.terminate()
-            try:
-                proc.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                proc.kill()
+        for svc in services:
+            print(f"   Stopping {svc.name}...")
+            svc.stop()
         print("[OK] All services stopped.")
 
     except Exception as e:
         print(f"\n[ERROR] {e}")
-        for name, proc in processes:
-            proc.terminate()
+        for svc in services:
+            svc.stop()
         sys.exit(1)
 
 
@@ -1,25 +1,28 @@
 import os
-from utils.port_utils import get_free_port, is_port_free
+import socket
+from utils.port_utils import is_port_free, reserve_socket
 import uvicorn
 
 
 def main():
-    port_env = os.getenv("BACKEND_PORT")
-    if port_env:
-        port = int(port_env)
-        # Verify the specified port is actually free
-        if not is_port_free(port):
-            print(f"[Backend] WARNING: Specified port {port} is in use, finding alternative...")
-            port = get_free_port(8000, 9000)
-            os.environ["BACKEND_PORT"] = str(port)
+    fd_env = os.getenv("BACKEND_FD")
+    if fd_env:
+        # Listening socket inherited from run_all.py; already bound, so no race
+        sock = socket.socket(fileno=int(fd_env))
     else:
-        # Dynamically find any free port in wide range
-        port = get_free_port(8000, 9000)
-        os.environ["BACKEND_PORT"] = str(port)
+        port_env = os.getenv("BACKEND_PORT")
+        port = int(port_env) if port_env else 0
+        if port and not is_port_free(port, "0.0.0.0"):
+            print(f"[Backend] WARNING: Specified port {port} is in use, finding alternative...")
+            port = 0
+        # Bind now and hand uvicorn the socket (port 0 = any free port)
+        sock = reserve_socket("0.0.0.0", port)
+
+    port = sock.getsockname()[1]
+    os.environ["BACKEND_PORT"] = str(port)
 
     print(f"[Backend] Starting FastAPI on port {port}")
-    print(f"[Backend] Scanning for free port from entire range 8000-9000")
-    uvicorn.run("backend.main:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run("backend.main:app", fd=sock.fileno(), reload=True)
 
 
 if __name__ == "__main__":
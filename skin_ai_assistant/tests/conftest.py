@@ -1,5 +1,8 @@
+import io
+
 import pytest
 from fastapi.testclient import TestClient
+from PIL import Image
 
 from backend.main import app
 
@@ -8,6 +11,16 @@ from backend.main import app
 def client():
     """
     Shared FastAPI TestClient for all tests.
-    Uses the real app with SQLite DB.
+    Uses the real app with SQLite DB; entering the client runs the
+    lifespan hook (schema creation and model load).
     """
-    return TestClient(app)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def image_bytes():
+    """A small JPEG to upload to the analysis endpoints."""
+    buf = io.BytesIO()
+    Image.new("RGB", (128, 128), color=(150, 120, 100)).save(buf, format="JPEG")
+    return buf.getvalue()
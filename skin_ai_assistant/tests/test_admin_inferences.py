@@ -15,3 +15,28 @@ def test_admin_inferences_list(client):
         assert "id" in rec
         assert "predicted_condition" in rec
         assert "needs_review" in rec
+
+
+def test_admin_inferences_pagination(client):
+    from backend.db import SessionLocal
+    from backend.models import InferenceRecord
+
+    db = SessionLocal()
+    try:
+        for i in range(3):
+            db.add(InferenceRecord(image_path=f"page_{i}.jpg", predicted_condition="normal"))
+        db.commit()
+    finally:
+        db.close()
+
+    resp = client.get("/admin/inferences", params={"limit": 2, "offset": 0})
+    assert resp.status_code == 200
+    total = int(resp.headers["x-total-count"])
+    assert total >= 3
+    first = resp.json()
+    second = client.get("/admin/inferences", params={"limit": 2, "offset": 2}).json()
+    assert len(first) == 2
+    assert not {r["id"] for r in first} & {r["id"] for r in second}
+    assert first[-1]["created_at"] >= second[0]["created_at"]
+
+    assert client.get("/admin/inferences", params={"offset": -1}).status_code == 400
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import admission, metrics
+
+
+def _hold_slot(controller):
+    """Occupy one slot from another thread until the returned event is set."""
+    entered, release = threading.Event(), threading.Event()
+
+    def run():
+        with controller.admit():
+            entered.set()
+            release.wait(5)
+
+    t = threading.Thread(target=run)
+    t.start()
+    entered.wait(5)
+    return release, t
+
+
+def test_sheds_when_queue_is_full():
+    controller = admission.AdmissionController(limit=1, max_waiting=0, deadline=5)
+    release, t = _hold_slot(controller)
+    try:
+        with pytest.raises(admission.Overloaded) as exc:
+            with controller.admit():
+                pass
+        assert exc.value.reason == "queue_full"
+        assert exc.value.retry_after >= 1
+    finally:
+        release.set()
+        t.join()
+    # The slot is free again
+    with controller.admit() as queued:
+        assert queued < 1
+
+
+def test_sheds_when_expected_wait_exceeds_deadline():
+    controller = admission.AdmissionController(limit=1, max_waiting=10, deadline=0.5)
+    controller.service_time = 2.0
+    release, t = _hold_slot(controller)
+    try:
+        with pytest.raises(admission.Overloaded) as exc:
+            with controller.admit():
+                pass
+        assert exc.value.reason == "deadline"
+    finally:
+        release.set()
+        t.join()
+
+
+def test_unshed_callers_wait_for_a_slot():
+    controller = admission.AdmissionController(limit=1, max_waiting=0, deadline=0.01)
+    release, t = _hold_slot(controller)
+    threading.Timer(0.1, release.set).start()
+    with controller.admit(shed=False) as queued:
+        assert queued >= 0.05
+    t.join()
+    assert controller.active == 0 and controller.waiting == 0
+
+
+def test_waiters_are_served_in_arrival_order():
+    controller = admission.AdmissionController(limit=1, max_waiting=10, deadline=5)
+    release, t = _hold_slot(controller)
+    order = []
+
+    def waiter(i):
+        with controller.admit():
+            order.append(i)
+
+    threads = []
+    for i in range(5):
+        threads.append(threading.Thread(target=waiter, args=(i,)))
+        threads[-1].start()
+        while controller.waiting < i + 1:
+            time.sleep(0.001)
+    release.set()
+    for w in threads + [t]:
+        w.join(5)
+    assert order == [0, 1, 2, 3, 4]
+    assert controller.active == 0 and controller.waiting == 0
+
+
+def test_deadline_counts_from_arrival():
+    controller = admission.AdmissionController(limit=1, max_waiting=10, deadline=0.5)
+    controller.service_time = 0.2
+    release, t = _hold_slot(controller)
+    try:
+        # Arrived 0.4s ago: 0.2s more of expected wait overshoots the deadline
+        with pytest.raises(admission.Overloaded) as exc:
+            controller.acquire(arrived=time.perf_counter() - 0.4)
+        assert exc.value.reason == "deadline"
+    finally:
+        release.set()
+        t.join()
+
+
+def test_async_acquire_sheds_before_reaching_the_pool():
+    controller = admission.AdmissionController(limit=1, max_waiting=1, deadline=0.3)
+    outcomes = []
+
+    async def request(i):
+        try:
+            queued = await controller.acquire_async()
+        except admission.Overloaded as e:
+            outcomes.append((i, e.reason))
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(controller.executor, time.sleep, 0.05)
+        finally:
+            controller.release(0.05)
+        outcomes.append((i, "ok"))
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(request(i) for i in range(12)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(main())
+    # One running, one waiting: everyone else is shed at once, in arrival order
+    assert sorted(outcomes) == [(0, "ok"), (1, "ok")] + [(i, "queue_full") for i in range(2, 12)]
+    assert elapsed < 0.3
+    assert controller.active == 0 and controller.waiting == 0
+
+
+def test_analyze_returns_503_with_retry_after_when_overloaded(client, monkeypatch, image_bytes):
+    controller = admission.AdmissionController(limit=1, max_waiting=0, deadline=5)
+    monkeypatch.setattr(admission, "_CONTROLLER", controller)
+    release, t = _hold_slot(controller)
+    try:
+        resp = client.post("/analyze", files={"file": ("a.jpg", image_bytes, "image/jpeg")})
+    finally:
+        release.set()
+        t.join()
+    assert resp.status_code == 503
+    assert int(resp.headers["retry-after"]) >= 1
+    assert metrics.ADMISSION_SHED.labels("queue_full").value >= 1
+
+    body = client.get("/metrics").text
+    assert "skinai_analyze_shed_total" in body
+    assert "skinai_analyze_queue_depth" in body
+
+
+def test_analyze_reports_queue_stage(client, image_bytes):
+    resp = client.post(
+        "/analyze", files={"file": ("a.jpg", image_bytes, "image/jpeg")}, data={"debug": "true"},
+    )
+    assert resp.status_code == 200
+    assert "queue" in resp.json()["timings"]
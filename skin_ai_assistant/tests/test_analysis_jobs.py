@@ -0,0 +1,76 @@
+import json
+import time
+
+from backend import jobs
+
+
+def _submit(client, image_bytes, **data):
+    return client.post(
+        "/analyze/jobs", files={"file": ("job.jpg", image_bytes, "image/jpeg")}, data=data,
+    )
+
+
+def test_job_can_be_polled_to_completion(client, image_bytes):
+    resp = _submit(client, image_bytes, debug="true")
+    assert resp.status_code == 202
+    job_id = resp.json()["job_id"]
+    assert resp.headers["location"] == f"/analyze/jobs/{job_id}"
+
+    deadline = time.time() + 10
+    while True:
+        body = client.get(f"/analyze/jobs/{job_id}").json()
+        if body["status"] in ("done", "failed") or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert body["status"] == "done"
+    assert body["result"]["inference_id"]
+    assert "infer" in body["result"]["timings"]
+
+
+def test_job_events_stream_result(client, image_bytes):
+    job_id = _submit(client, image_bytes).json()["job_id"]
+    events = []
+    with client.stream("GET", f"/analyze/jobs/{job_id}/events") as resp:
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        event = None
+        for line in resp.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+    assert events[0][0] == "status"
+    assert events[-1][0] == "result"
+    assert events[-1][1]["result"]["condition"]
+
+
+def test_failed_job_reports_error(client):
+    resp = client.post("/analyze/jobs", files={"file": ("bad.jpg", b"not an image", "image/jpeg")})
+    job = jobs.get_queue().get(resp.json()["job_id"])
+    deadline = time.time() + 10
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.05)
+    body = client.get(f"/analyze/jobs/{job.id}").json()
+    assert body["status"] == "failed"
+    assert body["error"] == {"status_code": 400, "detail": "Could not decode image"}
+
+
+def test_full_queue_sheds_with_503(client, monkeypatch, image_bytes):
+    # No workers, so the single slot stays occupied
+    monkeypatch.setattr(jobs, "_QUEUE", jobs.JobQueue(workers=0, maxsize=1))
+    assert _submit(client, image_bytes).status_code == 202
+    resp = _submit(client, image_bytes)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"]
+    assert client.get("/analyze/jobs/unknown").status_code == 404
+
+
+def test_finished_jobs_drop_their_upload_and_are_capped():
+    q = jobs.JobQueue(workers=1, max_finished=2)
+    submitted = [q.submit(lambda b: len(b), b"x" * 1024) for _ in range(3)]
+    # Stopping drains the queue first
+    q.stop(timeout=10)
+    assert [job.result for job in submitted] == [1024] * 3
+    assert all(job.args is None and job.fn is None and job.context is None for job in submitted)
+    # Only the two most recently finished are kept
+    assert q.get(submitted[0].id) is None
+    assert [q.get(job.id) for job in submitted[1:]] == submitted[1:]
@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from backend import main
+
+
+def _pixels(height=96, width=128):
+    return (np.random.default_rng(0).random((height, width, 3)) * 255).astype(np.uint8)
+
+
+def _jpeg():
+    buf = io.BytesIO()
+    Image.fromarray(_pixels()).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+OCTET = {"Content-Type": "application/octet-stream"}
+
+
+def test_raw_encoded_image_with_query_profile(client):
+    resp = client.post(
+        "/analyze/raw?skin_type=oily&fitzpatrick=IV&debug=true", content=_jpeg(), headers=OCTET,
+    )
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["skin_type"] == "oily"
+    assert body["fitzpatrick"] == "IV"
+    assert body["ethnicity"] == "unspecified"
+    assert "read" in body["timings"] and "infer" in body["timings"]
+
+
+def test_raw_rgb_pixels_with_header_profile(client):
+    pixels = _pixels(96, 128)
+    resp = client.post(
+        "/analyze/raw?debug=true",
+        content=pixels.tobytes(),
+        headers={**OCTET, "X-Image-Shape": "96,128,3", "X-Skin-Type": "dry", "X-Ethnicity": "south_asian"},
+    )
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["skin_type"] == "dry"
+    assert body["ethnicity"] == "south_asian"
+    # PNG encoding is timed apart from the file write
+    assert "encode" in body["timings"] and "write" in body["timings"]
+
+    # Raw pixels are stored as a lossless PNG for retraining
+    stored = list(main.IMAGES.glob("raw_*.png"))
+    assert stored
+    assert np.array_equal(np.asarray(Image.open(max(stored, key=lambda p: p.stat().st_mtime))), pixels)
+
+
+def test_raw_rejects_bad_requests(client):
+    assert client.post("/analyze/raw", content=_jpeg(), headers={"Content-Type": "image/jpeg"}).status_code == 415
+    assert client.post("/analyze/raw", content=b"", headers=OCTET).status_code == 400
+    assert client.post("/analyze/raw", content=b"not an image", headers=OCTET).status_code == 400
+
+    wrong_size = client.post(
+        "/analyze/raw", content=_pixels(10, 10).tobytes(), headers={**OCTET, "X-Image-Shape": "20,20"},
+    )
+    assert wrong_size.status_code == 400
+    bad_shape = client.post("/analyze/raw", content=b"\0" * 12, headers={**OCTET, "X-Image-Shape": "2,2,4"})
+    assert bad_shape.status_code == 400
+
+
+def test_raw_rejects_oversized_body(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1000)
+    resp = client.post("/analyze/raw", content=b"\xff\xd8\xff" + b"\0" * 2000, headers=OCTET)
+    assert resp.status_code == 400
+    assert "too large" in resp.json()["detail"]
@@ -0,0 +1,32 @@
+import io
+from PIL import Image
+
+from ui.api_client import downscale_image, make_session
+
+
+def _jpeg(size):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color=(180, 140, 120)).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def test_downscale_caps_longest_side():
+    data = _jpeg((3000, 2000))
+    small, original_size, new_size = downscale_image(data, max_side=1024)
+    assert original_size == (3000, 2000)
+    assert max(new_size) == 1024
+    assert Image.open(io.BytesIO(small)).size == new_size
+    assert len(small) < len(data)
+
+
+def test_downscale_keeps_small_images():
+    data = _jpeg((640, 480))
+    small, original_size, new_size = downscale_image(data, max_side=1024)
+    assert small is data
+    assert original_size == new_size == (640, 480)
+
+
+def test_session_retries_only_safe_status_codes():
+    retry = make_session().get_adapter("http://127.0.0.1").max_retries
+    assert retry.is_retry("GET", 503)
+    assert not retry.is_retry("POST", 503)
@@ -0,0 +1,67 @@
+import json
+
+from benchmarks.harness import measure, compare
+
+
+def _stats(p50, p99):
+    return {"p50_ms": p50, "p99_ms": p99}
+
+
+def test_measure_reports_percentiles():
+    stats = measure(lambda: None, iterations=20, warmup=1)
+    assert stats["n"] == 20
+    assert 0 <= stats["min_ms"] <= stats["p50_ms"] <= stats["p99_ms"]
+
+
+def test_compare_flags_regressions_past_threshold():
+    baseline = {"fast": _stats(10, 20), "slow": _stats(10, 20), "gone": _stats(1, 1)}
+    results = {"fast": _stats(11, 25), "slow": _stats(14, 20), "new": _stats(5, 5)}
+
+    regressions = compare(results, baseline, p50_threshold=0.25, p99_threshold=0.5)
+    assert [(r["benchmark"], r["metric"]) for r in regressions] == [("slow", "p50_ms")]
+    assert round(regressions[0]["change"], 2) == 0.4
+
+
+def test_gate_fails_without_a_baseline(tmp_path):
+    from benchmarks.run import check
+
+    results = {"fast": _stats(10, 20)}
+    missing = tmp_path / "baseline.json"
+    assert check(results, missing, 0.25, 0.5) == 2
+    assert check(results, missing, 0.25, 0.5, allow_missing=True) == 0
+
+    # A baseline that covers none of these benchmarks gates nothing either
+    missing.write_text(json.dumps({"results": {"other": _stats(1, 1)}}))
+    assert check(results, missing, 0.25, 0.5) == 2
+    missing.write_text(json.dumps({"results": {"fast": _stats(5, 20)}}))
+    assert check(results, missing, 0.25, 0.5) == 1
+
+
+def test_loadgen_summary_counts_errors_per_op():
+    from benchmarks.loadgen import summarize, parse_mix
+
+    assert parse_mix("analyze=0.7,admin=0.3") == {"analyze": 0.7, "admin": 0.3}
+    samples = [("analyze", 0.010, None), ("analyze", 0.030, None),
+               ("analyze", 0.0, "http_503"), ("admin", 0.005, None)]
+    summary = summarize(samples, elapsed=1.0)
+    assert summary["requests"] == 4
+    assert summary["throughput_rps"] == 3.0
+    assert summary["errors"] == {"http_503": 1}
+    assert summary["by_op"]["analyze"]["error_rate"] == 1 / 3
+    assert summary["by_op"]["admin"]["p50_ms"] == 5.0
+
+
+def test_backend_import_defers_heavy_modules():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = (
+        "import json, sys; import backend.main; "
+        "print(json.dumps([m for m in ('numpy', 'cv2', 'onnxruntime') if m in sys.modules]))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True, text=True, check=True,
+    )
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from backend.inference import SkinAIModel
+from ml.evaluate import build_report, evaluate, iter_directory
+from utils.onnx_models import make_random_model
+
+
+def test_build_report_metrics():
+    y_true = ["acne", "acne", "normal", "rosacea"]
+    y_pred = ["acne", "normal", "normal", "rosacea"]
+    report = build_report(y_true, y_pred, ["acne", "normal", "rosacea"], elapsed=2.0)
+
+    assert report["images"] == 4
+    assert report["accuracy"] == 0.75
+    assert report["throughput_images_per_s"] == 2.0
+    assert report["confusion_matrix"] == [[1, 1, 0], [0, 1, 0], [0, 0, 1]]
+    assert report["per_class"]["acne"]["recall"] == 0.5
+    assert report["per_class"]["normal"]["precision"] == 0.5
+    assert report["per_class"]["rosacea"]["f1"] == 1.0
+
+
+def test_build_report_unknown_labels_are_added():
+    report = build_report(["acne"], ["unknown"], ["acne"], elapsed=1.0)
+    assert report["classes"] == ["acne", "unknown"]
+    assert report["accuracy"] == 0.0
+
+
+def test_evaluate_directory_with_partial_last_batch(tmp_path):
+    path = make_random_model(tmp_path / "model")
+    model = SkinAIModel(path, tmp_path / "model" / "class_names.txt", tmp_path / "model" / "heads.json")
+    rng = np.random.default_rng(0)
+    for label, count in (("acne", 4), ("normal", 3)):
+        (tmp_path / "data" / label).mkdir(parents=True)
+        for i in range(count):
+            buf = io.BytesIO()
+            Image.fromarray((rng.random((48, 64, 3)) * 255).astype(np.uint8)).save(buf, format="PNG")
+            (tmp_path / "data" / label / f"{i}.png").write_bytes(buf.getvalue())
+    (tmp_path / "data" / "normal" / "broken.jpg").write_bytes(b"not an image")
+
+    batch_sizes = []
+    predict_batch = model.predict_batch
+    model.predict_batch = lambda batch: batch_sizes.append(len(batch)) or predict_batch(batch)
+
+    samples = list(iter_directory(tmp_path / "data"))
+    report = evaluate(iter(samples), model, batch_size=3, workers=2)
+
+    # 8 files in batches of 3, 3 and 2; the undecodable one is skipped
+    assert batch_sizes == [3, 3, 1]
+    assert report["images"] == 7 and report["skipped"] == 1
+    expected = [(label, predict_batch(model.preprocess(p.read_bytes()))[0][0])
+                for p, label in samples if p.name != "broken.jpg"]
+    assert report["accuracy"] == sum(t == p for t, p in expected) / 7
+    assert report["per_class"]["acne"]["support"] == 4
+    assert report["per_class"]["normal"]["support"] == 3
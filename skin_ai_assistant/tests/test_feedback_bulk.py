@@ -0,0 +1,44 @@
+from backend.db import SessionLocal
+from backend.models import InferenceRecord
+
+
+def _make_records(n):
+    db = SessionLocal()
+    try:
+        records = [InferenceRecord(image_path=f"bulk_{i}.jpg", predicted_condition="acne") for i in range(n)]
+        db.add_all(records)
+        db.commit()
+        return [r.id for r in records]
+    finally:
+        db.close()
+
+
+def test_bulk_feedback_applies_all_in_one_request(client):
+    ids = _make_records(3)
+    payload = [
+        {"inference_id": ids[0], "is_correct": True},
+        {"inference_id": ids[1], "is_correct": False, "corrected_condition": "rosacea"},
+        {"inference_id": "does-not-exist", "is_correct": True},
+        {"inference_id": ids[2], "is_correct": False, "corrected_condition": "normal"},
+    ]
+    resp = client.post("/feedback/bulk", json=payload)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["updated"] == 3 and body["failed"] == 1
+    assert [r["ok"] for r in body["results"]] == [True, True, False, True]
+    assert body["results"][2]["inference_id"] == "does-not-exist"
+
+    db = SessionLocal()
+    try:
+        rows = {r.id: r for r in db.query(InferenceRecord).filter(InferenceRecord.id.in_(ids))}
+    finally:
+        db.close()
+    assert rows[ids[0]].is_correct is True
+    assert rows[ids[1]].corrected_condition == "rosacea" and rows[ids[1]].needs_review is True
+    assert rows[ids[2]].corrected_condition == "normal"
+
+
+def test_bulk_feedback_validates_payload(client):
+    assert client.post("/feedback/bulk", json=[{"is_correct": True}]).status_code == 422
+    too_many = [{"inference_id": "x", "is_correct": True}] * 1001
+    assert client.post("/feedback/bulk", json=too_many).status_code == 400
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+import pytest
+
+from run_all import Backoff, Service
+from utils.port_utils import reserve_socket, hold_port, is_port_free
+
+
+def test_backoff_grows_and_caps():
+    backoff = Backoff(0.1, 1.0, factor=2)
+    assert [round(backoff.next(), 2) for _ in range(6)] == [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+    backoff.reset()
+    assert backoff.next() == 0.1
+
+
+posix_only = pytest.mark.skipif(os.name != "posix", reason="fd passing and placeholders are POSIX-only")
+
+
+@posix_only
+def test_service_serves_on_inherited_socket(tmp_path):
+    sock = reserve_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    script = tmp_path / "serve.py"
+    script.write_text(
+        "import http.server, os, socket, socketserver\n"
+        "server = socketserver.TCPServer(None, http.server.SimpleHTTPRequestHandler, bind_and_activate=False)\n"
+        "server.socket = socket.socket(fileno=int(os.environ['TEST_FD']))\n"
+        "server.serve_forever()\n"
+    )
+    env = dict(os.environ, TEST_FD=str(sock.fileno()), PYTHONPATH=os.pathsep.join(sys.path))
+    svc = Service("Test", script, f"http://127.0.0.1:{port}/", env, pass_fds=(sock.fileno(),))
+    svc.start()
+    try:
+        deadline = time.time() + 10
+        while not svc.probe():
+            assert svc.proc.poll() is None and time.time() < deadline
+            time.sleep(svc.probe_backoff.next())
+    finally:
+        svc.stop()
+        sock.close()
+    assert svc.proc.poll() is not None
+    assert not svc.probe()
+
+
+@posix_only
+def test_reserved_ports_are_not_handed_out():
+    listening = reserve_socket("127.0.0.1", 0)
+    held = hold_port("127.0.0.1", 0)
+    try:
+        assert not is_port_free(listening.getsockname()[1])
+        # A placeholder still lets the real server bind with SO_REUSEADDR
+        port = held.getsockname()[1]
+        assert is_port_free(port)
+        server = reserve_socket("127.0.0.1", port)
+        server.close()
+    finally:
+        listening.close()
+        held.close()
@@ -0,0 +1,132 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+from backend import config, live, main, metrics
+from backend.models import InferenceRecord
+from backend.db import SessionLocal
+
+
+def _frame(seed=0):
+    img = Image.fromarray((np.random.default_rng(seed).random((96, 96, 3)) * 255).astype(np.uint8))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_only_the_latest_pending_frame_is_kept():
+    async def run():
+        batcher = live.LiveBatcher(lambda frames: [{} for _ in frames])
+        session = batcher.connect({})
+        session.submit(b"1")
+        session.submit(b"2", persist=True)
+        session.submit(b"3")
+        batcher.disconnect(session)
+        return session
+
+    session = asyncio.run(run())
+    assert session.pending.data == b"3" and session.pending.seq == 3
+    assert session.dropped == 2
+    # A persist request carries over to the frame that replaced it
+    assert session.pending.persist
+
+
+def test_frames_from_all_clients_share_one_batch():
+    calls = []
+
+    def process(frames):
+        calls.append([f.data for f in frames])
+        return [{"condition": f.data.decode()} for f in frames]
+
+    async def run():
+        batcher = live.LiveBatcher(process, max_batch=8)
+        sessions = [batcher.connect({}) for _ in range(3)]
+        for i, s in enumerate(sessions):
+            s.submit(str(i).encode())
+        batcher.start()
+        results = [await asyncio.wait_for(s.results.get(), 5) for s in sessions]
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert calls == [[b"0", b"1", b"2"]]
+    assert [r["condition"] for r in results] == ["0", "1", "2"]
+    assert all(r["seq"] == 1 and r["dropped"] == 0 for r in results)
+
+
+def test_websocket_returns_results_without_storing(client):
+    before = SessionLocal().query(InferenceRecord).count()
+    with client.websocket_connect("/ws/live?skin_type=oily") as ws:
+        ws.send_bytes(_frame())
+        result = ws.receive_json()
+    assert result["seq"] == 1
+    assert "condition" in result and "confidence" in result
+    assert "inference_id" not in result
+    assert SessionLocal().query(InferenceRecord).count() == before
+    assert metrics.LIVE_FRAMES.labels("analyzed").value >= 1
+
+
+def test_websocket_persists_on_request(client):
+    with client.websocket_connect("/ws/live?skin_type=dry&fitzpatrick=V") as ws:
+        ws.send_text('{"persist": true}')
+        ws.send_bytes(_frame(1))
+        result = ws.receive_json()
+    record = SessionLocal().query(InferenceRecord).filter_by(id=result["inference_id"]).one()
+    assert record.user_skin_type == "dry"
+    assert record.user_fitzpatrick == "V"
+
+
+def test_websocket_reports_bad_messages(client):
+    with client.websocket_connect("/ws/live") as ws:
+        ws.send_text("not json")
+        assert "error" in ws.receive_json()
+        ws.send_bytes(b"not an image")
+        assert ws.receive_json()["error"] == "Could not decode frame"
+
+
+def _textured_frame(brightness=1.0):
+    img = (np.random.default_rng(0).normal(128, 40, (320, 320, 3)) * brightness).clip(0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def _frames(*frames):
+    session = SimpleNamespace(profile={"skin_type": "any", "fitzpatrick": "III", "ethnicity": "unspecified"})
+    return [live.LiveFrame(session, seq, data, persist) for seq, (data, persist) in enumerate(frames, 1)]
+
+
+def test_quality_gate_rejects_live_frames_before_inference(client, monkeypatch):
+    monkeypatch.setattr(config, "QUALITY_GATE", "reject")
+    rejected = metrics.QUALITY_ISSUES.labels("too_dark", "rejected").value
+    batches = []
+    model = main.current_model()
+    infer = model.infer
+    monkeypatch.setattr(model, "infer", lambda batch: batches.append(len(batch)) or infer(batch))
+
+    bad, good = main._analyze_live_batch(_frames((_textured_frame(0.1), True), (_textured_frame(), False)))
+    assert bad["reason"] == "too_dark" and "condition" not in bad and "inference_id" not in bad
+    assert "condition" in good
+    assert batches == [1]
+    assert metrics.QUALITY_ISSUES.labels("too_dark", "rejected").value == rejected + 1
+
+
+def test_live_persist_failure_only_affects_its_frame(client, monkeypatch):
+    monkeypatch.setattr(config, "QUALITY_GATE", "off")
+    save_record = main._save_record
+    calls = []
+
+    def flaky(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return save_record(*args, **kwargs)
+
+    monkeypatch.setattr(main, "_save_record", flaky)
+    failed, stored = main._analyze_live_batch(_frames((_frame(1), True), (_frame(2), True)))
+    assert failed["error"] == "Could not store frame" and "condition" in failed
+    assert "inference_id" not in failed
+    assert "inference_id" in stored and "error" not in stored
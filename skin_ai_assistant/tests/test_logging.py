@@ -0,0 +1,45 @@
+import json
+import logging
+
+from backend.logging_config import (
+    JsonFormatter, LazyQueueHandler, SamplingFilter, parse_sample_rates, REQUEST_ID,
+)
+
+
+def _record(name="backend.main", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_request_id_and_extra():
+    token = REQUEST_ID.set("abc123")
+    try:
+        record = _record(request_id=REQUEST_ID.get(), duration_ms=12.5)
+    finally:
+        REQUEST_ID.reset(token)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "hello world"
+    assert entry["request_id"] == "abc123"
+    assert entry["duration_ms"] == 12.5
+    assert entry["level"] == "INFO"
+
+
+def test_queue_handler_defers_formatting():
+    record = _record()
+    prepared = LazyQueueHandler(None).prepare(record)
+    assert prepared.msg == "hello %s" and prepared.args == ("world",)
+
+
+def test_sampling_filter_only_drops_low_levels():
+    sampler = SamplingFilter(parse_sample_rates("backend=1, backend.access=0"))
+    assert not sampler.filter(_record("backend.access"))
+    assert sampler.filter(_record("backend.access", level=logging.WARNING))
+    assert sampler.filter(_record("backend.main"))
+    assert sampler.filter(_record("backend.accessories"))
+
+
+def test_request_id_echoed(client):
+    resp = client.get("/health", headers={"X-Request-ID": "req-42"})
+    assert resp.headers["x-request-id"] == "req-42"
+    assert len(client.get("/health").headers["x-request-id"]) == 32
@@ -0,0 +1,60 @@
+import threading
+
+from backend import metrics
+from backend.metrics import Counter, Histogram, REGISTRY
+
+
+def test_histogram_and_counter_render():
+    hist = Histogram("test_latency_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    counter = Counter("test_events_total", "test", ("kind",))
+    try:
+        hist.labels("a").observe(0.05)
+        hist.labels("a").observe(0.5)
+        hist.labels("a").observe(5)
+
+        threads = [threading.Thread(target=lambda: [counter.labels("x").inc() for _ in range(1000)])
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        lines = hist.render() + counter.render()
+        assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1' in lines
+        assert 'test_latency_seconds_bucket{stage="a",le="1"} 2' in lines
+        assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+        assert 'test_latency_seconds_count{stage="a"} 3' in lines
+        assert 'test_events_total{kind="x"} 4000' in lines
+    finally:
+        REGISTRY.remove(hist)
+        REGISTRY.remove(counter)
+
+
+def test_metrics_endpoint_reports_analyze_stages(client, image_bytes):
+    resp = client.post("/analyze", files={"file": ("metrics.jpg", image_bytes, "image/jpeg")})
+    assert resp.status_code == 200
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    for stage in ("read", "decode", "preprocess", "infer", "db", "write"):
+        assert f'skinai_analyze_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'skinai_http_requests_total{method="POST",route="/analyze",status="200"}' in body
+    assert "skinai_predictions_total{label=" in body
+    assert "skinai_http_requests_in_flight" in body
+
+
+def _stage_counts(stages):
+    return {stage: sum(metrics.ANALYZE_STAGE_LATENCY.labels(stage).snapshot()[0]) for stage in stages}
+
+
+def test_each_analyze_stage_is_observed_once(client, image_bytes):
+    stages = ("read", "decode", "preprocess", "infer", "db", "write", "encode")
+    before = _stage_counts(stages)
+    resp = client.post("/analyze", files={"file": ("once.jpg", image_bytes, "image/jpeg")})
+    assert resp.status_code == 200
+    after = _stage_counts(stages)
+    assert {stage: after[stage] - before[stage] for stage in stages} == {
+        "read": 1, "decode": 1, "preprocess": 1, "infer": 1, "db": 1, "write": 1, "encode": 0,
+    }
@@ -0,0 +1,65 @@
+import numpy as np
+
+from backend import main
+from backend.inference import SkinAIModel
+from utils.onnx_models import make_random_model
+
+HEADS = {
+    "skin_type": {"type": "classification", "labels": ["oily", "dry", "combination", "sensitive", "normal"]},
+    "fitzpatrick": {"type": "classification", "labels": ["I", "II", "III", "IV", "V", "VI"]},
+    "acne_grade": {"type": "regression"},
+    "pih_level": {"type": "regression"},
+}
+
+
+def _load(tmp_path):
+    path = make_random_model(tmp_path, heads=HEADS)
+    return SkinAIModel(path, tmp_path / "class_names.txt", tmp_path / "heads.json")
+
+
+def test_infer_decodes_all_heads(tmp_path, image_bytes):
+    model = _load(tmp_path)
+    batch = np.concatenate([model.preprocess(image_bytes)] * 3)
+    results = model.infer(batch)
+
+    assert len(results) == 3
+    for r in results:
+        assert r["condition"] in model.labels
+        assert 0.0 <= r["confidence"] <= 1.0
+        assert r["embedding"].shape == (64,)
+        assert r["heads"]["skin_type"]["value"] in HEADS["skin_type"]["labels"]
+        assert r["heads"]["fitzpatrick"]["value"] in HEADS["fitzpatrick"]["labels"]
+        assert isinstance(r["heads"]["acne_grade"]["value"], float)
+        assert isinstance(r["heads"]["pih_level"]["value"], float)
+
+
+def test_analyze_persists_heads(client, tmp_path, monkeypatch, image_bytes):
+    monkeypatch.setattr(main, "MODEL", _load(tmp_path))
+    files = {"file": ("multitask.jpg", image_bytes, "image/jpeg")}
+    resp = client.post("/analyze", files=files)
+    assert resp.status_code == 200, resp.text
+    out = resp.json()
+    assert set(out["predictions"]) == set(HEADS)
+
+    records = client.get("/admin/inferences", params={"limit": 1}).json()
+    rec = records[0]
+    assert rec["id"] == out["inference_id"]
+    assert rec["predicted_skin_type"] == out["predictions"]["skin_type"]
+    assert rec["predicted_fitzpatrick"] == out["predictions"]["fitzpatrick"]
+    assert rec["predicted_acne_grade"] == out["predictions"]["acne_grade"]
+    assert rec["predicted_pih_level"] == out["predictions"]["pih_level"]
+
+
+def test_heads_without_labels_are_not_served(client, tmp_path, monkeypatch, image_bytes):
+    heads = {name: dict(spec, labelled=0 if spec["type"] == "regression" else 40) for name, spec in HEADS.items()}
+    path = make_random_model(tmp_path, heads=heads)
+    model = SkinAIModel(path, tmp_path / "class_names.txt", tmp_path / "heads.json")
+    assert set(model.heads) == {"skin_type", "fitzpatrick"}
+
+    monkeypatch.setattr(main, "MODEL", model)
+    resp = client.post("/analyze", files={"file": ("unlabelled.jpg", image_bytes, "image/jpeg")})
+    assert resp.status_code == 200, resp.text
+    assert set(resp.json()["predictions"]) == {"skin_type", "fitzpatrick"}
+
+    rec = client.get("/admin/inferences", params={"limit": 1}).json()[0]
+    assert rec["predicted_acne_grade"] is None and rec["predicted_pih_level"] is None
@@ -0,0 +1,124 @@
+import io
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+from PIL import Image
+from sqlalchemy import create_engine, inspect, text
+
+from backend import config, db as db_module, metrics, phash
+from backend.db import SessionLocal
+from backend.models import InferenceRecord
+from ml.build_dataset import collapse_duplicates
+
+
+def _photo(seed, side=320):
+    """Smooth random structure, like a photo at thumbnail scale."""
+    rng = np.random.default_rng(seed)
+    coarse = (rng.random((6, 6, 3)) * 255).astype(np.uint8)
+    return cv2.resize(coarse, (side, side), interpolation=cv2.INTER_CUBIC)
+
+
+def _jpeg(img, quality=90):
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _recompressed(img):
+    """Downscaled, slightly cropped and re-encoded at low quality."""
+    h, w = img.shape[:2]
+    small = cv2.resize(img[4:h - 4, 4:w - 4], (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+    return np.asarray(Image.open(io.BytesIO(_jpeg(small, quality=50))))
+
+
+def test_dhash_matches_near_duplicates_only():
+    a, b = _photo(1), _photo(2)
+    assert phash.hamming(phash.dhash(a), phash.dhash(_recompressed(a))) <= 3
+    assert phash.hamming(phash.dhash(a), phash.dhash(b)) > 10
+    value = phash.dhash(a)
+    columns = phash.hash_columns(value)
+    assert int(columns["image_hash"], 16) == value
+    assert sum(columns[c] << (16 * i) for i, c in enumerate(phash.BAND_COLUMNS)) == value
+
+
+def test_cluster_groups_within_distance():
+    base = phash.dhash(_photo(3))
+    hashes = {"a": base, "b": base ^ 0b101, "c": base ^ (0b11 << 40), "d": phash.dhash(_photo(4))}
+    clusters = sorted(sorted(c) for c in phash.cluster(hashes, max_distance=3))
+    assert clusters == [["a", "b", "c"], ["d"]]
+
+
+def test_cluster_bounds_degenerate_buckets():
+    black = phash.dhash(np.zeros((64, 64, 3), np.uint8))
+    hashes = {f"black{i}": black for i in range(20000)}
+    hashes["near"] = black ^ 0b1
+    # Distinct hashes sharing band 0 beyond the cap are not compared in that bucket
+    hashes.update({f"far{i}": black ^ (i << 16) for i in range(1, 2000)})
+    clusters = phash.cluster(hashes, max_distance=3, max_bucket=64)
+    biggest = max(clusters, key=len)
+    assert {f"black{i}" for i in range(20000)} | {"near"} <= set(biggest)
+
+
+def test_analyze_stores_hash_and_optionally_reuses_result(client, monkeypatch):
+    # Fresh images each run: the test DB keeps earlier runs' uploads
+    seed = uuid.uuid4().int
+    img = _photo(seed)
+    first = client.post("/analyze", files={"file": ("a.jpg", _jpeg(img), "image/jpeg")}).json()
+    session = SessionLocal()
+    try:
+        record = session.query(InferenceRecord).filter_by(id=first["inference_id"]).one()
+        assert phash.hamming(int(record.image_hash, 16), phash.dhash(img)) <= 3
+        assert record.hash_band0 is not None
+    finally:
+        session.close()
+
+    # Reuse off (the default): a near-duplicate gets its own analysis
+    dup = _jpeg(_recompressed(img), quality=70)
+    second = client.post("/analyze", files={"file": ("b.jpg", dup, "image/jpeg")}).json()
+    assert second["inference_id"] != first["inference_id"]
+    assert "reused" not in second
+
+    monkeypatch.setattr(config, "DEDUP_REUSE_SECONDS", 300)
+    third = client.post("/analyze", files={"file": ("c.jpg", dup, "image/jpeg")}).json()
+    assert third["reused"] is True
+    assert third["inference_id"] == second["inference_id"]
+    assert third["condition"] == second["condition"]
+
+    db_count = sum(metrics.ANALYZE_STAGE_LATENCY.labels("db").snapshot()[0])
+    other = client.post(
+        "/analyze", files={"file": ("d.jpg", _jpeg(_photo(seed + 1)), "image/jpeg")}, data={"debug": "true"},
+    ).json()
+    assert "reused" not in other
+    # The lookup is timed as its own stage, apart from the insert
+    assert "dedup" in other["timings"] and "db" in other["timings"]
+    assert sum(metrics.ANALYZE_STAGE_LATENCY.labels("db").snapshot()[0]) == db_count + 1
+
+
+def test_init_db_adds_missing_columns(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE inferences (id VARCHAR PRIMARY KEY, image_path VARCHAR NOT NULL, "
+            "created_at DATETIME, predicted_condition VARCHAR NOT NULL)"
+        ))
+    monkeypatch.setattr(db_module, "engine", engine)
+    db_module.init_db()
+
+    columns = {c["name"] for c in inspect(engine).get_columns("inferences")}
+    assert {"image_hash", "hash_band0", "hash_band3", "needs_review"} <= columns
+    indexes = {i["name"] for i in inspect(engine).get_indexes("inferences")}
+    assert "ix_inferences_hash_band0" in indexes
+
+
+def test_build_dataset_keeps_latest_of_each_cluster():
+    now = datetime.utcnow()
+    a = phash.dhash(_photo(7))
+    recs = [
+        SimpleNamespace(id="old", image_hash=f"{a:016x}", created_at=now - timedelta(days=1)),
+        SimpleNamespace(id="new", image_hash=f"{a ^ 1:016x}", created_at=now),
+        SimpleNamespace(id="other", image_hash=f"{phash.dhash(_photo(8)):016x}", created_at=now),
+    ]
+    assert [r.id for r in collapse_duplicates(recs)] == ["new", "other"]
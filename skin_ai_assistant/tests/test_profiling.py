@@ -0,0 +1,86 @@
+import pstats
+
+from backend import config, profiling
+
+
+def test_profile_requested_by_admin_header(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILES_DIR", tmp_path)
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(config, "PROFILE_RATE", 0.0)
+
+    # Wrong token: not profiled
+    resp = client.get("/health", headers={"X-Profile": "1", "X-Admin-Token": "nope"})
+    assert "x-profile-id" not in resp.headers
+
+    resp = client.get("/health", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    name = resp.headers["x-profile-id"]
+    assert name.endswith(".folded")
+    assert (tmp_path / name).exists()
+
+    # Listing and download require the token once it is configured
+    assert client.get("/admin/profiles").status_code == 403
+    listing = client.get("/admin/profiles", headers={"X-Admin-Token": "secret"}).json()
+    assert [p["name"] for p in listing] == [name]
+    resp = client.get(f"/admin/profiles/{name}", headers={"X-Admin-Token": "secret"})
+    assert resp.status_code == 200
+    assert client.get("/admin/profiles/..%2Fskin_ai.db", headers={"X-Admin-Token": "secret"}).status_code == 404
+
+
+def test_rate_cprofile_and_rotation(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILES_DIR", tmp_path)
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "")
+    monkeypatch.setattr(config, "PROFILE_RATE", 1.0)
+    monkeypatch.setattr(config, "PROFILE_MODE", "cprofile")
+    monkeypatch.setattr(config, "PROFILE_KEEP", 2)
+
+    names = [client.get("/health").headers["x-profile-id"] for _ in range(3)]
+    stored = {p.name for p in profiling.list_profiles()}
+    assert len(stored) == 2
+    assert stored <= set(names)
+    pstats.Stats(str(tmp_path / names[-1]))
+
+
+def test_analyze_profile_includes_worker_thread(client, tmp_path, monkeypatch, image_bytes):
+    upload = {"file": ("profiled.jpg", image_bytes, "image/jpeg")}
+    monkeypatch.setattr(config, "PROFILES_DIR", tmp_path)
+    monkeypatch.setattr(config, "PROFILE_RATE", 1.0)
+    monkeypatch.setattr(config, "PROFILE_INTERVAL_MS", 0.1)
+
+    monkeypatch.setattr(config, "PROFILE_MODE", "cprofile")
+    resp = client.post("/analyze", files=upload)
+    assert resp.status_code == 200
+    functions = {name for _, _, name in pstats.Stats(str(tmp_path / resp.headers["x-profile-id"])).stats}
+    assert {"run_analysis", "infer"} <= functions
+
+    monkeypatch.setattr(config, "PROFILE_MODE", "sample")
+    resp = client.post("/analyze", files=upload)
+    folded = (tmp_path / resp.headers["x-profile-id"]).read_text()
+    assert "main:run_analysis" in folded
+
+
+def test_overlapping_cprofile_request_falls_back_to_sampling(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILES_DIR", tmp_path)
+    monkeypatch.setattr(config, "PROFILE_RATE", 1.0)
+    monkeypatch.setattr(config, "PROFILE_MODE", "cprofile")
+    # Another cProfile request in flight
+    with profiling._CPROFILE_LOCK:
+        assert client.get("/health").headers["x-profile-id"].endswith(".folded")
+    assert client.get("/health").headers["x-profile-id"].endswith(".prof")
+
+
+def test_sampling_profiler_folds_stacks():
+    import threading
+    import time
+
+    def busy():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+
+    worker = threading.Thread(target=busy)
+    worker.start()
+    profiler = profiling.SamplingProfiler(worker.ident, interval=0.001)
+    profiler.start()
+    worker.join()
+    profiler.stop()
+    assert any("test_profiling:busy" in stack for stack in profiler.counts)
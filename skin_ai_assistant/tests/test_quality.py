@@ -0,0 +1,77 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend import config, metrics, quality
+
+
+def _textured(size=320, mean=128):
+    rng = np.random.default_rng(0)
+    img = rng.normal(mean, 40, (size, size, 3))
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def _jpeg(img):
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def test_sharp_well_exposed_image_passes():
+    report = quality.assess(_textured())
+    assert report["ok"], report
+    assert report["measures"]["width"] == 320
+
+
+def test_detects_blur_darkness_and_small_images():
+    blurred = cv2.GaussianBlur(_textured(), (0, 0), 8)
+    assert "too_blurry" in quality.assess(blurred)["issues"]
+
+    dark = (_textured() * 0.1).astype(np.uint8)
+    assert "too_dark" in quality.assess(dark)["issues"]
+
+    bright = np.full((320, 320, 3), 250, np.uint8)
+    assert "too_bright" in quality.assess(bright)["issues"]
+
+    assert "too_small" in quality.assess(_textured(size=64))["issues"]
+
+
+@pytest.mark.skipif(not hasattr(cv2, "CascadeClassifier"), reason="OpenCV build without Haar cascades")
+def test_face_check_flags_images_without_faces():
+    report = quality.assess(_textured(), face_check=True)
+    assert report["issues"] == ["no_face"]
+    assert report["measures"]["faces"] == 0
+
+
+def test_reject_mode_returns_422_with_reason(client, monkeypatch):
+    monkeypatch.setattr(config, "QUALITY_GATE", "reject")
+    dark = (_textured() * 0.1).astype(np.uint8)
+    resp = client.post("/analyze", files={"file": ("dark.jpg", _jpeg(dark), "image/jpeg")})
+    assert resp.status_code == 422
+    detail = resp.json()["detail"]
+    assert detail["reason"] == "too_dark"
+    assert detail["message"] == quality.MESSAGES["too_dark"]
+    assert metrics.QUALITY_ISSUES.labels("too_dark", "rejected").value >= 1
+
+
+def test_flag_mode_analyzes_and_reports_issues(client, monkeypatch):
+    monkeypatch.setattr(config, "QUALITY_GATE", "flag")
+    blurred = cv2.GaussianBlur(_textured(), (0, 0), 8)
+    resp = client.post(
+        "/analyze", files={"file": ("blur.jpg", _jpeg(blurred), "image/jpeg")}, data={"debug": "true"},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["quality"]["ok"] is False
+    assert "too_blurry" in body["quality"]["issues"]
+    assert "quality" in body["timings"]
+
+
+def test_off_mode_skips_the_gate(client, monkeypatch):
+    monkeypatch.setattr(config, "QUALITY_GATE", "off")
+    resp = client.post("/analyze", files={"file": ("a.jpg", _jpeg(_textured(size=64)), "image/jpeg")})
+    assert resp.status_code == 200
+    assert "quality" not in resp.json()
@@ -0,0 +1,157 @@
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import config, retrain
+
+
+def _step(name, code):
+    return (name, (sys.executable, "-c", code))
+
+
+def _wait(retrainer, timeout=20):
+    deadline = time.monotonic() + timeout
+    while retrainer.current is not None:
+        assert time.monotonic() < deadline, "retraining run did not finish"
+        time.sleep(0.05)
+    return retrainer.status()["runs"][0]
+
+
+def _retrainer(tmp_path, steps, count=lambda: 0, **kwargs):
+    return retrain.Retrainer(steps=steps, state_dir=tmp_path, count=count, **kwargs)
+
+
+def test_due_by_threshold_and_schedule(tmp_path):
+    feedback = {"n": 5}
+    r = _retrainer(tmp_path, [], count=lambda: feedback["n"], min_feedback=10, interval=3600)
+    # Never run before and there is new feedback: the schedule is due
+    assert r.due() == "schedule"
+
+    r._state["last_started_at"] = datetime.utcnow().isoformat()
+    r._state["feedback_at_last_run"] = 5
+    assert r.due() is None
+    feedback["n"] = 15
+    assert r.due() == "threshold"
+
+    feedback["n"] = 6
+    r._state["last_started_at"] = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+    assert r.due() == "schedule"
+    # No new feedback: nothing to learn from, whatever the schedule says
+    feedback["n"] = 5
+    assert r.due() is None
+
+
+def test_run_records_steps_and_persists_state(tmp_path):
+    r = _retrainer(tmp_path, [_step("one", "print('built')"), _step("two", "print('trained')")], count=lambda: 42)
+    run = r.trigger("manual")
+    assert run["status"] == "running"
+    with pytest.raises(retrain.RetrainBusy):
+        r.trigger("manual")
+
+    done = _wait(r)
+    assert done["status"] == "succeeded"
+    assert [s["name"] for s in done["steps"]] == ["one", "two"]
+    assert all(s["returncode"] == 0 and s["duration_s"] >= 0 for s in done["steps"])
+    # Durations are rounded to the millisecond
+    assert done["duration_s"] >= sum(s["duration_s"] for s in done["steps"]) - 0.002
+    log = (tmp_path / done["log"]).read_text()
+    assert "built" in log and "trained" in log
+
+    # The watermark and history survive a restart
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert state["feedback_at_last_run"] == 42
+    assert _retrainer(tmp_path, [], count=lambda: 42).status()["runs"][0]["id"] == done["id"]
+
+
+def test_failed_step_stops_the_cycle(tmp_path):
+    r = _retrainer(tmp_path, [_step("build", "import sys; sys.exit(3)"), _step("train", "print('unreachable')")])
+    r.trigger("threshold")
+    done = _wait(r)
+    assert done["status"] == "failed"
+    assert [(s["name"], s["returncode"]) for s in done["steps"]] == [("build", 3)]
+    assert done["promoted"] is None
+
+
+def test_unexpected_error_fails_the_run_and_frees_the_retrainer(tmp_path, monkeypatch):
+    r = _retrainer(tmp_path, [_step("train", "pass")])
+
+    def broken_spawn(cmd, log):
+        raise ValueError("bad argument")
+
+    monkeypatch.setattr(r, "_spawn", broken_spawn)
+    r.trigger("manual")
+    done = _wait(r)
+    assert done["status"] == "failed"
+    assert done["steps"][0]["status"] == "failed"
+
+    # Not stuck busy: the next cycle starts and runs normally
+    monkeypatch.undo()
+    r.trigger("manual")
+    assert _wait(r)["status"] == "succeeded"
+
+
+def test_steps_run_with_low_priority_and_capped_threads(tmp_path):
+    code = "import os; print('threads', os.environ['OMP_NUM_THREADS'])"
+    if os.name == "posix":
+        # Read first thing in the child: it must start niced, not be reniced later
+        code = "import os; print('nice', os.getpriority(os.PRIO_PROCESS, 0)); " + code
+    r = _retrainer(tmp_path, [_step("probe", code + "; import time; time.sleep(0.2)")], threads=1, nice=5)
+    r.trigger("manual")
+    log = (tmp_path / _wait(r)["log"]).read_text()
+    assert "threads 1" in log
+    if os.name == "posix":
+        assert f"nice {min(19, os.getpriority(os.PRIO_PROCESS, 0) + 5)}" in log
+
+
+def test_promotion_reloads_the_serving_model(tmp_path, monkeypatch):
+    candidate = tmp_path / "candidate"
+    candidate.mkdir()
+    monkeypatch.setattr(config, "CANDIDATE_DIR", candidate)
+    manifest = candidate / "manifest.json"
+    write_manifest = (
+        f"import json, datetime; open({str(manifest)!r}, 'w').write(json.dumps("
+        "{'created_at': datetime.datetime.utcnow().isoformat(), 'promoted': True}))"
+    )
+    reloaded = []
+    r = _retrainer(tmp_path / "state", [_step("train", write_manifest)], on_promoted=lambda: reloaded.append(1))
+    r.trigger("manual")
+    assert _wait(r)["promoted"] is True
+    assert reloaded == [1]
+
+    # A manifest left over from an earlier run does not count as a promotion
+    r.steps = [_step("train", "pass")]
+    r.trigger("manual")
+    assert _wait(r)["promoted"] is None
+    assert reloaded == [1]
+
+
+def test_admin_retrain_endpoints(client, tmp_path, monkeypatch):
+    r = _retrainer(tmp_path, [_step("train", "import time; time.sleep(0.5)")], count=lambda: 7, min_feedback=50)
+    monkeypatch.setattr(retrain, "_RETRAINER", r)
+
+    status = client.get("/admin/retrain").json()
+    assert status["running"] is False
+    assert status["pending_feedback"] == 7 and status["min_feedback"] == 50
+
+    resp = client.post("/admin/retrain")
+    assert resp.status_code == 202
+    assert resp.json()["trigger"] == "manual"
+    assert client.post("/admin/retrain").status_code == 409
+
+    current = client.get("/admin/retrain").json()["current"]
+    assert current["id"] == resp.json()["id"] and current["elapsed_s"] >= 0
+
+    done = _wait(r)
+    status = client.get("/admin/retrain").json()
+    assert status["running"] is False and status["pending_feedback"] == 0
+    assert status["runs"][0]["id"] == done["id"] and status["runs"][0]["status"] == "succeeded"
+
+
+def test_admin_retrain_requires_token(client, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/retrain").status_code == 403
+    assert client.post("/admin/retrain").status_code == 403
@@ -0,0 +1,32 @@
+from benchmarks.loadgen import parse_server_timing
+
+STAGES = ("read", "decode", "preprocess", "infer", "db", "write")
+
+
+def test_analyze_sends_server_timing_header(client, image_bytes):
+    resp = client.post("/analyze", files={"file": ("timing.jpg", image_bytes, "image/jpeg")})
+    assert resp.status_code == 200
+    timings = parse_server_timing(resp.headers["server-timing"])
+    for stage in STAGES + ("total",):
+        assert stage in timings
+    assert "timings" not in resp.json()
+
+
+def test_analyze_debug_returns_timings(client, image_bytes):
+    resp = client.post(
+        "/analyze",
+        files={"file": ("timing.jpg", image_bytes, "image/jpeg")},
+        data={"debug": "true"},
+    )
+    assert resp.status_code == 200
+    timings = resp.json()["timings"]
+    assert set(STAGES) <= set(timings)
+    assert timings["total"] >= timings["infer"]
+
+
+def test_other_endpoints_send_server_timing_header(client):
+    resp = client.get("/admin/inferences", params={"limit": 5})
+    assert "db" in parse_server_timing(resp.headers["server-timing"])
+
+    resp = client.get("/health")
+    assert "total" in parse_server_timing(resp.headers["server-timing"])
@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import onnx
+
+from backend.inference import SkinAIModel, create_session, external_weights_path
+from utils.onnx_models import make_random_model, externalize_weights, retarget_weights
+
+
+def _infer(path):
+    model = SkinAIModel(path, path.parent / "class_names.txt", path.parent / "heads.json")
+    x = np.random.default_rng(1).standard_normal((2, 3, 224, 224)).astype(np.float32)
+    return model.infer(x)
+
+
+def test_externalized_model_gives_identical_results(tmp_path):
+    path = make_random_model(tmp_path)
+    before = _infer(path)
+
+    data_path = externalize_weights(path, align=4096)
+    assert data_path == external_weights_path(path)
+
+    # Every large initializer now points into the sidecar file at an aligned offset
+    proto = onnx.load(path, load_external_data=False)
+    offsets = [
+        int({e.key: e.value for e in t.external_data}["offset"])
+        for t in proto.graph.initializer if t.data_location == onnx.TensorProto.EXTERNAL
+    ]
+    assert offsets and all(o % 4096 == 0 for o in offsets)
+    assert path.stat().st_size < data_path.stat().st_size
+
+    after = _infer(path)
+    for a, b in zip(before, after):
+        assert a["condition"] == b["condition"]
+        assert np.allclose(a["embedding"], b["embedding"], atol=1e-5)
+
+
+def test_prepacking_disabled_only_for_external_weights(tmp_path):
+    path = make_random_model(tmp_path)
+
+    def prepacking_disabled(**kwargs):
+        opts = create_session(path, **kwargs).get_session_options()
+        try:
+            return opts.get_session_config_entry("session.disable_prepacking") == "1"
+        except RuntimeError:  # entry never set
+            return False
+
+    assert not prepacking_disabled(share_weights=True)
+    externalize_weights(path)
+    assert prepacking_disabled(share_weights=True)
+    assert not prepacking_disabled(share_weights=False)
+    assert create_session(path, cpu_arena=False).get_session_options().enable_cpu_mem_arena is False
+
+
+def test_retargeted_graph_reads_versioned_weights_and_embedded_labels(tmp_path):
+    path = make_random_model(tmp_path)
+    before = _infer(path)
+    data_path = externalize_weights(path)
+    versioned = data_path.rename(tmp_path / "skin_model.onnx.abc123.data")
+
+    # As promote() does: the graph alone says which weights and labels go with it
+    labels = ["a", "b", "c", "d", "e"]
+    retarget_weights(path, path, versioned.name, {"class_names": json.dumps(labels), "heads": "{}"})
+    (tmp_path / "class_names.txt").write_text("stale\nlabels")
+    assert external_weights_path(path) == versioned
+
+    model = SkinAIModel(path, tmp_path / "class_names.txt", tmp_path / "heads.json")
+    assert model.labels == labels and model.heads == {}
+    after = _infer(path)
+    assert [a["embedding"].tolist() for a in after] == [b["embedding"].tolist() for b in before]
@@ -0,0 +1,109 @@
+import numpy as np
+
+from backend import main
+from backend.embeddings import EmbeddingIndex
+
+
+def _analyze(client, name, image_bytes):
+    resp = client.post("/analyze", files={"file": (name, image_bytes, "image/jpeg")})
+    assert resp.status_code == 200
+    return resp.json()["inference_id"]
+
+
+def test_embedding_index_search(tmp_path):
+    index = EmbeddingIndex(tmp_path, dim=16)
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal(64)
+    index.add("a", base)
+    index.add("b", base + 0.01 * rng.standard_normal(64))
+    index.add("c", -base)
+
+    results = index.search(index.get("a"), k=2, exclude="a")
+    assert [rid for rid, _ in results] == ["b", "c"]
+    assert results[0][1] > 0.99
+    assert results[1][1] < -0.99
+
+    # Reopening the index restores the stored vectors
+    reopened = EmbeddingIndex(tmp_path, dim=16)
+    assert len(reopened) == 3
+    assert np.allclose(reopened.get("b"), index.get("b"))
+
+
+def test_index_shared_between_workers(tmp_path):
+    # Two handles on one directory stand in for two uvicorn workers
+    a, b = EmbeddingIndex(tmp_path, dim=16), EmbeddingIndex(tmp_path, dim=16)
+    rng = np.random.default_rng(2)
+    vectors = {f"r{i}": rng.standard_normal(16) for i in range(20)}
+    for i, (rid, v) in enumerate(vectors.items()):
+        (a if i % 2 else b).add(rid, v)
+
+    for index in (a, b, EmbeddingIndex(tmp_path, dim=16)):
+        for rid, v in vectors.items():
+            assert np.allclose(index.get(rid), v / np.linalg.norm(v), atol=1e-2)
+    assert (tmp_path / "ids.txt").read_text().splitlines() == list(vectors)
+    assert a.search(vectors["r4"], k=1)[0][0] == "r4"
+
+
+def test_ivf_is_built_off_the_query_path(tmp_path):
+    index = EmbeddingIndex(tmp_path, dim=16)
+    index.IVF_MIN_ROWS = 200
+    index.NPROBE = 4
+    rng = np.random.default_rng(3)
+    for i in range(300):
+        index.add(f"r{i}", rng.standard_normal(16))
+    index._ivf_thread.join(10)
+    assert index._ivf is not None and index._ivf_size >= 200
+
+    # Rows added after the build are still found
+    probe = rng.standard_normal(16)
+    index.add("late", probe)
+    assert index.search(probe, k=1)[0][0] == "late"
+
+
+def test_search_probes_one_ivf_snapshot(tmp_path):
+    index = EmbeddingIndex(tmp_path, dim=16)
+    index.IVF_MIN_ROWS = 10 ** 9  # rebuilds only when asked below
+    index.NPROBE = 4
+    rng = np.random.default_rng(4)
+    for i in range(200):
+        index.add(f"r{i}", rng.standard_normal(16))
+    index._build_ivf()
+    probe = rng.standard_normal(16)
+    for i in range(200, 1200):
+        index.add(f"r{i}", probe if i == 700 else rng.standard_normal(16))
+
+    # A rebuild with more lists lands after search took its snapshot
+    search_ivf = index._search_ivf
+
+    def rebuild_then_search(q, ivf):
+        index._build_ivf()
+        assert len(index._ivf[1]) > len(ivf[1])
+        return search_ivf(q, ivf)
+
+    index._search_ivf = rebuild_then_search
+    assert index.search(probe, k=1)[0][0] == "r700"
+
+
+def test_similar_endpoint(client, tmp_path, monkeypatch, image_bytes):
+    index = EmbeddingIndex(tmp_path)
+    monkeypatch.setattr(main, "get_index", lambda: index)
+    ids = [_analyze(client, f"similar_{i}.jpg", image_bytes) for i in range(3)]
+    rng = np.random.default_rng(1)
+    base = rng.standard_normal(256)
+    index.add(ids[0], base)
+    index.add(ids[1], base + 0.05 * rng.standard_normal(256))
+    index.add(ids[2], rng.standard_normal(256))
+
+    resp = client.get(f"/admin/inferences/{ids[0]}/similar", params={"k": 1})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data) == 1
+    assert data[0]["id"] == ids[1]
+    assert data[0]["similarity"] > 0.9
+    assert "corrected_condition" in data[0]
+
+
+def test_similar_endpoint_unknown_id(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "get_index", lambda: EmbeddingIndex(tmp_path))
+    resp = client.get("/admin/inferences/does-not-exist/similar")
+    assert resp.status_code == 404
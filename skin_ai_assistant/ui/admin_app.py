@@ -1,34 +1,60 @@
-import os
-import requests
 from pathlib import Path
 from PIL import Image
 import streamlit as st
-import time
 
-API_BASE = os.getenv("SKINAI_API_URL", "http://127.0.0.1:8000")
+from api_client import API_BASE, make_session
+
 BASE_DIR = Path(__file__).resolve().parents[1]
+PAGE_SIZES = [10, 25, 50, 100]
+CONDITIONS = ["acne", "rosacea", "dermatitis", "hyperpigmentation", "normal"]
+THUMBNAIL_SIDE = 512
 
 st.set_page_config(page_title="Skin AI Admin", page_icon="[ADMIN]", layout="wide")
 st.title("[ADMIN] Skin AI Admin Dashboard")
 
-# Check backend health with retry
-def check_backend_health(max_retries=3, delay=2):
-    """Check if backend is reachable."""
-    for attempt in range(max_retries):
-        try:
-            health_resp = requests.get(f"{API_BASE}/health", timeout=5)
-            if health_resp.status_code == 200:
-                return True
-        except Exception:
-            if attempt < max_retries - 1:
-                time.sleep(delay)
-    return False
+@st.cache_resource
+def get_session():
+    """One pooled keep-alive session shared across reruns."""
+    return make_session()
+
+http = get_session()
+
+@st.cache_data(ttl=30)
+def check_backend_health():
+    """Check if backend is reachable (cached for 30 seconds; the session retries connects)."""
+    try:
+        return http.get(f"{API_BASE}/health", timeout=5).status_code == 200
+    except Exception:
+        return False
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_page(needs_review, limit, offset):
+    """One page of inference records plus the total count (cleared when a review is saved)."""
+    params = {"limit": limit, "offset": offset}
+    if needs_review is not None:
+        params["needs_review"] = needs_review
+    resp = http.get(f"{API_BASE}/admin/inferences", params=params, timeout=60)
+    resp.raise_for_status()
+    return resp.json(), int(resp.headers.get("X-Total-Count", len(resp.json())))
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_thumbnail(path):
+    """Decode and shrink an image once; reruns reuse the cached thumbnail."""
+    img = Image.open(path)
+    img.draft("RGB", (THUMBNAIL_SIDE, THUMBNAIL_SIDE))
+    img = img.convert("RGB")
+    img.thumbnail((THUMBNAIL_SIDE, THUMBNAIL_SIDE))
+    return img
+
+def show_image(container, image_path, caption=None):
+    img_path = BASE_DIR / image_path
+    if img_path.exists():
+        container.image(load_thumbnail(str(img_path)), caption=caption, use_column_width=True)
+    else:
+        container.warning(f"Image not found: {img_path}")
 
 # Display connection status
-with st.spinner("Connecting to backend..."):
-    backend_online = check_backend_health()
-
-if not backend_online:
+if not check_backend_health():
     st.error(f"❌ Cannot connect to backend at {API_BASE}")
     st.info("**Troubleshooting:**")
     st.markdown("""
@@ -36,6 +62,9 @@ if not backend_online:
     2. Check the backend URL: `{}`
     3. Verify the backend port matches BACKEND_PORT environment variable
     """.format(API_BASE))
+    if st.button("Retry"):
+        check_backend_health.clear()
+        st.rerun()
     st.stop()
 
 st.success(f"✅ Connected to backend: {API_BASE}")
@@ -46,39 +75,78 @@ needs_review_opt = st.sidebar.selectbox(
     ["All", "Yes", "No"],
     index=0,
 )
-
-params = {"limit": 100}
-if needs_review_opt == "Yes":
-    params["needs_review"] = "true"
-elif needs_review_opt == "No":
-    params["needs_review"] = "false"
+needs_review = {"All": None, "Yes": "true", "No": "false"}[needs_review_opt]
+page_size = st.sidebar.selectbox("Page size", PAGE_SIZES, index=1)
+show_images = st.sidebar.checkbox("Show all images", value=False,
+                                  help="Otherwise images load per record on request.")
+if st.sidebar.button("Refresh"):
+    fetch_page.clear()
+
+# Go back to the first page whenever the filter or page size changes
+view = (needs_review, page_size)
+if st.session_state.get("view") != view:
+    st.session_state["view"] = view
+    st.session_state["page"] = 1
 
 try:
-    resp = requests.get(f"{API_BASE}/admin/inferences", params=params, timeout=60)
-    if resp.status_code != 200:
-        st.error(f"Admin API error {resp.status_code}: {resp.text}")
-        st.stop()
-    records = resp.json()
+    # The page request's X-Total-Count sizes the pager
+    page = st.session_state.get("page", 1)
+    records, total = fetch_page(needs_review, page_size, (page - 1) * page_size)
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        # Fewer records than before (e.g. reviews left the filter): show the last page
+        page = st.session_state["page"] = pages
+        records, total = fetch_page(needs_review, page_size, (page - 1) * page_size)
+    st.sidebar.number_input("Page", min_value=1, max_value=pages, step=1, key="page")
 except Exception as e:
     st.error(f"Failed to fetch inferences: {e}")
     st.info("The backend may still be starting up. Please refresh the page in a few seconds.")
     st.stop()
 
-st.write(f"Found **{len(records)}** inference records.")
+st.write(f"Found **{total}** inference records — page {page} of {pages}.")
+if "flash" in st.session_state:
+    st.success(st.session_state.pop("flash"))
+
+def send_bulk(items):
+    """Apply reviews through /feedback/bulk in one request, then reload the page."""
+    try:
+        resp = http.post(f"{API_BASE}/feedback/bulk", json=items, timeout=60)
+    except Exception as e:
+        st.sidebar.error(f"Failed to send reviews: {e}")
+        return
+    if resp.status_code != 200:
+        st.sidebar.error(f"Error {resp.status_code}: {resp.text}")
+        return
+    result = resp.json()
+    for item in items:
+        st.session_state.pop(f"sel_{item['inference_id']}", None)
+    fetch_page.clear()
+    st.session_state["flash"] = f"Saved {result['updated']} reviews ({result['failed']} failed)."
+    st.rerun()
+
+# Multi-select actions over the records ticked on this page
+selected = [rec["id"] for rec in records if st.session_state.get(f"sel_{rec['id']}")]
+st.sidebar.header("Bulk actions")
+st.sidebar.write(f"{len(selected)} selected on this page")
+if st.sidebar.button("Mark selected correct", disabled=not selected):
+    send_bulk([{"inference_id": rid, "is_correct": True} for rid in selected])
+relabel_as = st.sidebar.selectbox("Relabel selected as", CONDITIONS)
+if st.sidebar.button(f"Relabel selected as {relabel_as}", disabled=not selected):
+    send_bulk([
+        {"inference_id": rid, "is_correct": False, "corrected_condition": relabel_as} for rid in selected
+    ])
 
 for rec in records:
     exp_label = f"{rec['id']} | Pred: {rec['predicted_condition']} | Corrected: {rec['corrected_condition']} | Needs review: {rec['needs_review']}"
-    with st.expander(exp_label):
+    sel_col, exp_col = st.columns([1, 30])
+    sel_col.checkbox("Select", key=f"sel_{rec['id']}", label_visibility="collapsed")
+    with exp_col.expander(exp_label):
         cols = st.columns([1, 2])
 
         with cols[0]:
-            # try to show image if present
-            img_path = BASE_DIR / rec["image_path"]
-            if img_path.exists():
-                img = Image.open(img_path)
-                st.image(img, caption=str(img_path.name), use_column_width=True)
-            else:
-                st.warning(f"Image not found: {img_path}")
+            # Expanders render their body even when closed, so images load on request
+            if show_images or st.checkbox("Show image", key=f"img_{rec['id']}"):
+                show_image(st, rec["image_path"], caption=Path(rec["image_path"]).name)
 
         with cols[1]:
             st.write(f"**Created:** {rec['created_at']}")
@@ -87,6 +155,33 @@ for rec in records:
             st.write(f"**User ethnicity:** {rec['user_ethnicity']}")
             st.write(f"**Predicted confidence:** {rec['predicted_confidence']}")
 
+            if st.button(f"Show similar cases ({rec['id']})"):
+                try:
+                    sim_resp = http.get(
+                        f"{API_BASE}/admin/inferences/{rec['id']}/similar",
+                        params={"k": 5},
+                        timeout=30,
+                    )
+                    if sim_resp.status_code == 404:
+                        st.info("No embedding stored for this record.")
+                    elif sim_resp.status_code != 200:
+                        st.error(f"Error {sim_resp.status_code}: {sim_resp.text}")
+                    else:
+                        similar = sim_resp.json()
+                        if not similar:
+                            st.info("No similar cases found.")
+                        for sim in similar:
+                            sim_cols = st.columns([1, 3])
+                            show_image(sim_cols[0], sim["image_path"])
+                            sim_cols[1].write(
+                                f"Similarity **{sim['similarity']:.2f}** | "
+                                f"Pred: {sim['predicted_condition']} | "
+                                f"Correct: {sim['is_correct']} | "
+                                f"Corrected: {sim['corrected_condition']}"
+                            )
+                except Exception as e:
+                    st.error(f"Failed to fetch similar cases: {e}")
+
             st.markdown("---")
             st.write("Override / confirm feedback:")
 
@@ -102,7 +197,7 @@ for rec in records:
             with colc2:
                 corrected_condition = st.selectbox(
                     f"Correct condition ({rec['id']})",
-                    ["", "acne", "rosacea", "dermatitis", "hyperpigmentation", "normal"],
+                    [""] + CONDITIONS,
                     index=0,
                     key=f"cond_{rec['id']}",
                 )
@@ -118,8 +213,9 @@ for rec in records:
                         "corrected_condition": corrected_condition or "",
                     }
                     try:
-                        fb_resp = requests.post(f"{API_BASE}/feedback", data=data_fb, timeout=30)
+                        fb_resp = http.post(f"{API_BASE}/feedback", data=data_fb, timeout=30)
                         if fb_resp.status_code == 200:
+                            fetch_page.clear()
                             st.success("Review saved.")
                         else:
                             st.error(f"Error {fb_resp.status_code}: {fb_resp.text}")
@@ -0,0 +1,91 @@
+"""
+HTTP helpers shared by the Streamlit apps: a pooled, retrying requests
+session, client-side downscaling of uploads and analysis-job polling.
+
+Kept free of streamlit imports; the apps cache make_session() with
+st.cache_resource so one session (and its keep-alive pool) is reused
+across reruns.
+"""
+import os
+import time
+from io import BytesIO
+
+import requests
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_BASE = os.getenv("SKINAI_API_URL", "http://127.0.0.1:8000")
+# Longest side sent to the backend; the model itself only sees 224x224
+UPLOAD_MAX_SIDE = int(os.getenv("SKINAI_UPLOAD_MAX_SIDE", "1024"))
+UPLOAD_JPEG_QUALITY = int(os.getenv("SKINAI_UPLOAD_JPEG_QUALITY", "90"))
+
+
+def make_session(retries=3, pool_size=10):
+    """
+    A requests.Session with a keep-alive connection pool and retries.
+
+    Connection failures are retried for every method (nothing reached the
+    server yet); 502/503/504 responses only for GET/HEAD, since replaying
+    an /analyze POST would store a duplicate record. Retry-After is honoured.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def downscale_image(data, max_side=UPLOAD_MAX_SIDE, quality=UPLOAD_JPEG_QUALITY):
+    """
+    Shrink encoded image bytes so the longest side is at most max_side and
+    re-encode as JPEG, applying the EXIF orientation first.
+
+    Returns (bytes, original_size, new_size). Images already within
+    max_side are returned unchanged.
+    """
+    img = Image.open(BytesIO(data))
+    original_size = img.size
+    if max(original_size) <= max_side:
+        return data, original_size, original_size
+
+    # Let the JPEG decoder skip detail we are about to throw away (DCT scaling)
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue(), original_size, img.size
+
+
+def wait_for_job(session, job_id, timeout=120, max_interval=1.0):
+    """
+    Poll /analyze/jobs/{job_id} with short requests (interval growing from
+    0.1s to max_interval) until it is done or failed.
+
+    Returns the final job dict; raises TimeoutError after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    interval = 0.1
+    while True:
+        resp = session.get(f"{API_BASE}/analyze/jobs/{job_id}", timeout=10)
+        resp.raise_for_status()
+        job = resp.json()
+        if job["status"] in ("done", "failed"):
+            return job
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Analysis job {job_id} not finished after {timeout}s")
+        time.sleep(interval)
+        interval = min(interval * 1.5, max_interval)
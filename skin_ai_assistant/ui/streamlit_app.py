@@ -1,21 +1,25 @@
-import os
-import requests
 import streamlit as st
 from PIL import Image
-from io import BytesIO
 
-API_BASE = os.getenv("SKINAI_API_URL", "http://127.0.0.1:8000")
+from api_client import API_BASE, UPLOAD_MAX_SIDE, make_session, downscale_image, wait_for_job
 
 st.set_page_config(page_title="Skin AI Assistant", page_icon="[SKIN AI]", layout="centered")
 st.title("[SKIN AI] Skin AI Assistant")
 st.write("Upload a clear photo of your face and get a cosmetic skin condition suggestion.")
 
+@st.cache_resource
+def get_session():
+    """One pooled keep-alive session shared across reruns."""
+    return make_session()
+
+http = get_session()
+
 # Check backend health
 @st.cache_data(ttl=30)
 def check_backend():
     """Check if backend is reachable (cached for 30 seconds)."""
     try:
-        resp = requests.get(f"{API_BASE}/health", timeout=5)
+        resp = http.get(f"{API_BASE}/health", timeout=5)
         return resp.status_code == 200
     except Exception:
         return False
@@ -59,6 +63,11 @@ ethnicity = st.selectbox(
 st.markdown("---")
 
 uploaded = st.file_uploader("Upload a face image (jpg/png)", type=["jpg", "jpeg", "png"])
+send_original = st.checkbox(
+    "Send original full-resolution image",
+    value=False,
+    help=f"By default photos are shrunk to at most {UPLOAD_MAX_SIDE}px on the longest side before upload.",
+)
 
 if uploaded:
     # Preview
@@ -68,19 +77,46 @@ if uploaded:
     if st.button("Analyze Skin"):
         with st.spinner("Contacting Skin AI backend..."):
             try:
-                uploaded.seek(0)
-                files = {"file": (uploaded.name, uploaded, uploaded.type)}
+                payload = uploaded.getvalue()
+                name, content_type = uploaded.name, uploaded.type
+                if not send_original:
+                    small, original_size, new_size = downscale_image(payload)
+                    if small is not payload:
+                        st.caption(
+                            f"Uploading {new_size[0]}×{new_size[1]} "
+                            f"(from {original_size[0]}×{original_size[1]}, "
+                            f"{len(payload) / 1e6:.1f} MB → {len(small) / 1e6:.2f} MB)"
+                        )
+                        payload = small
+                        name, content_type = name.rsplit(".", 1)[0] + ".jpg", "image/jpeg"
+                files = {"file": (name, payload, content_type)}
                 data = {
                     "skin_type": skin_type,
                     "fitzpatrick": fitzpatrick,
                     "ethnicity": ethnicity,
+                    "debug": "true",
                 }
-                resp = requests.post(f"{API_BASE}/analyze", files=files, data=data, timeout=60)
-                if resp.status_code != 200:
+                # Queue the analysis and poll for it, rather than holding one long request open
+                resp = http.post(f"{API_BASE}/analyze/jobs", files=files, data=data, timeout=30)
+                job = wait_for_job(http, resp.json()["job_id"]) if resp.status_code == 202 else None
+                if resp.status_code == 503:
+                    st.error("The analysis service is busy right now. Please try again in a few seconds.")
+                elif job is None:
                     st.error(f"API error {resp.status_code}: {resp.text}")
+                elif job["status"] == "failed" and job["error"]["status_code"] == 422:
+                    # Rejected by the backend's image-quality gate
+                    st.warning(f"Please retake the photo: {job['error']['detail']['message']}")
+                elif job["status"] == "failed":
+                    st.error(f"Analysis failed ({job['error']['status_code']}): {job['error']['detail']}")
                 else:
-                    out = resp.json()
+                    out = job["result"]
                     st.success("Analysis complete ✅")
+                    quality = out.get("quality")
+                    if quality and not quality["ok"]:
+                        st.warning(
+                            "The photo may not be good enough for a reliable result: "
+                            + ", ".join(issue.replace("_", " ") for issue in quality["issues"])
+                        )
 
                     st.subheader("Prediction")
                     st.write(f"**Condition:** `{out['condition']}`")
@@ -91,6 +127,10 @@ if uploaded:
                     st.write(f"- Fitzpatrick: `{out['fitzpatrick']}`")
                     st.write(f"- Ethnicity: `{out['ethnicity']}`")
 
+                    if out.get("timings"):
+                        with st.expander("Server timings"):
+                            st.table({stage: f"{ms:.1f} ms" for stage, ms in out["timings"].items()})
+
                     inference_id = out["inference_id"]
 
                     st.markdown("---")
@@ -116,7 +156,7 @@ if uploaded:
                             "is_correct": str(is_correct).lower(),
                             "corrected_condition": corrected_condition or "",
                         }
-                        fb_resp = requests.post(f"{API_BASE}/feedback", data=data_fb, timeout=30)
+                        fb_resp = http.post(f"{API_BASE}/feedback", data=data_fb, timeout=30)
                         if fb_resp.status_code == 200:
                             st.success("Feedback submitted. Thank you! 🙏")
                         else:
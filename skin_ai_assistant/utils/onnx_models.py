@@ -0,0 +1,140 @@
+import json
+import numpy as np
+from pathlib import Path
+
+
+def make_random_model(out_dir, labels=("acne", "dermatitis", "hyperpigmentation", "normal", "rosacea"),
+                      heads=None, channels=32, embedding_dim=64, seed=0):
+    """
+    Write a small randomly initialized ONNX model with the same interface
+    as an exported SkinAIModel (input, logits, embedding and optional task
+    heads), plus its class_names.txt and heads.json.
+
+    Used by tests and benchmarks so they run offline without a trained model.
+
+    Returns:
+        Path to the written skin_model.onnx
+    """
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(exist_ok=True, parents=True)
+    heads = heads or {}
+
+    def weight(name, *shape):
+        return numpy_helper.from_array((rng.standard_normal(shape) * 0.1).astype(np.float32), name)
+
+    initializers = [
+        weight("conv1_w", channels, 3, 3, 3),
+        weight("conv2_w", channels, channels, 3, 3),
+        weight("proj_w", channels, embedding_dim),
+        weight("fc_w", embedding_dim, len(labels)),
+    ]
+    nodes = [
+        helper.make_node("Conv", ["input", "conv1_w"], ["c1"], strides=[4, 4], pads=[1, 1, 1, 1]),
+        helper.make_node("Relu", ["c1"], ["r1"]),
+        helper.make_node("Conv", ["r1", "conv2_w"], ["c2"], strides=[2, 2], pads=[1, 1, 1, 1]),
+        helper.make_node("Relu", ["c2"], ["r2"]),
+        helper.make_node("GlobalAveragePool", ["r2"], ["pool"]),
+        helper.make_node("Flatten", ["pool"], ["flat"]),
+        helper.make_node("MatMul", ["flat", "proj_w"], ["embedding"]),
+        helper.make_node("MatMul", ["embedding", "fc_w"], ["logits"]),
+    ]
+    outputs = [
+        helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", len(labels)]),
+        helper.make_tensor_value_info("embedding", TensorProto.FLOAT, ["batch", embedding_dim]),
+    ]
+    for name, spec in heads.items():
+        size = len(spec["labels"]) if spec["type"] == "classification" else 1
+        initializers.append(weight(f"{name}_w", embedding_dim, size))
+        nodes.append(helper.make_node("MatMul", ["embedding", f"{name}_w"], [name]))
+        outputs.append(helper.make_tensor_value_info(name, TensorProto.FLOAT, ["batch", size]))
+
+    graph = helper.make_graph(
+        nodes,
+        "skin_ai_random",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, 224, 224])],
+        outputs,
+        initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+
+    model_path = out_dir / "skin_model.onnx"
+    onnx.save(model, model_path)
+    (out_dir / "class_names.txt").write_text("\n".join(labels))
+    (out_dir / "heads.json").write_text(json.dumps(heads, indent=2))
+    return model_path
+
+
+def externalize_weights(model_path, align=4096, size_threshold=1024):
+    """
+    Move the model's large initializers into a sidecar `<model>.data` file,
+    each starting on an `align`-byte boundary, and rewrite the model to
+    reference them.
+
+    ONNX Runtime memory-maps page-aligned external data instead of copying
+    it, so every process serving the same file shares one copy of the
+    weights in the page cache (see create_session in backend/inference.py).
+
+    Returns:
+        Path to the written data file
+    """
+    import onnx
+    from onnx import TensorProto
+
+    model_path = Path(model_path)
+    model = onnx.load(model_path)
+    data_path = model_path.with_name(model_path.name + ".data")
+    tmp_path = data_path.with_name(data_path.name + ".tmp")
+
+    offset = 0
+    with open(tmp_path, "wb") as f:
+        for tensor in model.graph.initializer:
+            if not tensor.HasField("raw_data") or len(tensor.raw_data) < size_threshold:
+                continue
+            padding = -offset % align
+            f.write(b"\0" * padding)
+            offset += padding
+            f.write(tensor.raw_data)
+            length = len(tensor.raw_data)
+            tensor.ClearField("raw_data")
+            tensor.data_location = TensorProto.EXTERNAL
+            del tensor.external_data[:]
+            for key, value in (("location", data_path.name), ("offset", str(offset)), ("length", str(length))):
+                entry = tensor.external_data.add()
+                entry.key, entry.value = key, value
+            offset += length
+
+    tmp_path.replace(data_path)
+    onnx.save(model, model_path)
+    return data_path
+
+
+def retarget_weights(model_path, out_path, data_name, metadata=None):
+    """
+    Save a copy of an externalized model whose initializers reference
+    `data_name` (a file next to out_path) instead of its own sidecar, with
+    `metadata` (str -> str) stored in the model's metadata_props. With
+    data_name None the references are left as they are.
+
+    The weights themselves are not read or copied.
+    """
+    import onnx
+
+    model = onnx.load(str(model_path), load_external_data=False)
+    for tensor in model.graph.initializer if data_name is not None else ():
+        for entry in tensor.external_data:
+            if entry.key == "location":
+                entry.value = data_name
+    props = {p.key: p.value for p in model.metadata_props}
+    props.update(metadata or {})
+    del model.metadata_props[:]
+    for key, value in props.items():
+        entry = model.metadata_props.add()
+        entry.key, entry.value = key, value
+    onnx.save(model, str(out_path))
+    return out_path
@@ -1,17 +1,58 @@
+import os
 import socket
 
 
+def _new_socket(reuse: bool = True) -> socket.socket:
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if reuse and os.name == "posix":
+        # Matches how uvicorn/tornado bind, so a port left in TIME_WAIT or held
+        # by a non-listening placeholder (see hold_port) still counts as usable.
+        # Windows SO_REUSEADDR would allow stealing a live port, so not there.
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    return s
+
+
+def reserve_socket(host: str = "127.0.0.1", port: int = 0, listen: bool = True) -> socket.socket:
+    """
+    Bind a TCP socket and keep it open. port=0 lets the OS pick a free
+    ephemeral port in a single syscall; read it back with sock.getsockname()[1].
+
+    Hand a listening socket to the server that will use it (uvicorn's fd=)
+    rather than closing it and passing the number, so nothing else can grab
+    the port in between.
+    """
+    s = _new_socket()
+    try:
+        s.bind((host, port))
+        if listen:
+            s.listen(2048)
+    except OSError:
+        s.close()
+        raise
+    return s
+
+
+def hold_port(host: str = "127.0.0.1", port: int = 0) -> socket.socket:
+    """
+    Reserve a port for a server that cannot take an inherited socket
+    (streamlit). The placeholder is bound but not listening, so on POSIX the
+    server can still bind the port with SO_REUSEADDR while the OS will not
+    hand it out to anyone else. Keep the returned socket open until the
+    server has stopped.
+    """
+    return reserve_socket(host, port, listen=False)
+
+
 def get_free_port(start_port: int = 8000, max_port: int = 9000) -> int:
     """
     Scan from start_port upwards and return the first free TCP port.
+
+    The port is released before returning, so prefer reserve_socket() where
+    the caller can keep the socket.
     """
     for port in range(start_port, max_port + 1):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.bind(("127.0.0.1", port))
-                return port
-            except OSError:
-                continue
+        if is_port_free(port):
+            return port
     raise RuntimeError(f"No free ports found in range {start_port}-{max_port}.")
 
 
@@ -31,17 +72,11 @@ def get_multiple_free_ports(count: int, start_port: int = 8000, max_port: int =
         RuntimeError: If not enough free ports are found
     """
     free_ports = []
-    current_port = start_port
-
-    while len(free_ports) < count and current_port <= max_port:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.bind(("127.0.0.1", current_port))
-                free_ports.append(current_port)
-            except OSError:
-                # Port is in use, continue to next
-                pass
-        current_port += 1
+    for port in range(start_port, max_port + 1):
+        if len(free_ports) == count:
+            break
+        if is_port_free(port):
+            free_ports.append(port)
 
     if len(free_ports) < count:
         raise RuntimeError(f"Only found {len(free_ports)} free ports out of {count} requested in range {start_port}-{max_port}.")
@@ -60,7 +95,7 @@ def is_port_free(port: int, host: str = "127.0.0.1") -> bool:
     Returns:
         True if port is free, False otherwise
     """
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    with _new_socket() as s:
         try:
             s.bind((host, port))
             return True